@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Benchmark of the CSV reactor loader on a synthetic large input table.
+
+The rows of an input table are repeated up to ``--rows`` rows, then the
+table is loaded with the former per-row path (``load_bin_from_row`` on
+``iterrows``) and with ``load_all_bins``; the timings are printed and the
+bins of both paths are checked to be identical.
+
+Usage:
+    python bins_from_csv/benchmark_loader.py [--csv input_files_example/input_table.csv]
+        [--materials input_files_example/materials.csv] [--rows 50000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+
+import pandas as pd
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+
+
+def synthetic_table(csv_path: str, n_rows: int, out_path: str):
+    """Writes ``csv_path`` repeated to ``n_rows`` rows (bin numbers kept unique)."""
+    df = pd.read_csv(csv_path)
+    repeats = -(-n_rows // len(df))
+    big = pd.concat([df] * repeats, ignore_index=True).iloc[:n_rows].copy()
+    big["Bin number"] = range(len(big))
+    big.to_csv(out_path, index=False)
+
+
+def load_per_row(loader: CSVBinLoader) -> list:
+    return [loader.load_bin_from_row(row, row_index) for row_index, row in loader.df.iterrows()]
+
+
+def bin_state(bin) -> tuple:
+    config = asdict(bin.bin_configuration)
+    return (
+        bin.bin_id, bin.bin_number, bin.z_start, bin.r_start, bin.z_end, bin.r_end,
+        bin.material.name, bin.thickness, bin.cu_thickness, bin.mode, bin.parent_bin_surf_area,
+        bin.surface_area, bin.f_ion_flux_fraction, bin.location, bin.coolant_temp,
+        bin.calculate_implantation_params, tuple(sorted(config.items())),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV reactor loader")
+    parser.add_argument("--csv", default=os.path.join(parent_dir, "input_files_example", "input_table.csv"))
+    parser.add_argument("--materials", default=os.path.join(parent_dir, "input_files_example", "materials.csv"))
+    parser.add_argument("--rows", type=int, default=50000, help="Rows of the synthetic table (default: 50000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table = os.path.join(tmp_dir, "input_table.csv")
+        synthetic_table(args.csv, args.rows, table)
+        with contextlib.redirect_stdout(io.StringIO()):
+            loader = CSVBinLoader(table, args.materials)
+
+            start = time.perf_counter()
+            per_row = load_per_row(loader)
+            per_row_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            vectorised = loader.load_all_bins().bins
+            vectorised_time = time.perf_counter() - start
+
+    print(f"Rows: {len(loader.df)}")
+    print(f"  iterrows + load_bin_from_row: {per_row_time:8.3f} s")
+    print(f"  load_all_bins:                {vectorised_time:8.3f} s  ({per_row_time / vectorised_time:.1f}x)")
+
+    mismatches = [a.bin_id for a, b in zip(per_row, vectorised) if bin_state(a) != bin_state(b)]
+    if len(per_row) != len(vectorised) or mismatches:
+        print(f"[ERROR] Loaders differ (bins {mismatches[:10]})")
+        sys.exit(1)
+    print("✓ Both loaders produce identical bins")
+
+
+if __name__ == "__main__":
+    main()
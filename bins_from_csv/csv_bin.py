@@ -3,8 +3,9 @@ CSV-driven bin classes for HISP reactor modeling.
 Each bin represents one row from the CSV configuration table.
 """
 
-from typing import Optional, Any
+from typing import Optional, Any, Iterable
 from dataclasses import dataclass
+import numpy as np
 import pandas as pd
 from materials.materials import Material
 
@@ -18,6 +19,7 @@ class BinConfiguration:
     max_stepsize_no_fp: float  # Max. stepsize no FP (s)
     bc_plasma_facing_surface: str  # BC Plasma Facing Surface
     bc_rear_surface: str  # BC rear surface
+    output_policy: Optional[str] = None  # Output policy, e.g. "max_points:20000" (None: input folder setting)
     
     def __post_init__(self):
         """Validate configuration parameters."""
@@ -252,52 +254,170 @@ class Bin:
         return self.__str__()
 
 
+# Numeric bin attributes exposed by BinCollection.arrays (structured array fields)
+NUMERIC_FIELDS = [
+    ("bin_id", np.int64),
+    ("bin_number", np.int64),
+    ("z_start", np.float64),
+    ("r_start", np.float64),
+    ("z_end", np.float64),
+    ("r_end", np.float64),
+    ("thickness", np.float64),
+    ("cu_thickness", np.float64),
+    ("parent_bin_surf_area", np.float64),
+    ("surface_area", np.float64),
+    ("f_ion_flux_fraction", np.float64),
+    ("ion_scaling_factor", np.float64),
+    ("coolant_temp", np.float64),
+]
+
+
+class _BinList(list):
+    """List of bins counting its mutations, so BinCollection knows when to reindex."""
+
+    revision = 0
+
+
+def _mutator(name):
+    method = getattr(list, name)
+
+    def mutate(self, *args, **kwargs):
+        self.revision += 1
+        return method(self, *args, **kwargs)
+
+    mutate.__name__ = name
+    return mutate
+
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "append", "extend",
+              "insert", "pop", "remove", "clear", "sort", "reverse"):
+    setattr(_BinList, _name, _mutator(_name))
+
+
 class BinCollection:
-    """Collection of CSV-based bins."""
+    """Collection of CSV-based bins.
+
+    Lookups by ID, number, material, location and mode use hash indexes built
+    on first use. The indexes are rebuilt when ``bins`` is replaced or when
+    bins are added, removed or replaced in it; call ``reindex()`` after
+    modifying the attributes of a bin in place.
+    """
     
     def __init__(self, bins: list[Bin] = None):
         """Initialize collection with list of Bin objects."""
         self.bins = bins if bins is not None else []
+
+    @property
+    def bins(self) -> list[Bin]:
+        """The bins of the collection (a list, in CSV order)."""
+        return self._bins
+
+    @bins.setter
+    def bins(self, bins: Iterable[Bin]):
+        self._bins = _BinList(bins)
+        self._index_key = None
     
     def add_bin(self, bin: Bin):
         """Add a bin to the collection."""
         self.bins.append(bin)
+
+    def reindex(self):
+        """Drop the indexes, they are rebuilt on next use."""
+        self._index_key = None
+
+    def _indexes(self) -> dict:
+        key = (id(self._bins), self._bins.revision)
+        if self._index_key != key:
+            by_id, by_number = {}, {}
+            by_material, by_location, by_mode = {}, {}, {}
+            for bin in self.bins:
+                # first match wins, as with a linear search
+                by_id.setdefault(bin.bin_id, bin)
+                by_number.setdefault(bin.bin_number, bin)
+                by_material.setdefault(bin.material_name.upper(), []).append(bin)
+                by_location.setdefault(bin.location.upper(), []).append(bin)
+                by_mode.setdefault(bin.mode.lower(), []).append(bin)
+            self._index = {
+                "id": by_id,
+                "number": by_number,
+                "material": by_material,
+                "location": by_location,
+                "mode": by_mode,
+                "first_wall": [bin for bin in self.bins if bin.is_first_wall],
+                "divertor": [bin for bin in self.bins if bin.is_divertor],
+                "arrays": None,
+                "row": None,
+            }
+            self._index_key = key
+        return self._index
+
+    @property
+    def bins_by_id(self) -> dict[int, Bin]:
+        """Mapping of CSV row ID to bin."""
+        return self._indexes()["id"]
     
     def get_bin_by_id(self, bin_id: int) -> Bin:
         """Get bin by its CSV row ID."""
-        for bin in self.bins:
-            if bin.bin_id == bin_id:
-                return bin
-        raise ValueError(f"No bin found with ID {bin_id}")
+        bin = self._indexes()["id"].get(bin_id)
+        if bin is None:
+            raise ValueError(f"No bin found with ID {bin_id}")
+        return bin
     
     def get_bin_by_number(self, bin_number: int) -> Bin:
         """Get bin by its bin number."""
-        for bin in self.bins:
-            if bin.bin_number == bin_number:
-                return bin
-        raise ValueError(f"No bin found with number {bin_number}")
+        bin = self._indexes()["number"].get(bin_number)
+        if bin is None:
+            raise ValueError(f"No bin found with number {bin_number}")
+        return bin
     
     def get_bins_by_material(self, material: str) -> list[Bin]:
         """Get all bins with specified material."""
-        return [bin for bin in self.bins if bin.material_name.upper() == material.upper()]
+        return list(self._indexes()["material"].get(material.upper(), []))
     
     def get_bins_by_location(self, location: str) -> list[Bin]:
         """Get all bins at specified location (FW, DIV, etc.)."""
-        return [bin for bin in self.bins if bin.location.upper() == location.upper()]
+        return list(self._indexes()["location"].get(location.upper(), []))
     
     def get_bins_by_mode(self, mode: str) -> list[Bin]:
         """Get all bins with specified mode."""
-        return [bin for bin in self.bins if bin.mode.lower() == mode.lower()]
+        return list(self._indexes()["mode"].get(mode.lower(), []))
     
     @property
     def first_wall_bins(self) -> list[Bin]:
         """Get all first wall bins."""
-        return [bin for bin in self.bins if bin.is_first_wall]
+        return list(self._indexes()["first_wall"])
     
     @property
     def divertor_bins(self) -> list[Bin]:
         """Get all divertor bins."""
-        return [bin for bin in self.bins if bin.is_divertor]
+        return list(self._indexes()["divertor"])
+
+    @property
+    def arrays(self) -> np.ndarray:
+        """
+        Columnar view of the numeric bin attributes (one row per bin, in ``bins`` order).
+
+        A read-only structured array with the fields of NUMERIC_FIELDS, e.g.
+        ``(inventories * reactor.arrays["surface_area"]).sum()``.
+        """
+        index = self._indexes()
+        if index["arrays"] is None:
+            arrays = np.empty(len(self.bins), dtype=NUMERIC_FIELDS)
+            for name, _ in NUMERIC_FIELDS:
+                arrays[name] = [getattr(bin, name) for bin in self.bins]
+            arrays.setflags(write=False)
+            index["arrays"] = arrays
+        return index["arrays"]
+
+    def rows(self, bin_ids: Iterable[int]) -> np.ndarray:
+        """Row indices in ``arrays`` of the given bin IDs."""
+        index = self._indexes()
+        if index["row"] is None:
+            row = {}
+            for i, bin in enumerate(self.bins):
+                row.setdefault(bin.bin_id, i)
+            index["row"] = row
+        return np.array([index["row"][bin_id] for bin_id in bin_ids], dtype=np.int64)
     
     def __len__(self) -> int:
         """Return number of bins in collection."""
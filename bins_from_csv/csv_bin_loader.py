@@ -2,12 +2,27 @@
 CSV loader for creating Bin objects from CSV configuration files.
 """
 
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 from bins_from_csv.csv_bin import Bin, BinCollection, Reactor, BinConfiguration
 from materials.materials_loader import load_materials
 
+# Boundary condition types accepted in the BC columns ("<Type> - <description>")
+BC_TYPES = ("robin", "dirichlet", "neumann")
+
+# Optional columns: (column, default)
+OPTIONAL_NUMERIC_COLUMNS = {
+    "coolant_temp": ("Coolant Temp. (K)", 343.0),
+    "rtol": ("rtol", 1e-10),
+    "atol": ("atol", 1e10),
+    "fp_max_stepsize": ("FP max. stepsize (s)", 5.0),
+    "max_stepsize_no_fp": ("Max. stepsize no FP (s)", 100.0),
+}
+DEFAULT_BC_PLASMA_FACING = "Robin - Surf. Rec. + Implantation"
+DEFAULT_BC_REAR = "Neumann - no flux"
+
 
 class CSVBinLoader:
     """Loads Bin objects from CSV configuration files."""
@@ -66,6 +81,44 @@ class CSVBinLoader:
             return value
         return default
     
+    def _find_material(self, material: str, row_index: int):
+        """Material object of a CSV material name (exact, then case-insensitive match)."""
+        mat_obj = None
+        mat_name = material.strip()
+        if hasattr(self, 'materials') and self.materials:
+            mat_obj = self.materials.get(mat_name)
+            if mat_obj is None:
+                for k, v in self.materials.items():
+                    if k.lower() == mat_name.lower():
+                        mat_obj = v
+                        break
+        if mat_obj is None:
+            available = ', '.join(sorted(self.materials.keys()))
+            raise ValueError(
+                f"Unknown material '{material}' in CSV row {row_index + 1}. "
+                f"Available materials: {available}"
+            )
+        return mat_obj
+
+    @staticmethod
+    def _validate_bcs(column: str, values, first_row_index: int = 0):
+        """Checks that boundary conditions start with a known type (Robin, Dirichlet, Neumann)."""
+        for i, value in enumerate(values):
+            bc_type = str(value).split("-", 1)[0].strip().lower()
+            if bc_type not in BC_TYPES:
+                raise ValueError(
+                    f"Unknown boundary condition '{value}' in column '{column}', CSV row "
+                    f"{first_row_index + i + 1}. Expected '<Robin|Dirichlet|Neumann> - <description>'"
+                )
+
+    def _optional_column(self, column: str, default: Any) -> np.ndarray:
+        """Whole optional column as an object array, missing column or NaN cells replaced by default."""
+        if column not in self.df.columns:
+            return np.full(len(self.df), default, dtype=object)
+        values = self.df[column].to_numpy(dtype=object)
+        values[pd.isna(self.df[column]).to_numpy()] = default
+        return values
+
     def load_bin_from_row(self, row: pd.Series, row_index: int) -> Bin:
         """
         Create a Bin from a pandas DataFrame row.
@@ -91,21 +144,7 @@ class CSVBinLoader:
 
         # find matching Material object (case-insensitive). If no match,
         # raise an error — CSV values must match `materials.csv`.
-        mat_obj = None
-        mat_name = material.strip()
-        if hasattr(self, 'materials') and self.materials:
-            mat_obj = self.materials.get(mat_name)
-            if mat_obj is None:
-                for k, v in self.materials.items():
-                    if k.lower() == mat_name.lower():
-                        mat_obj = v
-                        break
-        if mat_obj is None:
-            available = ', '.join(sorted(self.materials.keys()))
-            raise ValueError(
-                f"Unknown material '{material}' in CSV row {row_index + 1}. "
-                f"Available materials: {available}"
-            )
+        mat_obj = self._find_material(material, row_index)
         
         # Required operating properties
         mode = str(row['mode'])
@@ -130,10 +169,17 @@ class CSVBinLoader:
         # Boundary conditions with defaults
         bc_plasma_facing = self._get_column_value(row, 'BC Plasma Facing Surface', 'Robin - Surf. Rec. + Implantation')
         bc_rear = self._get_column_value(row, 'BC rear surface', 'Neumann - no flux')
+        self._validate_bcs('BC Plasma Facing Surface', [bc_plasma_facing], row_index)
+        self._validate_bcs('BC rear surface', [bc_rear], row_index)
         
         # Implantation parameters calculation flag (default: True to calculate from flux data)
         calc_implant_str = self._get_column_value(row, 'Calculate Implantation Parameters', 'Yes')
         calculate_implantation_params = str(calc_implant_str).lower().strip() != 'no'
+
+        # Output sampling policy (see run_on_cluster/output_policy.py)
+        output_policy = self._get_column_value(row, 'Output policy', None)
+        if output_policy is not None:
+            output_policy = str(output_policy).strip() or None
         
         # Create bin configuration
         bin_config = BinConfiguration(
@@ -142,7 +188,8 @@ class CSVBinLoader:
             fp_max_stepsize=fp_max_stepsize,
             max_stepsize_no_fp=max_stepsize_no_fp,
             bc_plasma_facing_surface=bc_plasma_facing,
-            bc_rear_surface=bc_rear
+            bc_rear_surface=bc_rear,
+            output_policy=output_policy,
         )
         
         # Create Bin instance; `mat_obj` is guaranteed non-None here.
@@ -172,15 +219,84 @@ class CSVBinLoader:
     def load_all_bins(self) -> BinCollection:
         """
         Load all bins from the CSV file.
+
+        Columns are coerced as a whole, material names are matched once per
+        distinct name and boundary conditions validated once per distinct value;
+        bins are then built from the column arrays (same bins as
+        load_bin_from_row on every row).
         
         Returns:
             BinCollection containing all bins
         """
+        df = self.df
+        n = len(df)
+
+        # Column-wise coercion of the required columns (to Python scalars, as load_bin_from_row)
+        bin_numbers = df['Bin number'].to_numpy(dtype=float).astype(int).tolist()
+        coordinates = [df[c].to_numpy(dtype=float).tolist() for c in ('Z_start (m)', 'R_start (m)', 'Z_end (m)', 'R_end (m)')]
+        thickness = df['Thickness (m)'].to_numpy(dtype=float).tolist()
+        cu_thickness = df['Cu thickness (m)'].to_numpy(dtype=float).tolist()
+        parent_area = df['S. Area parent bin (m^2)'].to_numpy(dtype=float).tolist()
+        surface_area = df['Surface area (m^2)'].to_numpy(dtype=float).tolist()
+        f_ion = df['f (ion flux scaling factor)'].to_numpy(dtype=float).tolist()
+        modes = df['mode'].astype(str).tolist()
+        locations = df['location'].astype(str).tolist()
+
+        # One material lookup per distinct name
+        material_names = df['Material'].astype(str).to_numpy()
+        unique_names, first_rows, inverse = np.unique(material_names, return_index=True, return_inverse=True)
+        unique_materials = [self._find_material(name, int(row)) for name, row in zip(unique_names, first_rows)]
+        materials = [unique_materials[i] for i in inverse]
+
+        # Optional columns with defaults
+        numeric = {
+            key: self._optional_column(column, default).astype(float).tolist()
+            for key, (column, default) in OPTIONAL_NUMERIC_COLUMNS.items()
+        }
+        bc_plasma_facing = self._optional_column('BC Plasma Facing Surface', DEFAULT_BC_PLASMA_FACING)
+        bc_rear = self._optional_column('BC rear surface', DEFAULT_BC_REAR)
+        for column, values in (('BC Plasma Facing Surface', bc_plasma_facing), ('BC rear surface', bc_rear)):
+            unique_bcs, first_rows = np.unique(values.astype(str), return_index=True)
+            for bc, row in zip(unique_bcs, first_rows):
+                self._validate_bcs(column, [bc], int(row))
+        calculate_implantation = [
+            str(v).lower().strip() != 'no' for v in self._optional_column('Calculate Implantation Parameters', 'Yes')
+        ]
+        output_policies = [
+            (str(v).strip() or None) if v is not None else None
+            for v in self._optional_column('Output policy', None)
+        ]
+
         bins = []
-        
-        for row_index, row in self.df.iterrows():
-            bin_obj = self.load_bin_from_row(row, row_index)
-            bins.append(bin_obj)
+        for i in range(n):
+            bin_config = BinConfiguration(
+                rtol=numeric['rtol'][i],
+                atol=numeric['atol'][i],
+                fp_max_stepsize=numeric['fp_max_stepsize'][i],
+                max_stepsize_no_fp=numeric['max_stepsize_no_fp'][i],
+                bc_plasma_facing_surface=bc_plasma_facing[i],
+                bc_rear_surface=bc_rear[i],
+                output_policy=output_policies[i],
+            )
+            bins.append(Bin(
+                bin_number=bin_numbers[i],
+                z_start=coordinates[0][i],
+                r_start=coordinates[1][i],
+                z_end=coordinates[2][i],
+                r_end=coordinates[3][i],
+                material=materials[i],
+                thickness=thickness[i],
+                cu_thickness=cu_thickness[i],
+                mode=modes[i],
+                parent_bin_surf_area=parent_area[i],
+                surface_area=surface_area[i],
+                f_ion_flux_fraction=f_ion[i],
+                location=locations[i],
+                coolant_temp=numeric['coolant_temp'][i],
+                bin_configuration=bin_config,
+                bin_id=i + 1,  # 1-based row number in CSV (unique per row)
+                calculate_implantation_params=calculate_implantation[i],
+            ))
         print(f"✓ Successfully loaded {len(bins)} bins from CSV")
         return BinCollection(bins)
     
@@ -1,68 +1,74 @@
 """
 Mesh configuration for PFC-Tritium-Transport bins.
 
-This file defines the user mesh parameters for each bin group.
-The BINS_MESHES dictionary is generated from these parameters.
+This file defines the user mesh parameters for each bin group (mesh_for_bin).
+The runner calls build_meshes(reactor, bin_ids) with its already loaded
+reactor and the bins being run; meshes are generated on first access of a
+bin and shared between bins with the same (L, h0, r) (see
+meshing.graded_vertices). BINS_MESHES (every bin) is still available
+for older callers: it is built on first access from the input folder given by
+the INPUT_DIR_CONTEXT environment variable.
 """
 
 import os
+from typing import Iterable, Mapping, Optional
+
 import numpy as np
-from typing import Dict
-from meshing import MeshBin
+from meshing import LazyBinsMeshes, MeshBin, graded_vertices
 
 
-def graded_vertices(L, h0, r):
+def mesh_for_bin(bin) -> Optional[np.ndarray]:
     """
-    Generate graded mesh vertices from 0 to L.
-    
+    Mesh vertices of one bin - user defines mesh for each bin/group.
+
     Args:
-        L: Domain length (thickness)
-        h0: Initial mesh spacing
-        r: Mesh refinement ratio (> 1 for refinement towards x=0)
-        
+        bin: Bin of the reactor
+
     Returns:
-        numpy array of vertex positions
+        numpy array of vertex positions, or None to use the default mesh
     """
-    xs = [0.0]
-    h = h0
-    while xs[-1] + h < L:
-        xs.append(xs[-1] + h)
-        h *= r
-    if xs[-1] < L:
-        xs.append(L)
-    return np.array(xs, dtype=float)
-
-
-# Load reactor to get bin thicknesses
-# Use INPUT_DIR_CONTEXT environment variable set by runner, or default to input_files/
-input_dir = os.environ.get("INPUT_DIR_CONTEXT", "input_files")
-csv_path = os.path.join(input_dir, "input_table.csv")
-materials_path = os.path.join(input_dir, "materials.csv")
-
-# Import here to ensure we pass materials_csv_path
-from bins_from_csv.csv_bin_loader import CSVBinLoader
-loader = CSVBinLoader(csv_path, materials_csv_path=materials_path)
-reactor = loader.load_reactor()
-
-# Generate BINS_MESHES - user defines mesh for each bin/group
-BINS_MESHES: Dict[int, MeshBin] = {}
-
-# Bins 1-50: h0=1e-10, r=1.05 (finer mesh for higher resolution)
-#for bin in reactor.bins:
-#    if 1 <= bin.bin_id <= 50:
-#        mesh_array = graded_vertices(L=bin.thickness, h0=1e-10, r=1.05)
-#        BINS_MESHES[bin.bin_id] = MeshBin(bin_id=bin.bin_id, mesh=mesh_array)
-
-# Working for CV36ST_v1_2 with Analytical BC : h0=1e-8, r=1.02 (coarser mesh)
-#for bin in reactor.bins:
-#    if 1 <= bin.bin_id <= 94:
-#        mesh_array = graded_vertices(L=bin.thickness, h0=1e-8, r=1.02)
-#        BINS_MESHES[bin.bin_id] = MeshBin(bin_id=bin.bin_id, mesh=mesh_array)
-#
-#print(f"✓ Generated meshes for {len(BINS_MESHES)} bins")
-
-for bin in reactor.bins:
+    # Bins 1-50: h0=1e-10, r=1.05 (finer mesh for higher resolution)
+    #if 1 <= bin.bin_id <= 50:
+    #    return graded_vertices(L=bin.thickness, h0=1e-10, r=1.05)
+
+    # Working for CV36ST_v1_2 with Analytical BC : h0=1e-8, r=1.02 (coarser mesh)
+    #if 1 <= bin.bin_id <= 94:
+    #    return graded_vertices(L=bin.thickness, h0=1e-8, r=1.02)
+
     if 1 <= bin.bin_id <= 2 and bin.material.name == "W":
-        mesh_array = graded_vertices(L=bin.thickness, h0=5e-10, r=1.03)
-        BINS_MESHES[bin.bin_id] = MeshBin(bin_id=bin.bin_id, mesh=mesh_array)
-print(f"✓ Generated meshes for {len(BINS_MESHES)} bins")
\ No newline at end of file
+        return graded_vertices(L=bin.thickness, h0=5e-10, r=1.03)
+    return None
+
+
+def build_meshes(reactor, bin_ids: Optional[Iterable[int]] = None) -> Mapping[int, MeshBin]:
+    """
+    Meshes of the bins of a reactor, generated on first access of each bin.
+
+    Args:
+        reactor: Reactor loaded by the caller (bin thicknesses and materials)
+        bin_ids: Only mesh these bins (default: every bin)
+
+    Returns:
+        Mapping bin_id -> MeshBin (bins without a custom mesh are absent)
+    """
+    return LazyBinsMeshes(reactor, mesh_for_bin, bin_ids)
+
+
+def _load_reactor_from_context():
+    """Reactor of the input folder given by INPUT_DIR_CONTEXT (default: input_files/)."""
+    input_dir = os.environ.get("INPUT_DIR_CONTEXT", "input_files")
+    csv_path = os.path.join(input_dir, "input_table.csv")
+    materials_path = os.path.join(input_dir, "materials.csv")
+
+    # Import here to ensure we pass materials_csv_path
+    from bins_from_csv.csv_bin_loader import CSVBinLoader
+    return CSVBinLoader(csv_path, materials_csv_path=materials_path).load_reactor()
+
+
+def __getattr__(name):
+    # BINS_MESHES of every bin, built on first access for callers without a reactor
+    if name == "BINS_MESHES":
+        global BINS_MESHES
+        BINS_MESHES = build_meshes(_load_reactor_from_context())
+        return BINS_MESHES
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
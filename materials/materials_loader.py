@@ -3,9 +3,18 @@
 This loader is intentionally tolerant to column naming variations used in
 the materials CSV (e.g., `D0` vs `D_0`, `Mat_density` vs `mat_density`,
 repeated trap columns like `Trap_density_1`, `k_0_1`, ...).
+
+Parsed materials are cached per process, keyed by the resolved path, mtime
+and size of the CSV, so repeated loads (runner, mesh.py, stale_bins.py) are a
+dictionary lookup. Optionally (``serialise=True`` or the environment variable
+``PFC_TT_MATERIALS_CACHE=1``) the parsed materials are also written next to
+the CSV as ``<name>.parsed.json`` and reused by later processes while the CSV
+is unchanged.
 """
+import json
+import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 import pandas as pd
 
@@ -16,10 +25,85 @@ def _is_nan(x):
     return x is None or (isinstance(x, float) and (x != x))
 
 
-def load_materials(csv_path: str | Path = "input_files/materials.csv") -> Dict[str, Material]:
+# resolved CSV path -> (mtime_ns, size, materials)
+_MATERIALS_CACHE: Dict[str, Tuple[int, int, Dict[str, Material]]] = {}
+
+
+def _serialised_path(csv_path: Path) -> Path:
+    return csv_path.with_name(f"{csv_path.stem}.parsed.json")
+
+
+def _read_serialised(csv_path: Path, mtime_ns: int, size: int) -> Optional[Dict[str, Material]]:
+    """Materials of the serialised form, None if missing, unreadable or written for another CSV version."""
+    try:
+        with open(_serialised_path(csv_path), "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("source_mtime_ns") != mtime_ns or data.get("source_size") != size:
+        return None
+    materials = [Material.from_dict(m) for m in data.get("materials", [])]
+    return {mat.name: mat for mat in materials}
+
+
+def _write_serialised(csv_path: Path, mtime_ns: int, size: int, materials: Dict[str, Material]):
+    """Writes the serialised form atomically; read-only folders are ignored."""
+    out_path = _serialised_path(csv_path)
+    tmp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    data = {
+        "source_mtime_ns": mtime_ns,
+        "source_size": size,
+        "materials": [mat.to_dict() for mat in materials.values()],
+    }
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, out_path)
+    except OSError:
+        pass
+
+
+def clear_materials_cache():
+    """Empties the process-level cache of parsed materials."""
+    _MATERIALS_CACHE.clear()
+
+
+def load_materials(
+    csv_path: str | Path = "input_files/materials.csv", serialise: Optional[bool] = None
+) -> Dict[str, Material]:
+    """Loads the materials of a CSV, from the process cache when the file is unchanged.
+
+    Args:
+        csv_path: materials CSV
+        serialise: also read/write ``<name>.parsed.json`` next to the CSV
+            (default: environment variable ``PFC_TT_MATERIALS_CACHE``)
+
+    Returns:
+        material name -> Material. The Material objects are shared between
+        calls and must not be modified.
+    """
     csv_path = Path(csv_path)
     if not csv_path.exists():
         raise FileNotFoundError(f"Materials CSV not found: {csv_path}")
+    if serialise is None:
+        serialise = os.environ.get("PFC_TT_MATERIALS_CACHE", "").lower() in ("1", "true", "yes")
+
+    stat = csv_path.stat()
+    key = str(csv_path.resolve())
+    cached = _MATERIALS_CACHE.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return dict(cached[2])
+
+    materials = _read_serialised(csv_path, stat.st_mtime_ns, stat.st_size) if serialise else None
+    if materials is None:
+        materials = _parse_materials(csv_path)
+        if serialise:
+            _write_serialised(csv_path, stat.st_mtime_ns, stat.st_size, materials)
+    _MATERIALS_CACHE[key] = (stat.st_mtime_ns, stat.st_size, materials)
+    return dict(materials)
+
+
+def _parse_materials(csv_path: Path) -> Dict[str, Material]:
 
     # Try to detect two common layouts by reading raw cells (header=None):
     # 1) Vertical: standard CSV where each ROW is one material and columns are fields.
@@ -1,10 +1,11 @@
 """
 Meshing module for PFC-Tritium-Transport.
 
-This module contains the MeshBin class for mesh management.
+This module contains the MeshBin class for mesh management, the cached
+graded_vertices generator and the LazyBinsMeshes mapping.
 Actual mesh definitions should be in input_files/mesh.py
 """
 
-from meshing.bin_meshing import MeshBin
+from meshing.bin_meshing import LazyBinsMeshes, MeshBin, graded_vertices
 
-__all__ = ["MeshBin"]
+__all__ = ["MeshBin", "LazyBinsMeshes", "graded_vertices"]
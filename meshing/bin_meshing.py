@@ -1,5 +1,8 @@
+import os
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
 import numpy as np
-from typing import Dict
 
 
 class MeshBin:
@@ -7,14 +10,148 @@ class MeshBin:
     def __init__(self, bin_id: int, mesh: np.ndarray):
         """
         Initialize with bin_id and mesh array.
-        
+
         Args:
             bin_id: ID of the bin
             mesh: Array of mesh vertices
         """
         self.bin_id = bin_id
         self.mesh = mesh
-    
+
     def __repr__(self):
         return f"MeshBin(bin_id={self.bin_id}, nodes={len(self.mesh)})"
 
+
+def _graded_vertices(L: float, h0: float, r: float) -> np.ndarray:
+    """
+    Closed-form graded vertices: 0, h0, h0 + h0*r, ... while below L, then L.
+
+    The steps are built with a cumulative product and summed with a sequential
+    cumulative sum, in the same floating point order as adding one step at a
+    time, so the vertices (and mesh hashes) match the former loop exactly.
+    """
+    if L <= 0:
+        return np.array([0.0])
+    if h0 <= 0:
+        raise ValueError(f"h0 must be positive, got {h0}")
+    if r < 1 and h0 / (1 - r) <= L:
+        raise ValueError(f"Steps h0={h0}, r={r} never reach L={L}")
+    # number of steps below L (upper bound, the exact count is found below)
+    if r == 1:
+        n = int(np.ceil(L / h0))
+    elif r > 1:
+        n = int(np.ceil(np.log1p(L * (r - 1) / h0) / np.log(r)))
+    else:
+        n = int(np.ceil(np.log1p(-L * (1 - r) / h0) / np.log(r)))
+    n += 2
+    while True:
+        steps = np.full(n, float(r))
+        steps[0] = h0
+        xs = np.concatenate(([0.0], np.cumsum(np.cumprod(steps))))
+        if xs[-1] >= L:
+            break
+        n *= 2  # rounding in the estimate, extend
+    xs = xs[: np.searchsorted(xs, L, side="left")]
+    return np.append(xs, float(L))
+
+
+_MEMORY_CACHE: Dict[Tuple[str, str, str], np.ndarray] = {}
+
+
+def _cache_key(L: float, h0: float, r: float) -> Tuple[str, str, str]:
+    # exact float representation, so meshes are only shared for identical parameters
+    return float(L).hex(), float(h0).hex(), float(r).hex()
+
+
+def graded_vertices(L: float, h0: float, r: float, cache_dir: Optional[str] = None) -> np.ndarray:
+    """
+    Generate graded mesh vertices from 0 to L.
+
+    Meshes are cached in memory per (L, h0, r) and, when ``cache_dir`` or the
+    environment variable ``PFC_TT_MESH_CACHE`` is set, in ``.npy`` files in that
+    directory, since many bins share thickness and grading.
+
+    Args:
+        L: Domain length (thickness)
+        h0: Initial mesh spacing
+        r: Mesh refinement ratio (> 1 for refinement towards x=0)
+        cache_dir: Directory of the on-disk mesh cache (optional)
+
+    Returns:
+        numpy array of vertex positions (shared between calls, do not modify)
+    """
+    key = _cache_key(L, h0, r)
+    mesh = _MEMORY_CACHE.get(key)
+    if mesh is not None:
+        return mesh
+
+    cache_dir = cache_dir or os.environ.get("PFC_TT_MESH_CACHE")
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(cache_dir, "graded_{}_{}_{}.npy".format(*key).replace("+", ""))
+        try:
+            mesh = np.load(cache_file)
+        except (OSError, ValueError):
+            mesh = None
+
+    if mesh is None:
+        mesh = _graded_vertices(L, h0, r)
+        if cache_file is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_file = f"{cache_file}.{os.getpid()}.tmp.npy"
+                np.save(tmp_file, mesh)
+                os.replace(tmp_file, cache_file)
+            except OSError:
+                pass
+
+    mesh.setflags(write=False)
+    _MEMORY_CACHE[key] = mesh
+    return mesh
+
+
+class LazyBinsMeshes(Mapping):
+    """
+    Mapping bin_id -> MeshBin that generates a bin's mesh on first access.
+
+    Args:
+        reactor: Reactor whose bins are meshed
+        mesh_for_bin: Returns the mesh vertices of a bin, or None for the default mesh
+        bin_ids: Only these bins are part of the mapping (default: every bin)
+    """
+
+    def __init__(
+        self,
+        reactor,
+        mesh_for_bin: Callable[[object], Optional[np.ndarray]],
+        bin_ids: Optional[Iterable[int]] = None,
+    ):
+        selected = None if bin_ids is None else set(bin_ids)
+        self._bins = {
+            bin.bin_id: bin for bin in reactor.bins if selected is None or bin.bin_id in selected
+        }
+        self._mesh_for_bin = mesh_for_bin
+        self._meshes: Dict[int, Optional[MeshBin]] = {}
+
+    def _mesh(self, bin_id) -> Optional[MeshBin]:
+        if bin_id not in self._meshes:
+            bin = self._bins.get(bin_id)
+            vertices = None if bin is None else self._mesh_for_bin(bin)
+            self._meshes[bin_id] = None if vertices is None else MeshBin(bin_id=bin_id, mesh=vertices)
+        return self._meshes[bin_id]
+
+    def __getitem__(self, bin_id) -> MeshBin:
+        mesh = self._mesh(bin_id)
+        if mesh is None:
+            raise KeyError(bin_id)
+        return mesh
+
+    def __iter__(self):
+        return (bin_id for bin_id in self._bins if self._mesh(bin_id) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        generated = sum(1 for mesh in self._meshes.values() if mesh is not None)
+        return f"LazyBinsMeshes(bins={len(self._bins)}, generated={generated})"
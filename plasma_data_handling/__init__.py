@@ -6,6 +6,15 @@ including binned flux data, heat loads, and time-dependent plasma conditions.
 """
 
 from .main import PlasmaDataHandling
+from .backends import BinaryBackend, InMemoryBackend, PlasmaDataBackend, TextCSVBackend
 from .helpers import periodic_pulse_function, periodic_step_function
 
-__all__ = ["PlasmaDataHandling", "periodic_pulse_function", "periodic_step_function"]
+__all__ = [
+    "PlasmaDataHandling",
+    "PlasmaDataBackend",
+    "TextCSVBackend",
+    "BinaryBackend",
+    "InMemoryBackend",
+    "periodic_pulse_function",
+    "periodic_step_function",
+]
@@ -0,0 +1,447 @@
+"""
+Plasma data backends.
+
+A backend serves the binned plasma data tables that ``PlasmaDataHandling``
+reads, and the values of one bin for a pulse type and a time within the pulse
+(``flux``, ``energy``, ``angle``, ``heat``, looked up in those tables). Every table has one row per bin (``Bin_Index``) and the columns
+``Flux_Ion, Flux_Atom, E_ion, E_atom, alpha_ion, alpha_atom, heat_total,
+heat_ion``. A backend holds:
+
+- one steady table per pulse type (FP, ICWC, GDC, ...)
+- time slices of the transient pulse types (RISP, ROSP, ...), keyed by
+  their start time in seconds within the pulse
+- the wall table used outside the strike point slices of transients
+
+The transient pulse types (``transients``) are those with time slices in the
+data (``slice_transients``: the slice folders of the text backend, the slice
+tables of a store, the slices given to the in-memory backend) and, when there
+is a wall table, RISP and ROSP, which read it even without slices.
+
+Backends:
+
+- ``TextCSVBackend``: pandas tables and ``time<t>.dat`` text files in one
+  folder per transient pulse type (``data/RISP_data``, ``data/ROSP_data``,
+  see ``discover_transient_folders``)
+- ``BinaryBackend``: columnar ``.npy`` store, memory-mapped (see
+  ``shared_store.py``)
+- ``InMemoryBackend``: tables built in memory, e.g. from the
+  ``imas_data.wall_loads.PlasmaData`` of an IDS with ``from_plasma_data``,
+  without writing intermediate ``.dat`` files
+"""
+
+import glob
+import hashlib
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ("Bin_Index", "Flux_Ion", "Flux_Atom", "E_ion", "E_atom", "alpha_ion", "alpha_atom", "heat_total", "heat_ion")
+
+# Incidence angles (degrees) used when the source data has none (as in data/*.dat)
+DEFAULT_ION_ANGLE = 60.0
+DEFAULT_ATOM_ANGLE = 45.0
+
+# Transient pulse types read from the wall table when there is one, with or without time slices
+WALL_TRANSIENTS = ("RISP", "ROSP")
+
+_SLICE_FILE = re.compile(r"time(\d+)\.dat$")
+
+
+def _has_slices(folder: Optional[str]) -> bool:
+    return bool(folder) and os.path.isdir(folder) and any(
+        _SLICE_FILE.search(name) for name in os.listdir(folder)
+    )
+
+
+def discover_transient_folders(data_folder: str) -> Dict[str, str]:
+    """Transient pulse type -> folder, for the ``<pulse type>_data`` folders of ``data_folder``.
+
+    Only folders holding ``time<t>.dat`` slices are transient pulse types;
+    other ``*_data`` folders are ignored.
+    """
+    folders = {}
+    for folder in sorted(glob.glob(os.path.join(data_folder, "*_data"))):
+        if _has_slices(folder):
+            folders[os.path.basename(folder)[:-len("_data")]] = folder
+    return folders
+
+
+class PlasmaDataBackend(ABC):
+    """Source of the binned plasma data tables (see module docstring)."""
+
+    @abstractmethod
+    def pulse_types(self) -> List[str]:
+        """Pulse types with a steady table."""
+
+    @abstractmethod
+    def pulse_table(self, pulse_type: str) -> Optional[pd.DataFrame]:
+        """Steady table of a pulse type (None if absent)."""
+
+    @abstractmethod
+    def slice_transients(self) -> List[str]:
+        """Pulse types with time slices."""
+
+    def has_wall_table(self) -> bool:
+        return self.wall_table() is not None
+
+    def transients(self) -> List[str]:
+        """Transient pulse types: those with time slices, plus ``WALL_TRANSIENTS`` if there is a wall table."""
+        transients = list(self.slice_transients())
+        if self.has_wall_table():
+            transients += [transient for transient in WALL_TRANSIENTS if transient not in transients]
+        return transients
+
+    @abstractmethod
+    def slice_times(self, transient: str) -> List[int]:
+        """Sorted start times (s) of the slices of a transient pulse type (empty if absent)."""
+
+    @abstractmethod
+    def slice_table(self, transient: str, time: int) -> pd.DataFrame:
+        """Slice of a transient pulse type starting at ``time`` (one of ``slice_times``)."""
+
+    @abstractmethod
+    def wall_table(self) -> Optional[pd.DataFrame]:
+        """Wall table of transient pulses (None if absent)."""
+
+    def _row_positions(self, name: str, table: pd.DataFrame) -> Dict[int, int]:
+        """Bin_Index -> position of its first row in a table, built once per table."""
+        cache = self.__dict__.setdefault("_row_position_cache", {})
+        if name not in cache:
+            indices = table["Bin_Index"].to_numpy()
+            cache[name] = {int(indices[i]): i for i in range(len(indices) - 1, -1, -1)}
+        return cache[name]
+
+    def bin_row(self, pulse_type: str, bin_index: int, t_rel: Optional[float] = None) -> Optional[pd.Series]:
+        """Row of a bin for a pulse type, None if the bin has no data.
+
+        Transient pulse types (``transients``) use the slice covering ``t_rel``
+        if it holds the bin, the wall table otherwise.
+        """
+        if pulse_type in self.transients():
+            tables = []
+            times = self.slice_times(pulse_type)
+            if t_rel is not None and times:
+                i = int(np.searchsorted(times, t_rel, side="right")) - 1
+                if i >= 0:
+                    tables.append((f"{pulse_type}:{times[i]}", self.slice_table(pulse_type, times[i])))
+            tables.append(("wall", self.wall_table()))
+        else:
+            tables = [(f"pulse_type:{pulse_type}", self.pulse_table(pulse_type))]
+        for name, table in tables:
+            if table is None:
+                continue
+            position = self._row_positions(name, table).get(bin_index)
+            if position is not None:
+                return table.iloc[position]
+        return None
+
+    def flux(self, pulse_type: str, bin_index: int, t_rel: Optional[float] = None, ion: bool = True) -> float:
+        """Particle flux (part/m2/s) of a bin, before pulse and bin scaling (0 without data)."""
+        row = self.bin_row(pulse_type, bin_index, t_rel)
+        return 0.0 if row is None else float(row["Flux_Ion" if ion else "Flux_Atom"])
+
+    def energy(self, pulse_type: str, bin_index: int, t_rel: Optional[float] = None, ion: bool = True):
+        """Incident energy (eV) of a bin, None without data."""
+        row = self.bin_row(pulse_type, bin_index, t_rel)
+        return None if row is None else float(row["E_ion" if ion else "E_atom"])
+
+    def angle(self, pulse_type: str, bin_index: int, t_rel: Optional[float] = None, ion: bool = True):
+        """Incidence angle (degrees) of a bin, None without data."""
+        row = self.bin_row(pulse_type, bin_index, t_rel)
+        return None if row is None else float(row["alpha_ion" if ion else "alpha_atom"])
+
+    def heat(self, pulse_type: str, bin_index: int, t_rel: Optional[float] = None) -> float:
+        """Total surface heat flux (W/m2) of a bin, before radiation and scaling (0 without data)."""
+        row = self.bin_row(pulse_type, bin_index, t_rel)
+        return 0.0 if row is None else float(row["heat_total"])
+
+    def tables(self):
+        """Yields ``(name, table)`` for every table: pulse types, ``<transient>:<time>`` slices and ``wall``."""
+        for pulse_type in self.pulse_types():
+            yield f"pulse_type:{pulse_type}", self.pulse_table(pulse_type)
+        for transient in self.transients():
+            for time in self.slice_times(transient):
+                yield f"{transient}:{time}", self.slice_table(transient, time)
+        wall = self.wall_table()
+        if wall is not None:
+            yield "wall", wall
+
+    def fingerprint(self) -> str:
+        """Hash of the content of every table."""
+        digest = hashlib.sha256()
+        for name, table in self.tables():
+            digest.update(name.encode())
+            digest.update(",".join(map(str, table.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(table, index=True).to_numpy().tobytes())
+        return digest.hexdigest()[:16]
+
+
+class TextCSVBackend(PlasmaDataBackend):
+    """Pulse type DataFrames and transient slice/wall text files, read once when first needed.
+
+    Args:
+        pulse_type_to_data: pulse type -> DataFrame
+        path_to_RISP_data: folder of the RISP ``time<t>.dat`` slices
+        path_to_ROSP_data: folder of the ROSP ``time<t>.dat`` slices
+        path_to_RISP_wall_data: wall data file of transient pulses
+        transient_folders: transient pulse type -> folder of its ``time<t>.dat``
+            slices (e.g. from ``discover_transient_folders``), added to the two above
+    """
+
+    def __init__(
+        self,
+        pulse_type_to_data: Dict[str, pd.DataFrame],
+        path_to_RISP_data: Optional[str] = None,
+        path_to_ROSP_data: Optional[str] = None,
+        path_to_RISP_wall_data: Optional[str] = None,
+        transient_folders: Optional[Dict[str, str]] = None,
+    ):
+        self.pulse_type_to_data = pulse_type_to_data or {}
+        self.path_to_RISP_data = path_to_RISP_data
+        self.path_to_ROSP_data = path_to_ROSP_data
+        self.path_to_RISP_wall_data = path_to_RISP_wall_data
+        folders = {"RISP": path_to_RISP_data, "ROSP": path_to_ROSP_data, **(transient_folders or {})}
+        self.transient_folders = {transient: folder for transient, folder in folders.items() if folder}
+        self._files: Dict[str, pd.DataFrame] = {}
+        self._slice_times: Dict[str, List[int]] = {}
+
+    def pulse_types(self) -> List[str]:
+        return list(self.pulse_type_to_data)
+
+    def pulse_table(self, pulse_type: str) -> Optional[pd.DataFrame]:
+        return self.pulse_type_to_data.get(pulse_type)
+
+    def _read(self, path: str) -> pd.DataFrame:
+        if path not in self._files:
+            self._files[path] = pd.read_csv(path, delimiter=",")
+        return self._files[path]
+
+    def slice_transients(self) -> List[str]:
+        return [transient for transient, folder in self.transient_folders.items() if _has_slices(folder)]
+
+    def slice_times(self, transient: str) -> List[int]:
+        if transient not in self._slice_times:
+            folder = self.transient_folders.get(transient)
+            paths = glob.glob(os.path.join(folder, "time*.dat")) if folder and os.path.isdir(folder) else []
+            matches = (_SLICE_FILE.search(os.path.basename(path)) for path in paths)
+            self._slice_times[transient] = sorted(int(match.group(1)) for match in matches if match)
+        return list(self._slice_times[transient])
+
+    def slice_table(self, transient: str, time: int) -> pd.DataFrame:
+        return self._read(f"{self.transient_folders[transient]}/time{time}.dat")
+
+    def has_wall_table(self) -> bool:
+        return bool(self.path_to_RISP_wall_data) and os.path.exists(self.path_to_RISP_wall_data)
+
+    def wall_table(self) -> Optional[pd.DataFrame]:
+        if not self.has_wall_table():
+            return None
+        return self._read(self.path_to_RISP_wall_data)
+
+    def fingerprint(self) -> str:
+        """Hash of the pulse type tables and of the path, size and mtime of the files (not read)."""
+        digest = hashlib.sha256()
+        for pulse_type in self.pulse_types():
+            table = self.pulse_table(pulse_type)
+            digest.update(pulse_type.encode())
+            digest.update(",".join(map(str, table.columns)).encode())
+            digest.update(pd.util.hash_pandas_object(table, index=True).to_numpy().tobytes())
+        paths = []
+        for transient in self.transients():
+            digest.update(f"transient:{transient}".encode())
+            paths += [f"{self.transient_folders[transient]}/time{time}.dat" for time in self.slice_times(transient)]
+        if self.has_wall_table():
+            paths.append(self.path_to_RISP_wall_data)
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:16]
+
+
+class BinaryBackend(PlasmaDataBackend):
+    """Columnar store written by ``shared_store.build_shared_store``, memory-mapped read-only.
+
+    Args:
+        store_dir: directory of the store
+    """
+
+    def __init__(self, store_dir: str):
+        from .shared_store import open_shared_store
+
+        self.store_dir = store_dir
+        self._manifest, self._read = open_shared_store(store_dir)
+        self._tables: Dict[str, pd.DataFrame] = {}
+        self._slice_times: Dict[str, List[int]] = {}
+        for name in self._manifest["tables"]:
+            transient, _, time = name.rpartition(":")
+            if transient and transient != "pulse_type":
+                self._slice_times.setdefault(transient, []).append(int(time))
+        for times in self._slice_times.values():
+            times.sort()
+
+    def _table(self, name: str) -> Optional[pd.DataFrame]:
+        if name not in self._manifest["tables"]:
+            return None
+        if name not in self._tables:
+            self._tables[name] = self._read(name)
+        return self._tables[name]
+
+    def pulse_types(self) -> List[str]:
+        return [name.split(":", 1)[1] for name in self._manifest["tables"] if name.startswith("pulse_type:")]
+
+    def pulse_table(self, pulse_type: str) -> Optional[pd.DataFrame]:
+        return self._table(f"pulse_type:{pulse_type}")
+
+    def slice_transients(self) -> List[str]:
+        return sorted(self._slice_times)
+
+    def has_wall_table(self) -> bool:
+        return "wall" in self._manifest["tables"]
+
+    def slice_times(self, transient: str) -> List[int]:
+        return list(self._slice_times.get(transient, []))
+
+    def slice_table(self, transient: str, time: int) -> pd.DataFrame:
+        table = self._table(f"{transient}:{time}")
+        if table is None:
+            raise KeyError(f"No {transient} slice at t={time} s in plasma data store {self.store_dir}")
+        return table
+
+    def wall_table(self) -> Optional[pd.DataFrame]:
+        return self._table("wall")
+
+    def fingerprint(self) -> str:
+        return self._manifest["fingerprint"]
+
+
+class InMemoryBackend(PlasmaDataBackend):
+    """Tables held in memory.
+
+    Args:
+        pulse_tables: pulse type -> table
+        slices: transient pulse type -> {start time (s): table}
+        wall: wall table of transient pulses
+    """
+
+    def __init__(
+        self,
+        pulse_tables: Dict[str, pd.DataFrame],
+        slices: Optional[Dict[str, Dict[int, pd.DataFrame]]] = None,
+        wall: Optional[pd.DataFrame] = None,
+    ):
+        self.pulse_tables = dict(pulse_tables)
+        self.slices = {transient: dict(tables) for transient, tables in (slices or {}).items()}
+        self.wall = wall
+
+    @classmethod
+    def from_plasma_data(cls, plasma_data, bins, pulse_types: Optional[Dict[str, str]] = None) -> "InMemoryBackend":
+        """Bins the segments of an ``imas_data.wall_loads.PlasmaData`` onto the bins of a reactor.
+
+        Args:
+            plasma_data: PlasmaData (``pulses``: label -> PlasmaPulse with ``segments``)
+            bins: bins with ``bin_number`` and ``r_start, z_start, r_end, z_end`` (m)
+            pulse_types: pulse type -> PlasmaData label (default: the labels are the pulse types)
+
+        Returns:
+            InMemoryBackend with one steady table per pulse type
+        """
+        pulse_types = pulse_types or {label: label for label in plasma_data.pulses}
+        return cls({
+            pulse_type: segments_to_bin_table(plasma_data.pulses[label].segments, bins)
+            for pulse_type, label in pulse_types.items()
+        })
+
+    def pulse_types(self) -> List[str]:
+        return list(self.pulse_tables)
+
+    def pulse_table(self, pulse_type: str) -> Optional[pd.DataFrame]:
+        return self.pulse_tables.get(pulse_type)
+
+    def slice_transients(self) -> List[str]:
+        return [transient for transient, tables in self.slices.items() if tables]
+
+    def slice_times(self, transient: str) -> List[int]:
+        return sorted(self.slices.get(transient, {}))
+
+    def slice_table(self, transient: str, time: int) -> pd.DataFrame:
+        return self.slices[transient][time]
+
+    def wall_table(self) -> Optional[pd.DataFrame]:
+        return self.wall
+
+
+def _segment_value(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _distance_to_segments(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Distances (points x segments) from points to line segments in the (R, Z) plane."""
+    direction = ends - starts
+    length2 = np.maximum(np.sum(direction**2, axis=1), 1e-300)
+    s = np.clip(np.einsum("pij,ij->pi", points[:, None, :] - starts[None], direction) / length2, 0.0, 1.0)
+    closest = starts[None] + s[..., None] * direction[None]
+    return np.linalg.norm(points[:, None, :] - closest, axis=2)
+
+
+def segments_to_bin_table(segments, bins) -> pd.DataFrame:
+    """Averages wall segment loads over the bins they lie on.
+
+    Each segment is assigned to the bin (by ``bin_number``) closest to its
+    midpoint; a bin's values are the length-weighted averages of its segments.
+    Bins without a segment take the values of the segment closest to their
+    midpoint. ``heat_total`` sums the charged, neutral and radiation heat
+    loads, ``heat_ion`` is the charged one. Missing angles get the defaults.
+
+    Args:
+        segments: PlasmaSegment objects (r1, r2, z1, z2, fluxes, energies, angles, heat loads)
+        bins: bins with ``bin_number`` and ``r_start, z_start, r_end, z_end`` (m)
+
+    Returns:
+        DataFrame with the ``COLUMNS``, indexed by bin number
+    """
+    geometry = {}
+    for bin in bins:
+        geometry.setdefault(bin.bin_number, (bin.r_start, bin.z_start, bin.r_end, bin.z_end))
+    bin_numbers = sorted(geometry)
+    bin_starts = np.array([geometry[n][:2] for n in bin_numbers], dtype=float)
+    bin_ends = np.array([geometry[n][2:] for n in bin_numbers], dtype=float)
+
+    seg_starts = np.array([(s.r1, s.z1) for s in segments], dtype=float)
+    seg_ends = np.array([(s.r2, s.z2) for s in segments], dtype=float)
+    seg_lengths = np.maximum(np.linalg.norm(seg_ends - seg_starts, axis=1), 1e-12)
+    values = np.array([
+        [
+            _segment_value(s.ion_flux, 0.0),
+            _segment_value(s.atom_flux, 0.0),
+            _segment_value(s.ion_energy, 0.0),
+            _segment_value(s.atom_energy, 0.0),
+            _segment_value(s.ion_angle, DEFAULT_ION_ANGLE),
+            _segment_value(s.atom_angle, DEFAULT_ATOM_ANGLE),
+            _segment_value(s.charged_heat_load, 0.0) + _segment_value(s.neutral_heat_load, 0.0)
+            + _segment_value(s.radiation_heat_load, 0.0),
+            _segment_value(s.charged_heat_load, 0.0),
+        ]
+        for s in segments
+    ])
+
+    owner = np.argmin(_distance_to_segments(0.5 * (seg_starts + seg_ends), bin_starts, bin_ends), axis=1)
+    weights = np.zeros((len(bin_numbers), len(segments)))
+    weights[owner, np.arange(len(segments))] = seg_lengths
+    empty = weights.sum(axis=1) == 0
+    if np.any(empty):
+        nearest = np.argmin(
+            _distance_to_segments(0.5 * (bin_starts[empty] + bin_ends[empty]), seg_starts, seg_ends), axis=1
+        )
+        weights[np.flatnonzero(empty), nearest] = 1.0
+    binned = weights @ values / weights.sum(axis=1, keepdims=True)
+
+    table = pd.DataFrame(binned, columns=COLUMNS[1:], index=pd.Index(bin_numbers))
+    table.insert(0, "Bin_Index", bin_numbers)
+    return table
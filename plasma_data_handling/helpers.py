@@ -11,21 +11,28 @@ from scenario import Pulse
 def periodic_pulse_function(current_time: float, pulse: Pulse, value, value_off=343.0):
     """Creates bake function with ramp up rate and ramp down rate.
 
+    The waveform is periodic with period ``pulse.total_duration``, so that every
+    repetition of a pulse row (``nb_pulses > 1``) has the same ramps.
+
     Args:
-        current_time (float): time within the pulse 
+        current_time (float): time since the start of the pulse row
         pulse (Pulse): pulse of HISP Pulse class
         value (float): steady-state value 
         value_off (float): value at t=0 and t=final time. 
     """
-    
+    # time within the current repetition of the pulse
+    time_in_pulse = current_time % pulse.total_duration
+
     if current_time == pulse.total_duration:
         return value_off
-    elif current_time % pulse.total_duration < pulse.ramp_up:  # ramp up 
-        return (value - value_off) / (pulse.ramp_up) * current_time + value_off  # y = mx + b, slope is temp/ramp up time
-    elif current_time % pulse.total_duration < pulse.ramp_up + pulse.steady_state:  # steady state
+    elif time_in_pulse < pulse.ramp_up:  # ramp up 
+        return (value - value_off) / (pulse.ramp_up) * time_in_pulse + value_off  # y = mx + b, slope is temp/ramp up time
+    elif time_in_pulse < pulse.ramp_up + pulse.steady_state:  # steady state
         return value
+    elif pulse.ramp_down == 0:  # waiting
+        return value_off
     else:  # ramp down, waiting
-        lower_value = value - (value - value_off)/pulse.ramp_down * (current_time - (pulse.ramp_up + pulse.steady_state))  # y = mx + b, slope is temp/ramp down time
+        lower_value = value - (value - value_off)/pulse.ramp_down * (time_in_pulse - (pulse.ramp_up + pulse.steady_state))  # y = mx + b, slope is temp/ramp down time
         if lower_value >= value_off: 
             return lower_value
         else: 
@@ -15,32 +15,149 @@ from .helpers import periodic_step_function, periodic_pulse_function
 from scenario import Pulse
 import pandas as pd
 
-from typing import Dict
+from typing import Dict, Optional
 from hisp.bin import Bin
 
+from .backends import BinaryBackend, InMemoryBackend, PlasmaDataBackend, TextCSVBackend
+from .transients import TransientData
 
-class PlasmaDataHandling:
-    _time_to_RISP_data: Dict[str, pd.DataFrame]
 
+class PlasmaDataHandling:
     def __init__(
         self,
-        pulse_type_to_data: Dict[str, pd.DataFrame],
-        path_to_RISP_data: str,
-        path_to_ROSP_data: str,
-        path_to_RISP_wall_data: str,
+        pulse_type_to_data: Optional[Dict[str, pd.DataFrame]] = None,
+        path_to_RISP_data: Optional[str] = None,
+        path_to_ROSP_data: Optional[str] = None,
+        path_to_RISP_wall_data: Optional[str] = None,
+        transient_folders: Optional[Dict[str, str]] = None,
+        backend: Optional[PlasmaDataBackend] = None,
+        strike_point: bool = False,
+        interpolate_transients: bool = False,
     ):
-        self.pulse_type_to_data = pulse_type_to_data or {}
-        self.path_to_RISP_data = path_to_RISP_data
-        self.path_to_ROSP_data = path_to_ROSP_data
-        self.path_to_RISP_wall_data = path_to_RISP_wall_data
-        # check that the values in pulse_type_to_data are pandas DataFrames
-        for value in self.pulse_type_to_data.values():
-            if not isinstance(value, pd.DataFrame):
-                raise TypeError(
-                    f"Expected a pandas DataFrame in pulse_type_to_data, got {type(value)} instead"
-                )
-
-        self._time_to_RISP_data = {}
+        """Plasma data read from text files (the default) or from a backend.
+
+        Args:
+            pulse_type_to_data: pulse type -> DataFrame (text backend)
+            path_to_RISP_data: folder of the RISP ``time<t>.dat`` slices (text backend)
+            path_to_ROSP_data: folder of the ROSP ``time<t>.dat`` slices (text backend)
+            path_to_RISP_wall_data: wall data file of transient pulses (text backend)
+            transient_folders: transient pulse type -> folder of its ``time<t>.dat`` slices
+                (text backend, see ``backends.discover_transient_folders``)
+            backend: PlasmaDataBackend serving the tables, replaces the arguments above
+            strike_point: divertor bins held by the slices of a transient pulse type
+                (RISP, ROSP) read them during the plasma-on part of the pulse; otherwise
+                transient pulses always read the wall table
+            interpolate_transients: interpolate linearly between transient slices
+        """
+        if backend is None:
+            # check that the values in pulse_type_to_data are pandas DataFrames
+            for value in (pulse_type_to_data or {}).values():
+                if not isinstance(value, pd.DataFrame):
+                    raise TypeError(
+                        f"Expected a pandas DataFrame in pulse_type_to_data, got {type(value)} instead"
+                    )
+            backend = TextCSVBackend(
+                pulse_type_to_data, path_to_RISP_data, path_to_ROSP_data, path_to_RISP_wall_data, transient_folders
+            )
+        self.backend = backend
+        self.pulse_type_to_data = {pulse_type: backend.pulse_table(pulse_type) for pulse_type in backend.pulse_types()}
+        self.path_to_RISP_data = getattr(backend, "path_to_RISP_data", None)
+        self.path_to_ROSP_data = getattr(backend, "path_to_ROSP_data", None)
+        self.path_to_RISP_wall_data = getattr(backend, "path_to_RISP_wall_data", None)
+        self.transient_types = set(backend.transients())
+        self.strike_point = strike_point
+        self.interpolate_transients = interpolate_transients
+        self._transients: Dict[str, TransientData] = {}
+        self._wall_rows: Optional[Dict[int, Dict[str, float]]] = None
+
+    @classmethod
+    def from_backend(cls, backend: PlasmaDataBackend, **options) -> "PlasmaDataHandling":
+        """Builds a PlasmaDataHandling reading its tables from a backend (see backends.py).
+
+        ``options`` are the ``strike_point`` and ``interpolate_transients`` flags.
+        """
+        return cls(backend=backend, **options)
+
+    @classmethod
+    def from_plasma_data(
+        cls, plasma_data, bins, pulse_types: Optional[Dict[str, str]] = None, **options
+    ) -> "PlasmaDataHandling":
+        """Builds a PlasmaDataHandling from an ``imas_data.wall_loads.PlasmaData`` binned onto ``bins``.
+
+        See ``InMemoryBackend.from_plasma_data``.
+        """
+        return cls.from_backend(InMemoryBackend.from_plasma_data(plasma_data, bins, pulse_types), **options)
+
+    @classmethod
+    def from_shared_store(cls, store_dir: str, **options) -> "PlasmaDataHandling":
+        """Builds a PlasmaDataHandling reading every table from a shared store.
+
+        The pulse type tables and the RISP/ROSP files are memory-mapped views
+        of the store, shared by all processes of a node that open it.
+
+        Args:
+            store_dir: store written by ``shared_store.build_shared_store``
+            options: ``strike_point`` and ``interpolate_transients`` flags
+
+        Returns:
+            PlasmaDataHandling object
+        """
+        return cls.from_backend(BinaryBackend(store_dir), **options)
+
+    def to_shared_store(self, store_root: str) -> str:
+        """Writes the tables to a shared store under ``store_root`` (if not there yet) and returns its path."""
+        from .shared_store import ensure_shared_store
+
+        return ensure_shared_store(store_root, self.backend)
+
+    @property
+    def options(self) -> dict:
+        """Flags of the transient data lookup (``from_backend`` options)."""
+        return {"strike_point": self.strike_point, "interpolate_transients": self.interpolate_transients}
+
+    def is_transient(self, pulse_type: str) -> bool:
+        """True for pulse types read from time slices and the wall table (RISP, ROSP, ...)."""
+        return pulse_type in self.transient_types
+
+    def transient_data(self, pulse_type: str) -> TransientData:
+        """Slices of a transient pulse type, loaded on first use."""
+        if pulse_type not in self._transients:
+            self._transients[pulse_type] = TransientData(self.backend, pulse_type, self.interpolate_transients)
+        return self._transients[pulse_type]
+
+    def wall_row(self, bin_index: int) -> Optional[Dict[str, float]]:
+        """Row of a bin in the wall table of transient pulses (None if absent)."""
+        if self._wall_rows is None:
+            wall = self.backend.wall_table()
+            records = [] if wall is None else wall.to_dict(orient="records")
+            self._wall_rows = {}
+            for record in records:
+                if int(record["Bin_Index"]) in self._wall_rows:
+                    raise ValueError(f"More than one row for bin {int(record['Bin_Index'])} in the wall table")
+                self._wall_rows[int(record["Bin_Index"])] = record
+        return self._wall_rows.get(bin_index)
+
+    def transient_row(self, pulse: Pulse, bin: Bin, t_rel: float) -> Optional[Dict[str, float]]:
+        """Data row of a bin during a transient pulse, None if the bin has no data.
+
+        Args:
+            pulse: the pulse object (RISP, ROSP, ...)
+            bin: Bin object
+            t_rel: time since the start of the pulse (s), repetitions included
+
+        Returns:
+            the bin's values in the slice covering the time when ``strike_point``
+            is set and the bin is a divertor bin held by the slice, otherwise its
+            wall table row
+        """
+        t_rel_within_a_single_pulse = t_rel % pulse.total_duration
+        if self.strike_point and bin.is_divertor:
+            row = self.transient_data(pulse.pulse_type).row(
+                bin.bin_number, t_rel_within_a_single_pulse, pulse.duration_no_waiting
+            )
+            if row is not None:
+                return row
+        return self.wall_row(bin.bin_number)
 
     def get_particle_flux(
         self, pulse: Pulse, bin: Bin, t_rel: float, ion=True
@@ -71,26 +188,14 @@ class PlasmaDataHandling:
 
         if pulse.pulse_type == "FP":
             flux = self.pulse_type_to_data[pulse.pulse_type][flux_header][bin_index]
-        elif pulse.pulse_type == "RISP":
+        elif self.is_transient(pulse.pulse_type):
             assert isinstance(
                 t_rel, float
             ), f"t_rel should be a float, not {type(t_rel)}"
 
-            t_rel_within_a_single_risp = t_rel % pulse.total_duration
-
-            data = self.RISP_data(bin, t_rel=t_rel_within_a_single_risp)
-
-            flux = data[flux_header]
-
-            # take the single value from the series
-            if isinstance(flux, pd.Series):
-                if flux.values.size == 0:
-                    flux = 0.0
-                else:
-                    assert (
-                        flux.values.size == 1
-                    ), f"flux should be a single value, values: {flux.values}"
-                    flux = flux.values[0]
+            row = self.transient_row(pulse, bin, t_rel)
+            # no flux for bins without data
+            flux = 0.0 if row is None else float(row[flux_header])
         elif pulse.pulse_type == "BAKE":
             flux = 0.0
         else:
@@ -117,89 +222,6 @@ class PlasmaDataHandling:
             value_off=0,
         )
 
-    def RISP_data(self, bin: Bin, t_rel: float | int) -> pd.DataFrame:
-        """Returns the correct RISP data file for indicated bin
-
-        Args:
-            bin: Bin object
-            t_rel: relative time (in seconds).
-                t_rel = t - t_pulse_start where t_pulse_start is the start of the pulse in seconds
-
-        Returns:
-            data: data from correct file as a numpy array
-        """
-        # Use zero-based bin index for CSV bins (matches bin.bin_number now)
-        bin_index = bin.bin_number
-        
-        # Determine if it's a divertor based on location
-        div = bin.is_divertor
-        
-        # For CSV bins, determine strike point based on specific modes or locations
-        # This can be refined based on your specific CSV data structure
-        strike_point = False  # Default to False, can be customized later
-        
-        if div and strike_point:
-            # Use RISP or ROSP data paths (this logic can be refined)
-            folder = self.path_to_RISP_data
-        elif div:
-            # For divertor bins without strike point
-            folder = self.path_to_RISP_data
-            strike_point = False
-
-        t_rel = int(t_rel)
-
-        if div and strike_point:
-            if 0 <= t_rel <= 9:
-                key = f"{folder}_1_9"
-                if key not in self._time_to_RISP_data.keys():
-                    self._time_to_RISP_data[key] = pd.read_csv(
-                        f"{folder}/time0.dat", delimiter=","
-                    )
-                data = self._time_to_RISP_data[key]
-            elif 10 <= t_rel <= 98:
-                key = f"{folder}_10_98"
-                if key not in self._time_to_RISP_data.keys():
-                    self._time_to_RISP_data[key] = pd.read_csv(
-                        f"{folder}/time10.dat", delimiter=","
-                    )
-                data = self._time_to_RISP_data[key]
-            elif 100 <= t_rel <= 260:
-                key = f"{folder}_{t_rel}"
-                if key not in self._time_to_RISP_data.keys():
-                    self._time_to_RISP_data[key] = pd.read_csv(
-                        f"{folder}/time{t_rel}.dat", delimiter=","
-                    )
-                data = self._time_to_RISP_data[key]
-            elif 261 <= t_rel <= 270:
-                key = f"{folder}_261_269"
-                if key not in self._time_to_RISP_data.keys():
-                    self._time_to_RISP_data[key] = pd.read_csv(
-                        f"{folder}/time260.dat", delimiter=","
-                    )
-                data = self._time_to_RISP_data[key]
-            else:  # NOTE: so if time is too large a MB transforms into a FW element???
-                key = "wall_data"
-                if key not in self._time_to_RISP_data.keys():
-                    self._time_to_RISP_data[key] = pd.read_csv(
-                        self.path_to_RISP_wall_data, delimiter=","
-                    )
-                data = self._time_to_RISP_data[key]
-        else:
-            key = "wall_data"
-            if key not in self._time_to_RISP_data.keys():
-                self._time_to_RISP_data[key] = pd.read_csv(
-                    self.path_to_RISP_wall_data, delimiter=","
-                )
-            data = self._time_to_RISP_data[key]
-
-        data_for_bin = data.loc[data["Bin_Index"] == bin_index]
-
-        # check there is only one row for this bin
-        assert (
-            data_for_bin.shape[0] <= 1
-        ), f"More than one row for bin {bin_index}. t_rel: {t_rel}, div: {div}, strike_point: {strike_point}"
-        return data_for_bin
-
     def get_heat(self, pulse: Pulse, bin: Bin, t_rel: float) -> float:
         """Returns the surface heat flux (W/m2) for a given pulse type
 
@@ -218,9 +240,9 @@ class PlasmaDataHandling:
         # Use bin_number for CSV bins (now 0-based, matches DataFrame row index)
         bin_index = bin.bin_number
 
-        if pulse.pulse_type == "RISP":
-            t_rel_within_a_single_risp = t_rel % pulse.total_duration
-            data = self.RISP_data(bin, t_rel=t_rel_within_a_single_risp)
+        transient = self.is_transient(pulse.pulse_type)
+        if transient:
+            row = self.transient_row(pulse, bin, t_rel)
         elif pulse.pulse_type in self.pulse_type_to_data.keys():
             data = self.pulse_type_to_data[pulse.pulse_type]
         else:
@@ -234,24 +256,19 @@ class PlasmaDataHandling:
             # Use ion_scaling_factor as wetted fraction (same logic as original)
             heat_val = heat_total - heat_ion * (1 - bin.ion_scaling_factor)
                 
-        elif pulse.pulse_type == "RISP":
+        elif transient:
             photon_radiation_heat = 0.11e6  # W/m2
-            
-            # For CSV bins - use ion_scaling_factor as wetted fraction
-            heat_total = data["heat_total"] + photon_radiation_heat 
-            heat_ion = data["heat_ion"]
-            heat_val = heat_total - heat_ion * (1 - bin.ion_scaling_factor)
 
-            # if heat_val is an empty pandas Series set it at 0.0 (no heat)
-            # otherwise take the single value from the series
-            if isinstance(heat_val, pd.Series):
-                if heat_val.values.size == 0:
-                    heat_val = 0.0
-                else:
-                    assert (
-                        heat_val.values.size == 1
-                    ), f"heat_val should be a single value, values: {heat_val.values}"
-                    heat_val = heat_val.values[0]
+            if row is None:
+                # no heat for bins without data
+                heat_val = 0.0
+            else:
+                # For CSV bins - use ion_scaling_factor as wetted fraction
+                heat_total = float(row["heat_total"]) + photon_radiation_heat
+                if "heat_ion" not in row:
+                    raise KeyError(f"No heat_ion for bin {bin_index} in the {pulse.pulse_type} data at t={t_rel} s")
+                heat_ion = float(row["heat_ion"])
+                heat_val = heat_total - heat_ion * (1 - bin.ion_scaling_factor)
         else:
             heat_val = data["heat_total"][bin_index]
 
@@ -0,0 +1,130 @@
+"""
+Read-only plasma data store shared by the workers of a node.
+
+Every worker of a node normally reads its own pandas copy of the pulse type
+tables and of every RISP/ROSP file it needs. A shared store holds each column
+of these tables as one ``.npy`` file, opened with ``mmap_mode="r"``: the
+DataFrames of all workers are views of the same page cache, so memory per
+worker stays flat however large the RISP/ROSP datasets are. The store is read
+through ``backends.BinaryBackend``.
+
+Layout::
+
+    <store_root>/<fingerprint>/manifest.json
+    <store_root>/<fingerprint>/tables/<i>/<column index>.npy
+
+The tables are those of ``PlasmaDataBackend.tables`` (pulse types,
+``<transient>:<time>`` slices and ``wall``). The fingerprint is the source
+backend's (``PlasmaDataBackend.fingerprint``), so changed data gets a new
+store next to the old one. Stores of data files can instead be keyed by the
+path, size and mtime of the files (``files_fingerprint``): workers then open
+an existing store without reading the files at all (``ensure_files_store``). A store is written to a temporary directory and
+renamed into place: concurrent workers building the same store keep the
+first one. Put ``<store_root>`` on node-local storage (e.g. ``/dev/shm``) or
+on a shared filesystem, where all nodes reuse it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Callable, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+STORE_VERSION = 2
+
+
+def _write_table(directory: str, table: pd.DataFrame) -> dict:
+    os.makedirs(directory)
+    for i, column in enumerate(table.columns):
+        np.save(os.path.join(directory, f"{i}.npy"), np.ascontiguousarray(table[column].to_numpy()))
+    index = None if isinstance(table.index, pd.RangeIndex) else table.index.tolist()
+    return {"columns": [str(column) for column in table.columns], "index": index}
+
+
+def _read_table(directory: str, spec: dict) -> pd.DataFrame:
+    columns = {
+        column: np.load(os.path.join(directory, f"{i}.npy"), mmap_mode="r")
+        for i, column in enumerate(spec["columns"])
+    }
+    # copy=False keeps one block per memory-mapped column instead of consolidating them
+    return pd.DataFrame(columns, index=spec["index"], copy=False)
+
+
+def build_shared_store(store_dir: str, backend) -> str:
+    """Writes the tables of a PlasmaDataBackend to ``store_dir`` (atomically, kept if it already exists).
+
+    Returns:
+        store_dir
+    """
+    if os.path.exists(os.path.join(store_dir, MANIFEST)):
+        return store_dir
+    parent = os.path.dirname(os.path.abspath(store_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".building-", dir=parent)
+    try:
+        manifest = {"version": STORE_VERSION, "fingerprint": backend.fingerprint(), "tables": {}}
+        for i, (name, table) in enumerate(backend.tables()):
+            spec = _write_table(os.path.join(tmp_dir, "tables", str(i)), table)
+            manifest["tables"][name] = {"directory": f"tables/{i}", **spec}
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(tmp_dir, store_dir)
+        except OSError:
+            # another worker renamed its copy first
+            if not os.path.exists(os.path.join(store_dir, MANIFEST)):
+                raise
+    finally:
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return store_dir
+
+
+def ensure_shared_store(store_root: str, backend) -> str:
+    """Returns the store of a PlasmaDataBackend under ``store_root``, building it if needed."""
+    return build_shared_store(os.path.join(store_root, backend.fingerprint()), backend)
+
+
+def files_fingerprint(paths: Iterable[str]) -> str:
+    """Hash of the real path, size and mtime of files (their content is not read)."""
+    digest = hashlib.sha256()
+    for path in sorted(os.path.realpath(path) for path in paths):
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def ensure_files_store(store_root: str, paths: Iterable[str], make_backend: Callable[[], object]) -> str:
+    """Returns the store of data files under ``store_root``, keyed by ``files_fingerprint(paths)``.
+
+    ``make_backend`` builds the PlasmaDataBackend reading the files; it is only
+    called when the store does not exist yet.
+    """
+    store_dir = os.path.join(store_root, f"files-{files_fingerprint(paths)}")
+    if os.path.exists(os.path.join(store_dir, MANIFEST)):
+        return store_dir
+    return build_shared_store(store_dir, make_backend())
+
+
+def open_shared_store(store_dir: str) -> Tuple[dict, Callable[[str], pd.DataFrame]]:
+    """Opens a store built by ``build_shared_store``.
+
+    Returns:
+        (manifest, read) where ``read(name)`` memory-maps the table ``name``
+    """
+    with open(os.path.join(store_dir, MANIFEST), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(f"Plasma data store {store_dir} has version {manifest.get('version')}, "
+                         f"expected {STORE_VERSION}. Rebuild it.")
+
+    def read(name: str) -> pd.DataFrame:
+        spec = manifest["tables"][name]
+        return _read_table(os.path.join(store_dir, spec["directory"]), spec)
+
+    return manifest, read
@@ -0,0 +1,99 @@
+"""
+Time-resolved data of transient pulse types (RISP, ROSP, ...).
+
+The slices of a transient pulse type are the tables its backend lists
+(``PlasmaDataBackend.slice_times``, e.g. the ``time<t>.dat`` files of a
+folder). They are loaded once into one array per pulse type and indexed by
+time: the slice starting at ``t_i`` covers ``[t_i, t_{i+1})`` and the last one
+covers until the end of the plasma-on part of the pulse. Outside the slices
+(before the first one, after the plasma-on part, or for bins a slice does not
+hold) the wall table applies. With ``interpolate``, values are interpolated
+linearly between consecutive slices holding the bin.
+
+A new transient dataset only needs its slices in the backend (for the text
+backend, a folder of ``time<t>.dat`` files).
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from .backends import COLUMNS
+
+QUANTITIES = COLUMNS[1:]
+
+
+class TransientData:
+    """Slices of one transient pulse type for every bin they hold.
+
+    The values are read from the columns of the backend tables, which are not
+    copied: with a ``BinaryBackend`` they stay memory-mapped views of the
+    store shared by the processes of a node. Only the row of every bin in
+    every slice is held (``rows``, -1 where a slice does not hold the bin).
+
+    Args:
+        backend: PlasmaDataBackend holding the slices
+        transient: pulse type of the slices (e.g. "RISP")
+        interpolate: interpolate linearly between slices instead of holding the latest one
+    """
+
+    def __init__(self, backend, transient: str, interpolate: bool = False):
+        self.transient = transient
+        self.interpolate = interpolate
+        self.times = np.array(backend.slice_times(transient), dtype=float)
+        tables = [backend.slice_table(transient, int(time)) for time in self.times]
+        bin_indices = [table["Bin_Index"].to_numpy().astype(int) for table in tables]
+        all_bins = sorted({int(b) for indices in bin_indices for b in indices})
+        self._position = {bin_index: i for i, bin_index in enumerate(all_bins)}
+        # slices x bins: row of the bin in the slice; columns absent from a slice (e.g. heat_ion) are None
+        self.rows = np.full((len(tables), len(all_bins)), -1, dtype=np.int32)
+        self._columns = []
+        for i, (table, indices) in enumerate(zip(tables, bin_indices)):
+            self.rows[i, [self._position[int(b)] for b in indices]] = np.arange(len(indices))
+            self._columns.append([
+                table[column].to_numpy() if column in table.columns else None for column in QUANTITIES
+            ])
+
+    def __contains__(self, bin_index: int) -> bool:
+        return bin_index in self._position
+
+    def _values(self, i: int, row: int) -> np.ndarray:
+        """Quantities of a row of slice ``i`` (NaN for absent columns)."""
+        return np.array([np.nan if column is None else float(column[row]) for column in self._columns[i]])
+
+    def slice_index(self, t_rel: float, t_end: float) -> int:
+        """Index of the slice covering ``t_rel`` (-1 outside ``[first slice, t_end)``)."""
+        if len(self.times) == 0 or t_rel < self.times[0] or t_rel >= t_end:
+            return -1
+        return int(np.searchsorted(self.times, t_rel, side="right")) - 1
+
+    def row(self, bin_index: int, t_rel: float, t_end: float) -> Optional[Dict[str, float]]:
+        """Values of a bin at ``t_rel`` within the pulse, None where the wall table applies.
+
+        Columns absent from the slice are left out.
+
+        Args:
+            bin_index: Bin_Index of the bin
+            t_rel: time since the start of the (single) pulse (s)
+            t_end: end of the plasma-on part of the pulse (s)
+        """
+        position = self._position.get(bin_index)
+        i = self.slice_index(t_rel, t_end)
+        if position is None or i < 0 or self.rows[i, position] < 0:
+            return None
+        values = self._values(i, self.rows[i, position])
+        if self.interpolate and i + 1 < len(self.times) and self.rows[i + 1, position] >= 0:
+            weight = (t_rel - self.times[i]) / (self.times[i + 1] - self.times[i])
+            values = (1 - weight) * values + weight * self._values(i + 1, self.rows[i + 1, position])
+        return {quantity: value for quantity, value in zip(QUANTITIES, values) if not np.isnan(value)}
+
+    def bin_values(self, bin_index: int) -> Optional[np.ndarray]:
+        """Slices x quantities of a bin (NaN where a slice does not hold it), None if no slice does."""
+        position = self._position.get(bin_index)
+        if position is None:
+            return None
+        values = np.full((len(self.times), len(QUANTITIES)), np.nan)
+        for i, row in enumerate(self.rows[:, position]):
+            if row >= 0:
+                values[i] = self._values(i, row)
+        return values
@@ -0,0 +1,330 @@
+"""
+Streaming reactor-wide inventory aggregation over result JSON files.
+
+Result files are parsed in parallel by ``results_reader.ResultsReader`` (only
+the keys used here) and added one at a time. Each inventory series is resampled onto
+a common time grid (every ``interval`` seconds) with a single vectorised
+``searchsorted`` (nearest sample, as ``find_nearest_index``) or ``np.interp``
+call, weighted by the surface area of its input table row and accumulated in
+preallocated arrays:
+
+- totals[component, material, species, t]   component: wall/divertor,
+                                             material: W/B/SS/other, species: D/T
+- per bin: bin_totals[bin_number][material, species, t]
+
+The time grid grows while files are streamed: grid points beyond the end of an
+already processed series take its last value, which is what nearest-sample
+resampling gives on the final grid.
+
+Usage:
+    from inventory_aggregator import AreaTable, InventoryAggregator
+
+    areas = AreaTable.from_input_table(INPUT_TABLE_CSV)
+    aggregator = InventoryAggregator(areas, interval=100.0)
+    aggregator.add_files(sorted(RESULTS_DIR.glob("*.json")))   # use_pyramids=True reads <stem>.pyramid.npz when up to date
+    W_wall_T = aggregator.total("wall", "W", "T")
+"""
+
+import csv
+import re
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from pyramids import read_raw_series
+from results_reader import ResultsReader
+
+COMPONENTS = ("wall", "divertor")
+MATERIALS = ("W", "B", "SS", "other")
+SPECIES = ("D", "T")
+
+AVOGADRO = 6.02214076e23  # atoms/mol
+TRITIUM_MASS = 3.0160492  # g/mol
+
+RESULT_METADATA_KEYS = ("t", "bin_number", "mode", "material")
+
+
+def mode_category(mode: Optional[str]) -> Optional[str]:
+    """Maps a bin mode (input table or filename) to high/low/shadow."""
+    if not mode:
+        return None
+    mode = mode.lower()
+    if "high" in mode:
+        return "high"
+    if "low" in mode:
+        return "low"
+    if "shadow" in mode:
+        return "shadow"
+    if "wetted" in mode:
+        return "high"  # default wetted to high
+    return None
+
+
+def material_group(name: str) -> str:
+    """Maps a material name to one of MATERIALS."""
+    name = name.strip().lower()
+    if name in ("w", "tungsten"):
+        return "W"
+    if name in ("b", "boron"):
+        return "B"
+    if name in ("ss", "steel", "stainless steel", "stainless_steel"):
+        return "SS"
+    return "other"
+
+
+def material_from_result(data: dict) -> str:
+    """Material group of a result: its ``material`` entry, or the trap-count heuristic of older results."""
+    if isinstance(data.get("material"), str):
+        return material_group(data["material"])
+    traps = [k for k in data.keys() if "trap" in k.lower()]
+    return "W" if len(traps) == 4 else "B"
+
+
+def species_of_key(key: str) -> Optional[str]:
+    """Returns the species summed for a quantity key (None for fluxes and mixed keys)."""
+    if "flux" in key.lower():
+        return None
+    if "T" in key:
+        return "T"
+    if "D" in key:
+        return "D"
+    return None
+
+
+def inventory_key(key: str) -> bool:
+    """Key selector of the result entries used by the aggregation (picklable for process pools)."""
+    return key in RESULT_METADATA_KEYS or species_of_key(key) is not None or "trap" in key.lower()
+
+
+def parse_result_stem(stem: str) -> Tuple[Optional[int], Optional[str]]:
+    """Extracts (bin_number, mode category) from a result filename.
+
+    Supports ``id_{id}_bin_num_{bin_number}_{material}_{mode}`` and the older
+    ``wall_bin_{n}_sub_bin_{mode}`` / ``div_bin_{n}`` formats.
+    """
+    match = re.search(r"_num_(\d+)", stem) or re.search(r"(?:wall|div)_bin_(\d+)", stem)
+    if not match:
+        return None, None
+    mode = stem.split("sub_bin_", 1)[1] if "sub_bin_" in stem else stem
+    return int(match.group(1)), mode_category(mode.replace("_", ""))
+
+
+class AreaTable:
+    """Surface areas and components of the input table rows.
+
+    Rows are keyed by (bin number, mode category). Wall bins also record the
+    parent bin area, used for results without a mode.
+    """
+
+    def __init__(self):
+        self.rows: Dict[Tuple[int, Optional[str]], Tuple[str, float]] = {}
+        self.parent_areas: Dict[int, float] = {}
+
+    @classmethod
+    def from_input_table(cls, csv_path) -> "AreaTable":
+        table = cls()
+        with open(csv_path, "r", newline="") as f:
+            for row in csv.DictReader(f):
+                bin_number = int(row["Bin number"])
+                area = float(row["Surface area (m^2)"])
+                if row["location"].upper() in ("DIV", "DIVERTOR"):
+                    table.rows[(bin_number, None)] = ("divertor", area)
+                    continue
+                table.parent_areas.setdefault(bin_number, float(row["S. Area parent bin (m^2)"]))
+                table.rows[(bin_number, mode_category(row["mode"]))] = ("wall", area)
+        return table
+
+    def lookup(self, bin_number: int, mode: Optional[str]) -> Optional[Tuple[str, float]]:
+        """Returns (component, area) of a result, None if the bin is unknown."""
+        if (bin_number, mode) in self.rows:
+            return self.rows[(bin_number, mode)]
+        if (bin_number, None) in self.rows:
+            return self.rows[(bin_number, None)]
+        if mode is None and bin_number in self.parent_areas:
+            return "wall", self.parent_areas[bin_number]
+        return None
+
+    def bin_numbers(self, component: Optional[str] = None):
+        return sorted({b for (b, _), (c, _) in self.rows.items() if component in (None, c)})
+
+
+def resample(t: np.ndarray, values: np.ndarray, targets: np.ndarray, method: str = "nearest") -> np.ndarray:
+    """Resamples a series onto target times in one vectorised call.
+
+    ``nearest`` picks, for every target, the first sample with the smallest
+    distance (same as ``np.abs(t - target).argmin()`` on sorted ``t``);
+    ``linear`` interpolates, holding the end values outside the series.
+    """
+    if method == "linear":
+        return np.interp(targets, t, values)
+    right = np.clip(np.searchsorted(t, targets, side="left"), 0, len(t) - 1)
+    left = np.clip(right - 1, 0, len(t) - 1)
+    use_left = np.abs(t[left] - targets) <= np.abs(t[right] - targets)
+    nearest = np.where(use_left, left, right)
+    # first occurrence of the chosen time (repeated times at stage boundaries)
+    nearest = np.searchsorted(t, t[nearest], side="left")
+    return values[nearest]
+
+
+class InventoryAggregator:
+    """Accumulates area-weighted inventories of result files on a common time grid.
+
+    Args:
+        areas: AreaTable of the input table
+        interval: spacing of the common time grid (s)
+        method: ``nearest`` or ``linear`` resampling
+    """
+
+    def __init__(self, areas: AreaTable, interval: float = 100.0, method: str = "nearest"):
+        self.areas = areas
+        self.interval = float(interval)
+        self.method = method
+        self.target_times = np.zeros(0)
+        self.totals = np.zeros((len(COMPONENTS), len(MATERIALS), len(SPECIES), 0))
+        self.bin_totals: Dict[int, np.ndarray] = {}
+        # last area-weighted values, used to extend the grid
+        self._tails = np.zeros(self.totals.shape[:3])
+        self._bin_tails: Dict[int, np.ndarray] = {}
+        self.processed = []
+        self.skipped = []
+
+    def _grid_for(self, t_max: float) -> np.ndarray:
+        return np.arange(0.0, t_max + self.interval, self.interval, dtype=float)
+
+    def _extend(self, t_max: float):
+        """Grows the time grid to cover ``t_max``, filling new points with the tails."""
+        grid = self._grid_for(t_max)
+        n_old, n_new = len(self.target_times), len(grid)
+        if n_new <= n_old:
+            return
+        totals = np.empty(self.totals.shape[:3] + (n_new,))
+        totals[..., :n_old] = self.totals
+        totals[..., n_old:] = self._tails[..., None]
+        self.totals = totals
+        for bin_number, series in self.bin_totals.items():
+            extended = np.empty(series.shape[:2] + (n_new,))
+            extended[..., :n_old] = series
+            extended[..., n_old:] = self._bin_tails[bin_number][..., None]
+            self.bin_totals[bin_number] = extended
+        self.target_times = grid
+
+    def add_result(self, data: dict, stem: str = "") -> bool:
+        """Adds one result dictionary. Returns False if it was skipped."""
+        if "t" not in data or len(data["t"]) == 0:
+            self.skipped.append((stem, "missing 't' array"))
+            return False
+        species_series = {species: np.zeros(len(data["t"])) for species in SPECIES}
+        for key, values in data.items():
+            if not (isinstance(values, dict) and "data" in values):
+                continue
+            species = species_of_key(key)
+            if species is not None:
+                species_series[species] += np.asarray(values["data"], dtype=float)
+        return self.add_series(data, data["t"], species_series, stem)
+
+    def add_series(self, metadata: dict, t, species_series: Dict[str, np.ndarray], stem: str = "") -> bool:
+        """Adds the per-species inventories of one result.
+
+        Args:
+            metadata: ``bin_number``, ``mode`` and ``material`` of the result
+                (parsed from ``stem`` when missing)
+            t: times of the result
+            species_series: summed inventory of each species over ``t``
+        """
+        bin_number, mode = parse_result_stem(stem)
+        if "bin_number" in metadata:
+            bin_number = int(metadata["bin_number"])
+        if "mode" in metadata:
+            mode = mode_category(metadata["mode"])
+        if bin_number is None:
+            self.skipped.append((stem, "failed to parse bin number"))
+            return False
+        located = self.areas.lookup(bin_number, mode)
+        if located is None:
+            self.skipped.append((stem, f"no input table row (bin {bin_number}, mode {mode})"))
+            return False
+        component, area = located
+
+        t = np.asarray(t, dtype=float)
+        self._extend(float(t[-1]))
+        c = COMPONENTS.index(component)
+        m = MATERIALS.index(material_from_result(metadata))
+        if bin_number not in self.bin_totals:
+            self.bin_totals[bin_number] = np.zeros((len(MATERIALS), len(SPECIES), len(self.target_times)))
+            self._bin_tails[bin_number] = np.zeros((len(MATERIALS), len(SPECIES)))
+
+        for species, values in species_series.items():
+            s = SPECIES.index(species)
+            series = np.asarray(values, dtype=float) * area
+            resampled = resample(t, series, self.target_times, self.method)
+            self.totals[c, m, s] += resampled
+            self.bin_totals[bin_number][m, s] += resampled
+            self._tails[c, m, s] += series[-1]
+            self._bin_tails[bin_number][m, s] += series[-1]
+        self.processed.append((stem, bin_number, component))
+        return True
+
+    def add_pyramid(self, path) -> bool:
+        """Adds a result from the raw ``total_T``/``total_D`` of its pyramid, without parsing the JSON.
+
+        Returns False if the pyramid is missing, outdated, incomplete or does
+        not record the material of the result (older results).
+        """
+        path = Path(path)
+        raw = read_raw_series(path, ["total_T", "total_D"])
+        if raw is None or "material" not in raw[0]:
+            return False
+        metadata, t, total_T, total_D = raw
+        self.add_series(metadata, t, {"T": total_T, "D": total_D}, path.stem)
+        return True
+
+    def add_file(self, path, reader: Optional[ResultsReader] = None) -> bool:
+        path = Path(path)
+        reader = reader or ResultsReader(path.parent, cache_size=0)
+        return self.add_result(reader.load(path, keys=inventory_key), path.stem)
+
+    def add_files(
+        self,
+        paths: Iterable,
+        reader: Optional[ResultsReader] = None,
+        workers: Optional[int] = None,
+        use_pyramids: bool = False,
+    ) -> "InventoryAggregator":
+        """Adds result files, parsed in parallel while earlier ones are accumulated.
+
+        With ``use_pyramids``, results with an up-to-date complete pyramid
+        (see ``pyramids.py``) are read from it and their JSON is not parsed.
+        """
+        paths = [Path(p) for p in paths]
+        if use_pyramids:
+            paths = [p for p in paths if not self.add_pyramid(p)]
+        if not paths:
+            return self
+        reader = reader or ResultsReader(paths[0].parent, workers=workers, cache_size=0)
+        for path, data in reader.iter_results(paths, keys=inventory_key):
+            self.add_result(data, path.stem)
+        return self
+
+    def total(self, component: Optional[str] = None, material: Optional[str] = None, species: str = "T") -> np.ndarray:
+        """Area-weighted inventory (atoms) on ``target_times``; None sums over that axis."""
+        totals = self.totals[:, :, SPECIES.index(species)]
+        if component is not None:
+            totals = totals[[COMPONENTS.index(component)]]
+        if material is not None:
+            totals = totals[:, [MATERIALS.index(material)]]
+        return totals.sum(axis=(0, 1))
+
+    def bin_total(self, bin_number: int, material: Optional[str] = None, species: str = "T") -> np.ndarray:
+        """Area-weighted inventory (atoms) of one bin; zeros if the bin has no result."""
+        if bin_number not in self.bin_totals:
+            return np.zeros_like(self.target_times)
+        series = self.bin_totals[bin_number][:, SPECIES.index(species)]
+        if material is not None:
+            return series[MATERIALS.index(material)].copy()
+        return series.sum(axis=0)
+
+
+def atoms_to_grams(atoms, molar_mass: float = TRITIUM_MASS):
+    """Converts a number of atoms to grams."""
+    return molar_mass * np.asarray(atoms) / AVOGADRO
@@ -1,10 +1,12 @@
 
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 import re
 
+from pyramids import Pyramid, axis_pixels, plot_envelope
+from results_reader import ResultsReader
+
 # ----------- CONFIG -----------
 RESULTS_DIR = Path("../results_1FPday")
 PLOTS_DIR = Path("./plots_1FPday")
@@ -12,6 +14,8 @@ FIGSIZE = (5.5, 4.5)
 LEFT_XLIM_HOURS = 0.05
 RIGHT_XLIM_HOURS = 250
 TOP_YLABEL = "Tritium Inventory (atms/m^2)"
+DPI = 300
+USE_PYRAMIDS = True  # draw from <stem>.pyramid.npz when up to date, without reading the JSON (see pyramids.py)
 # ------------------------------
 
 def extract_bin_from_name(name: str):
@@ -29,10 +33,132 @@ def parse_filename(stem: str):
     sub_bin_desc = sub_bin_match.group(1).replace("_", " ") if sub_bin_match else ""
     return component, bin_id, sub_bin_desc
 
-def get_material(data):
-    traps = [k for k in data.keys() if "trap" in k.lower()]
+def get_material(keys):
+    traps = [k for k in keys if "trap" in k.lower()]
     return "Tungsten" if len(traps) == 4 else "Boron"
 
+def plot_series(ax, pyramid, key, t_end_hours, t_hours=None, arr=None, **kwargs):
+    """Plots a series from the pyramid level fitting the axis, or the raw data."""
+    level = None
+    if pyramid is not None:
+        level = pyramid.series(
+            key, LEFT_XLIM_HOURS * 3600.0, t_end_hours * 3600.0, axis_pixels(ax, DPI), scale="log"
+        )
+    if level is None:
+        return ax.plot(t_hours, arr, **kwargs)[0]
+    t, lo, hi, mean = level
+    return plot_envelope(ax, t / 3600.0, lo, hi, mean, **kwargs)
+
+def plot_result(jf, pyramid=None, data=None):
+    """Plots one result file.
+
+    Without ``data``, every series comes from the complete pyramid of the
+    result (``Pyramid.is_complete``) and the JSON is not parsed. With
+    ``data``, series come from the pyramid level fitting the axis when there
+    is one, otherwise from the parsed JSON.
+    """
+    if data is None:
+        t_hours = None
+        t_end_hours = pyramid.t_range[1] / 3600.0
+        keys = pyramid.quantities
+        quantity_keys = pyramid.quantity_keys()
+    else:
+        # Time in hours
+        t_hours = np.array(data["t"], dtype=float) / 3600.0
+        t_end_hours = t_hours[-1]
+        keys = list(data.keys())
+        quantity_keys = [k for k, v in data.items() if isinstance(v, dict) and "data" in v]
+
+    def raw(key):
+        if data is None:
+            return None
+        values = data[key]
+        return np.array(values["data"] if isinstance(values, dict) else values, dtype=float)
+
+    # Matplotlib figure with two stacked subplots
+    fig, (ax_top, ax_bottom) = plt.subplots(
+        2, 1, sharex=True, figsize=FIGSIZE, height_ratios=[3, 1]
+    )
+
+    # Surface temperature (stored as a direct array)
+    if "temperature_at_x0" in keys:
+        plot_series(ax_bottom, pyramid, "temperature_at_x0", t_end_hours, t_hours, raw("temperature_at_x0"),
+                    label="Surface temperature, K", color="tab:red")
+
+    total_T = None
+    mobile_T = None
+    for key in quantity_keys:
+        arr = raw(key)
+
+        # Sum totals (exclude flux-like keys); the pyramid holds them precomputed
+        if arr is not None:
+            if total_T is None:
+                total_T = np.zeros_like(arr)
+            if "flux" not in key.lower() and "T" in key:
+                total_T += arr
+        if key == "T":
+            # mobile tritium series
+            mobile_T = arr
+
+        # Top panel: plot individual series except D and flux (we'll plot mobile T separately)
+        if ("D" not in key) and ("flux" not in key.lower()) and key != "T":
+            plot_series(ax_top, pyramid, key, t_end_hours, t_hours, arr, label=f"{key}")
+
+    # Plot total T
+    if quantity_keys:
+        plot_series(ax_top, pyramid, "total_T", t_end_hours, t_hours, total_T,
+                    label="Total T", linestyle='-', linewidth=2, color='black')
+
+    # Plot mobile T on an independent y-axis (right side)
+    if "T" in quantity_keys:
+        ax_mobile = ax_top.twinx()
+        # Plot mobile tritium as a thin solid line in a subtle color so
+        # it is easy to see but does not dominate the plot.
+        plot_series(ax_mobile, pyramid, "T", t_end_hours, t_hours, mobile_T,
+                    label="mobile_T", linestyle='-', color='dimgray', linewidth=0.8)
+        ax_mobile.set_ylabel("Mobile T (atoms)", color='dimgray')
+        ax_mobile.tick_params(axis='y', labelcolor='dimgray')
+        # Put mobile legend on the right
+        ax_mobile.legend(loc='upper right')
+
+    # ---- Formatting (top) ----
+    ax_top.set_xscale("log")
+    # Use the last recorded time (in hours) as the right x-limit so plots
+    # automatically match the data range instead of a fixed value.
+    try:
+        right_xlim = float(t_end_hours)
+    except Exception:
+        right_xlim = RIGHT_XLIM_HOURS
+    ax_top.set_xlim(left=LEFT_XLIM_HOURS, right=right_xlim)
+    ax_top.set_ylabel(TOP_YLABEL)
+    ax_top.grid(which="both", linestyle="--", linewidth=0.5)
+    ax_top.legend(loc='upper left')
+
+    # Build title
+    stem = jf.stem
+    component, bin_id, sub_bin_desc = parse_filename(stem)
+    material = get_material(keys)
+    title_parts = [material, component]
+    if bin_id:
+        title_parts.append(f"bin {bin_id}")
+    if sub_bin_desc:
+        title_parts.append(sub_bin_desc)
+    title = " ".join(title_parts)
+    ax_top.set_title(title)
+
+    # ---- Formatting (bottom) ----
+    ax_bottom.set_xlabel("Time (hours)")
+    ax_bottom.grid(which="both", linestyle="--", linewidth=0.5)
+
+    plt.tight_layout()
+
+    # Save outputs
+    out_png = PLOTS_DIR / f"{stem}.png"
+    fig.savefig(out_png, dpi=DPI, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"[OK] Saved {out_png.name}")
+
 def main():
     PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -41,118 +167,26 @@ def main():
         print(f"[WARN] No JSON files found in {RESULTS_DIR.resolve()}")
         return
 
+    # Results with a complete, up-to-date pyramid are plotted without parsing their JSON
+    to_parse = []
     for jf in json_files:
+        pyramid = Pyramid.for_result(jf) if USE_PYRAMIDS else None
+        if pyramid is None or not pyramid.is_complete:
+            to_parse.append(jf)
+            continue
         try:
-            with open(jf, "r") as f:
-                data = json.load(f)
+            plot_result(jf, pyramid)
+        except Exception as e:
+            print(f"[ERROR] Failed processing {jf.name}: {e}")
 
+    # Parse the next files in a thread pool while the current one is plotted
+    reader = ResultsReader(RESULTS_DIR, cache_size=0)
+    for jf, data in reader.iter_results(to_parse):
+        try:
             if "t" not in data:
                 print(f"[WARN] Skipping {jf.name}: missing 't' array.")
                 continue
-
-            # Time in hours
-            t_hours = np.array(data["t"], dtype=float) / 3600.0
-
-            # Matplotlib figure with two stacked subplots
-            fig, (ax_top, ax_bottom) = plt.subplots(
-                2, 1, sharex=True, figsize=FIGSIZE, height_ratios=[3, 1]
-            )
-
-            total_T = None
-            total_D = None
-            mobile_T = None
-
-            # Iterate over all series
-            for key, values in data.items():
-                if key == "t":
-                    continue
-
-                # Handle temperature_at_x0 which is stored as direct array
-                if key == "temperature_at_x0":
-                    arr = np.array(values, dtype=float)
-                    ax_bottom.plot(t_hours, arr, label="Surface temperature, K", color="tab:red")
-                    continue
-
-                if isinstance(values, dict) and "data" in values:
-                    arr = np.array(values["data"], dtype=float)
-
-
-                    # Initialize totals lazily
-                    if total_T is None:
-                        total_T = np.zeros_like(arr)
-                        total_D = np.zeros_like(arr)
-                        mobile_T = None
-
-                    # Sum totals (exclude flux-like keys)
-                    if "flux" not in key.lower():
-                        if key == "T":
-                            # mobile tritium series
-                            mobile_T = arr
-                            total_T += arr
-                        else:
-                            if ("T" in key):
-                                total_T += arr
-                            # Only count pure D (avoid double counting if key has both D and T)
-                            if ("D" in key) and ("T" not in key):
-                                total_D += arr
-
-                    # Top panel: plot individual series except D and flux (we'll plot mobile T separately)
-                    if ("D" not in key) and ("flux" not in key.lower()):
-                        if key != "T":
-                            ax_top.plot(t_hours, arr, label=f"{key}")
-
-            # Plot total T
-            if total_T is not None:
-                ax_top.plot(t_hours, total_T, label="Total T", linestyle='-', linewidth=2, color='black')
-
-            # Plot mobile T on an independent y-axis (right side)
-            if mobile_T is not None:
-                ax_mobile = ax_top.twinx()
-                # Plot mobile tritium as a thin solid line in a subtle color so
-                # it is easy to see but does not dominate the plot.
-                ax_mobile.plot(t_hours, mobile_T, label="mobile_T", linestyle='-', color='dimgray', linewidth=0.8)
-                ax_mobile.set_ylabel("Mobile T (atoms)", color='dimgray')
-                ax_mobile.tick_params(axis='y', labelcolor='dimgray')
-                # Put mobile legend on the right
-                ax_mobile.legend(loc='upper right')
-
-            # ---- Formatting (top) ----
-            ax_top.set_xscale("log")
-            # Use the last recorded time (in hours) as the right x-limit so plots
-            # automatically match the data range instead of a fixed value.
-            try:
-                right_xlim = float(t_hours[-1])
-            except Exception:
-                right_xlim = RIGHT_XLIM_HOURS
-            ax_top.set_xlim(left=LEFT_XLIM_HOURS, right=right_xlim)
-            ax_top.set_ylabel(TOP_YLABEL)
-            ax_top.grid(which="both", linestyle="--", linewidth=0.5)
-            ax_top.legend(loc='upper left')
-
-            # Build title
-            stem = jf.stem
-            component, bin_id, sub_bin_desc = parse_filename(stem)
-            material = get_material(data)
-            title_parts = [material, component]
-            if bin_id:
-                title_parts.append(f"bin {bin_id}")
-            if sub_bin_desc:
-                title_parts.append(sub_bin_desc)
-            title = " ".join(title_parts)
-            ax_top.set_title(title)
-
-            # ---- Formatting (bottom) ----
-            ax_bottom.set_xlabel("Time (hours)")
-            ax_bottom.grid(which="both", linestyle="--", linewidth=0.5)
-
-            plt.tight_layout()
-
-            # Save outputs
-            out_png = PLOTS_DIR / f"{stem}.png"
-            fig.savefig(out_png, dpi=300, bbox_inches="tight")
-            plt.close(fig)
-
-            print(f"[OK] Saved {out_png.name}")
+            plot_result(jf, Pyramid.for_result(jf) if USE_PYRAMIDS else None, data)
 
         except Exception as e:
             print(f"[ERROR] Failed processing {jf.name}: {e}")
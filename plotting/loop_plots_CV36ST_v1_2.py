@@ -1,4 +1,3 @@
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
@@ -6,6 +5,8 @@ import re
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from results_reader import ResultsReader
+
 # ----------- CONFIG -----------
 RESULTS_DIR = Path("../results_CV36ST_v1_2")
 PLOTS_DIR = Path("./plots_CV36ST_v1_2")
@@ -79,11 +80,10 @@ def main():
         print(f"[WARN] No JSON files found in {RESULTS_DIR.resolve()}")
         return
 
-    for jf in json_files:
+    # Parse the next files in a thread pool while the current one is plotted
+    reader = ResultsReader(RESULTS_DIR, cache_size=0)
+    for jf, data in reader.iter_results(json_files):
         try:
-            with open(jf, "r") as f:
-                data = json.load(f)
-
             if "t" not in data:
                 print(f"[WARN] Skipping {jf.name}: missing 't' array.")
                 continue
@@ -1,10 +1,8 @@
-
-import json
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
-import re
+
+from inventory_aggregator import AreaTable, InventoryAggregator
 
 # -------- CONFIG --------
 RESULTS_DIR = Path("../Results_do_nothing_complete")  # Directory with JSON files
@@ -16,130 +14,6 @@ RIGHT_XLIM_HOURS = 250
 TARGET_INTERVAL = 100  # seconds
 # -------------------------.
 
-def parse_filename(stem: str):
-    """Parse bin filename to extract bin number, component, and mode.
-    
-    Supports two formats:
-    1. New format: id_{id}_bin_num_{bin_number}_{material}_{mode}.json
-    2. Old format: wall_bin_{bin_number}_sub_bin_{mode}.json or div_bin_{bin_number}.json
-    
-    Returns: (component, bin_number, mode)
-    """
-    # Try new format first: _num_(\d+)
-    num_match = re.search(r"_num_(\d+)", stem)
-    
-    # If not found, try old format: wall_bin_(\d+) or div_bin_(\d+)
-    if not num_match:
-        wall_match = re.search(r"wall_bin_(\d+)", stem)
-        div_match = re.search(r"div_bin_(\d+)", stem)
-        
-        if wall_match:
-            bin_number = int(wall_match.group(1))
-            component = "wall"
-        elif div_match:
-            bin_number = int(div_match.group(1))
-            component = "divertor"
-        else:
-            return None, None, None
-    else:
-        bin_number = int(num_match.group(1))
-        # Determine component based on bin number
-        # Bins 1-18 are first wall, 19+ are divertor
-        component = "wall" if bin_number <= 18 else "divertor"
-    
-    # Extract mode from filename
-    mode = None
-    if "high_wetted" in stem or "highwetted" in stem:
-        mode = "high"
-    elif "low_wetted" in stem or "lowwetted" in stem:
-        mode = "low"
-    elif "shadowed" in stem or "shadow" in stem:
-        mode = "shadow"
-    elif "wetted" in stem:
-        mode = "high"  # default wetted to high
-    elif "sub_bin" in stem and component == "wall":
-        # Old format: wall_bin_{N}_sub_bin_{mode}
-        sub_match = re.search(r"sub_bin_(\w+)", stem)
-        if sub_match:
-            mode_str = sub_match.group(1)
-            if "shadow" in mode_str:
-                mode = "shadow"
-            elif "low" in mode_str:
-                mode = "low"
-            else:
-                mode = "high"
-    
-    # For divertor bins in old format, mode defaults to None (no sub-bins)
-    
-    return component, bin_number, mode
-
-def get_material(data):
-    traps = [k for k in data.keys() if "trap" in k.lower()]
-    return "Tungsten" if len(traps) == 4 else "Boron"
-
-def load_surface_data_from_input_table(csv_path):
-    """Load surface area data from input_table.csv
-    
-    Returns a dict mapping bin_number to a dict with:
-        - Stot: total surface area
-        - Shigh: high wetted surface area
-        - Slow: low wetted surface area
-        - Sshadow: shadowed surface area
-    """
-    surface_data = {}
-    
-    with open(csv_path, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            bin_num = int(row["Bin number"])
-            mode = row["mode"]
-            surface_area = float(row["Surface area (m^2)"])
-            location = row["location"]
-            
-            # Skip divertor bins
-            if location.upper() in ["DIV", "DIVERTOR"]:
-                continue
-            
-            # Initialize bin data if not present
-            if bin_num not in surface_data:
-                parent_area = float(row["S. Area parent bin (m^2)"])
-                surface_data[bin_num] = {
-                    "Stot": parent_area,
-                    "Shigh": 0.0,
-                    "Slow": 0.0,
-                    "Sshadow": 0.0
-                }
-            
-            # Assign area based on mode
-            if "high" in mode.lower():
-                surface_data[bin_num]["Shigh"] = surface_area
-            elif "low" in mode.lower():
-                surface_data[bin_num]["Slow"] = surface_area
-            elif "shadow" in mode.lower():
-                surface_data[bin_num]["Sshadow"] = surface_area
-            elif mode.lower() == "wetted":
-                # For simple "wetted" mode, treat as high wetted
-                surface_data[bin_num]["Shigh"] = surface_area
-    
-    return surface_data
-
-def load_divertor_areas_from_input_table(csv_path):
-    """Load divertor bin areas from input_table.csv"""
-    divertor_areas = {}
-    
-    with open(csv_path, "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            bin_num = int(row["Bin number"])
-            location = row["location"]
-            surface_area = float(row["Surface area (m^2)"])
-            
-            # Only process divertor bins
-            if location.upper() in ["DIV", "DIVERTOR"]:
-                divertor_areas[bin_num] = surface_area
-    
-    return divertor_areas
-
 def find_nearest_index(array, value):
     return int(np.abs(array - value).argmin())
 
@@ -167,110 +41,26 @@ def moving_average(data, window_size):
 def main():
     PLOTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    surface_data = load_surface_data_from_input_table(INPUT_TABLE_CSV)
-    divertor_areas = load_divertor_areas_from_input_table(INPUT_TABLE_CSV)
+    areas = AreaTable.from_input_table(INPUT_TABLE_CSV)
     json_files = sorted(RESULTS_DIR.glob("*.json"))
     if not json_files:
         print(f"[WARN] No JSON files found in {RESULTS_DIR.resolve()}")
         return
 
-    # Track which bins are being processed
-    processed_bins = set()
-    skipped_files = []
-    processed_files = []
-    
     print(f"\n[INFO] Found {len(json_files)} total JSON files (including sub-bins)")
-    
-    # Build a common time grid (every ~100s)
-    max_time = 0
-    for jf in json_files:
-        with open(jf, "r") as f:
-            data = json.load(f)
-        if "t" in data:
-            max_time = max(max_time, max(data["t"]))
-
-    target_times = np.arange(0, max_time + TARGET_INTERVAL, TARGET_INTERVAL)
-
-    # Initialize totals for wall bins
-    W_totals_wall = np.zeros_like(target_times, dtype=float)
-    B_totals_wall = np.zeros_like(target_times, dtype=float)
-    
-    # Initialize totals for divertor bins
-    W_totals_div = np.zeros_like(target_times, dtype=float)
-    B_totals_div = np.zeros_like(target_times, dtype=float)
 
-    files_processed_count = 0
-    
-    for jf in json_files:
-        with open(jf, "r") as f:
-            data = json.load(f)
-
-        if "t" not in data:
-            continue
-
-        t_array = np.array(data["t"], dtype=float)
-        component, bin_id, mode = parse_filename(jf.stem)
-        if bin_id is None:
-            skipped_files.append((jf.name, "Failed to parse filename"))
-            continue
+    # Stream every result onto a common time grid (every ~100s)
+    aggregator = InventoryAggregator(areas, interval=TARGET_INTERVAL).add_files(json_files)
+    target_times = aggregator.target_times
+    processed_bins = {bin_id for _, bin_id, _ in aggregator.processed}
+    skipped_files = aggregator.skipped
+    files_processed_count = len(aggregator.processed)
 
-        material = get_material(data)
-        processed_bins.add(bin_id)
-
-        if component == "wall":
-            # Wall bin processing - each JSON file is one mode of one bin
-            surf = surface_data.get(bin_id)
-            if not surf or mode is None:
-                skipped_files.append((jf.name, f"Missing surface data or mode (bin {bin_id}, mode {mode})"))
-                continue
-
-            files_processed_count += 1
-            if mode == "shadow":
-                area = surf["Sshadow"]
-            elif mode == "low":
-                area = surf["Slow"]
-            elif mode == "high":
-                area = surf["Shigh"]
-            else:
-                area = surf["Stot"]  # fallback
-
-            # Sum inventory for ALL Tritium keys in this file
-            for key, values in data.items():
-                if key == "t" or "flux" in key.lower():
-                    continue
-                if isinstance(values, dict) and "data" in values:
-                    arr = np.array(values["data"], dtype=float)
-                    if "T" in key:  # Tritium inventory
-                        for i, target_t in enumerate(target_times):
-                            idx = find_nearest_index(t_array, target_t)
-                            inv_val = arr[idx]
-
-                            if material == "Tungsten":
-                                W_totals_wall[i] += inv_val * area
-                            else:
-                                B_totals_wall[i] += inv_val * area
-
-        elif component == "divertor":
-            # Divertor bin processing
-            area = divertor_areas.get(bin_id)
-            if not area:
-                continue
-
-            files_processed_count += 1
-            for key, values in data.items():
-                if key == "t" or "flux" in key.lower():
-                    continue
-                if isinstance(values, dict) and "data" in values:
-                    arr = np.array(values["data"], dtype=float)
-                    if "T" in key:  # Tritium inventory
-                        for i, target_t in enumerate(target_times):
-                            idx = find_nearest_index(t_array, target_t)
-                            inv_val = arr[idx]
-
-                            if material == "Tungsten":
-                                W_totals_div[i] += inv_val * area
-                            else:
-                                B_totals_div[i] += inv_val * area
+    # Totals for wall and divertor bins
+    W_totals_wall = aggregator.total("wall", "W")
+    B_totals_wall = aggregator.total("wall", "B")
+    W_totals_div = aggregator.total("divertor", "W")
+    B_totals_div = aggregator.total("divertor", "B")
 
     # Convert time to hours
     times_hours = target_times / 3600.0
@@ -315,73 +105,16 @@ def main():
     print("="*80)
     final_time_idx = -1  # Last time point
     
-    for jf in json_files:
-        with open(jf, "r") as f:
-            data = json.load(f)
-        
-        if "t" not in data:
-            continue
-        
-        component, bin_id, mode = parse_filename(jf.stem)
-        if bin_id is None:
-            continue
-        
-        material = get_material(data)
-        
-        if component == "wall":
-            surf = surface_data.get(bin_id)
-            if not surf or mode is None:
-                continue
-            
-            # Get area based on mode
-            if mode == "shadow":
-                area = surf["Sshadow"]
-            elif mode == "low":
-                area = surf["Slow"]
-            elif mode == "high":
-                area = surf["Shigh"]
-            else:
-                area = surf["Stot"]
-            
-            # Sum tritium inventory for final time
-            final_inventory_atoms = 0.0
-            for key, values in data.items():
-                if key == "t" or "flux" in key.lower():
-                    continue
-                if isinstance(values, dict) and "data" in values:
-                    arr = np.array(values["data"], dtype=float)
-                    if "T" in key:
-                        final_inventory_atoms += arr[final_time_idx]
-            
-            # Convert to mass
-            final_mass_grams = (final_inventory_atoms * area * tritium_mass) / avogadro
-            
-            print(f"Wall Bin {bin_id:2d} ({material:8s}, {mode:6s}): "
-                  f"Inventory = {final_inventory_atoms:.6e} atoms, "
-                  f"Area = {area:.6e} m², "
-                  f"Total T mass = {final_mass_grams:.6e} g")
-        
-        elif component == "divertor":
-            area = divertor_areas.get(bin_id)
-            if not area:
+    for b in sorted(aggregator.bin_totals):
+        component, _ = areas.lookup(b, None) or ("wall", None)
+        label = "Wall Bin" if component == "wall" else "Divertor Bin"
+        for material in ("W", "B", "SS", "other"):
+            final_inventory_atoms = aggregator.bin_total(b, material)[final_time_idx]
+            if final_inventory_atoms == 0:
                 continue
-            
-            # Sum tritium inventory for final time
-            final_inventory_atoms = 0.0
-            for key, values in data.items():
-                if key == "t" or "flux" in key.lower():
-                    continue
-                if isinstance(values, dict) and "data" in values:
-                    arr = np.array(values["data"], dtype=float)
-                    if "T" in key:
-                        final_inventory_atoms += arr[final_time_idx]
-            
-            # Convert to mass
-            final_mass_grams = (final_inventory_atoms * area * tritium_mass) / avogadro
-            
-            print(f"Divertor Bin {bin_id:2d} ({material:8s}): "
-                  f"Inventory = {final_inventory_atoms:.6e} atoms, "
-                  f"Area = {area:.6e} m², "
+            final_mass_grams = (final_inventory_atoms * tritium_mass) / avogadro
+            print(f"{label} {b:2d} ({material:5s}): "
+                  f"Area-weighted inventory = {final_inventory_atoms:.6e} atoms, "
                   f"Total T mass = {final_mass_grams:.6e} g")
     
     print("="*80 + "\n")
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution min/max/mean pyramids of result time series.
+
+A pyramid holds, for every series of a result file (plus the derived
+``total_T`` and ``total_D`` of ``loop_plots``), the min, max and mean over
+time buckets at several resolutions, in two families:
+
+- ``lin``: buckets of equal width in t, for linear time axes
+- ``log``: buckets of equal width in log(t), for log time axes
+
+Level k has ``min_buckets * factor**k`` buckets; levels stop once they would
+be as dense as the raw series. Empty buckets are dropped, so each level stores
+at most as many points as there are raw samples. Pyramid files also hold the
+raw series and the result metadata (bin number, mode, material), so plots can
+be drawn from the pyramid alone without parsing the result JSON.
+
+Pyramids are written next to the result file as ``<stem>.pyramid.npz`` by
+``run_new_csv_bin.py --pyramids`` or, for existing results, by this script:
+
+    python pyramids.py ../results_folder [--factor 4] [--min-buckets 256]
+
+Plotting scripts pick the coarsest level with at least one bucket per pixel
+over the visible range, and fall back to the raw series when none is fine
+enough:
+
+    pyramid = Pyramid.for_result(json_path)            # None if missing or outdated
+    level = pyramid.series("total_T", t_min, t_max, pixels, scale="log")
+    if level is not None:                              # always the case for a complete pyramid
+        t, lo, hi, mean = level
+
+    metadata, t, total_T = read_raw_series(json_path, ["total_T"])   # raw series only (None if unavailable)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+SCALES = ("lin", "log")
+
+# Scalar result entries stored in the pyramid metadata
+METADATA_KEYS = ("bin_number", "mode", "material")
+
+
+def pyramid_path(result_path) -> Path:
+    result_path = Path(result_path)
+    return result_path.with_name(f"{result_path.stem}.pyramid.npz")
+
+
+def result_series(data: dict) -> Dict[str, np.ndarray]:
+    """Series of a result dictionary (same length as ``t``) plus ``total_T`` and ``total_D``.
+
+    Totals follow ``loop_plots``: flux keys are excluded, keys containing T add to
+    ``total_T`` and keys containing D but not T add to ``total_D``.
+    """
+    n = len(data["t"])
+    series = {}
+    total_T = np.zeros(n)
+    total_D = np.zeros(n)
+    for key, values in data.items():
+        is_quantity = isinstance(values, dict) and "data" in values
+        if is_quantity:
+            values = values["data"]
+        if key == "t" or not isinstance(values, list) or len(values) != n:
+            continue
+        arr = np.asarray(values, dtype=float)
+        series[key] = arr
+        if is_quantity and "flux" not in key.lower():
+            if "T" in key:
+                total_T += arr
+            elif "D" in key:
+                total_D += arr
+    series["total_T"] = total_T
+    series["total_D"] = total_D
+    return series
+
+
+def _bucket_edges(t: np.ndarray, n: int, scale: str) -> np.ndarray:
+    if scale == "lin":
+        return np.linspace(t[0], t[-1], n + 1)
+    positive = t[t > 0]
+    t_first = positive[0] if len(positive) else 1.0
+    return np.geomspace(t_first, max(t[-1], t_first), n + 1)
+
+
+def _span(t0: float, t1: float, scale: str) -> float:
+    if scale == "lin":
+        return t1 - t0
+    return np.log(t1 / t0)
+
+
+def build_pyramid(t, series: Dict[str, np.ndarray], factor: int = 4, min_buckets: int = 256) -> Dict[str, np.ndarray]:
+    """Computes the pyramid levels of series sharing the time array ``t``.
+
+    Returns:
+        dictionary of arrays, as stored in the ``.npz`` file
+    """
+    t = np.asarray(t, dtype=float)
+    names = list(series)
+    values = np.vstack([series[name] for name in names]) if names else np.zeros((0, len(t)))
+    arrays = {"quantities": np.array(names), "t_range": np.array([t[0], t[-1]]), "n_raw": np.array(len(t))}
+    for scale in SCALES:
+        n_buckets, k = min_buckets, 0
+        while n_buckets < len(t) / 2:
+            edges = _bucket_edges(t, n_buckets, scale)
+            bucket = np.clip(np.searchsorted(edges, t, side="right") - 1, 0, n_buckets - 1)
+            starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+            counts = np.diff(np.r_[starts, len(t)])
+            arrays[f"{scale}{k}_t"] = np.add.reduceat(t, starts) / counts
+            arrays[f"{scale}{k}_min"] = np.minimum.reduceat(values, starts, axis=1)
+            arrays[f"{scale}{k}_max"] = np.maximum.reduceat(values, starts, axis=1)
+            arrays[f"{scale}{k}_mean"] = np.add.reduceat(values, starts, axis=1) / counts
+            arrays[f"{scale}{k}_span"] = np.array(_span(edges[0], edges[-1], scale) / n_buckets)
+            n_buckets, k = n_buckets * factor, k + 1
+    return arrays
+
+
+def write_pyramid(result_path, data: Optional[dict] = None, factor: int = 4, min_buckets: int = 256) -> Path:
+    """Writes the pyramid of a result file (``data`` avoids re-reading the JSON).
+
+    Besides the levels, the file holds the raw series (``raw_t``, ``raw_<i>``),
+    which series are result quantities (``is_quantity``, False for plain arrays
+    like ``temperature_at_x0`` and for the derived totals) and the result
+    metadata (``metadata``).
+    """
+    result_path = Path(result_path)
+    if data is None:
+        with open(result_path, "r") as f:
+            data = json.load(f)
+    series = result_series(data)
+    arrays = build_pyramid(data["t"], series, factor=factor, min_buckets=min_buckets)
+    arrays["is_quantity"] = np.array([isinstance(data.get(name), dict) for name in series], dtype=bool)
+    arrays["raw_t"] = np.asarray(data["t"], dtype=float)
+    for i, values in enumerate(series.values()):
+        arrays[f"raw_{i}"] = values
+    arrays["metadata"] = np.array(json.dumps({key: data[key] for key in METADATA_KEYS if key in data}))
+    out_path = pyramid_path(result_path)
+    tmp_path = out_path.with_name(out_path.name + ".tmp.npz")
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def axis_pixels(ax, dpi: Optional[float] = None) -> int:
+    """Width of a matplotlib axis in pixels at ``dpi`` (default: the figure dpi)."""
+    fig = ax.get_figure()
+    return int(ax.get_position().width * fig.get_figwidth() * (dpi or fig.dpi))
+
+
+class Pyramid:
+    """Levels of a stored pyramid (see module docstring)."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.quantities = [str(name) for name in arrays["quantities"]]
+        self._index = {name: i for i, name in enumerate(self.quantities)}
+        self.t_range = tuple(arrays["t_range"])
+        self.metadata = json.loads(str(arrays["metadata"])) if "metadata" in arrays else {}
+
+    @property
+    def is_complete(self) -> bool:
+        """True if the pyramid holds the raw series, so the result JSON is never needed."""
+        return "raw_t" in self.arrays and "is_quantity" in self.arrays
+
+    def quantity_keys(self):
+        """Names of the series stored as result quantities (``{"data": [...]}``), in result order."""
+        return [name for name, flag in zip(self.quantities, self.arrays["is_quantity"]) if flag]
+
+    @classmethod
+    def load(cls, path) -> "Pyramid":
+        with np.load(path) as npz:
+            return cls({key: npz[key] for key in npz.files})
+
+    @classmethod
+    def for_result(cls, result_path) -> Optional["Pyramid"]:
+        """Pyramid of a result file; None if it is missing or older than the result."""
+        path = _up_to_date_pyramid(result_path)
+        return None if path is None else cls.load(path)
+
+    def n_levels(self, scale: str) -> int:
+        k = 0
+        while f"{scale}{k}_t" in self.arrays:
+            k += 1
+        return k
+
+    def select_level(self, t_min: float, t_max: float, pixels: int, scale: str = "lin") -> Optional[int]:
+        """Coarsest level with buckets no wider than one pixel over [t_min, t_max]; None for raw data."""
+        if scale == "log":
+            t_min = max(t_min, self.t_range[0], 1e-12)
+        pixel_span = _span(t_min, t_max, scale) / max(pixels, 1)
+        for k in range(self.n_levels(scale)):
+            if self.arrays[f"{scale}{k}_span"] <= pixel_span:
+                return k
+        return None
+
+    def series(
+        self, quantity: str, t_min: float, t_max: float, pixels: int, scale: str = "lin"
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+        """Returns (t, min, max, mean) of a quantity at the level fitting the view.
+
+        When no level is fine enough, the raw series of a complete pyramid is
+        returned (min = max = mean); None if raw data is needed from the JSON.
+        """
+        if quantity not in self._index:
+            return None
+        k = self.select_level(t_min, t_max, pixels, scale)
+        i = self._index[quantity]
+        if k is None:
+            if not self.is_complete:
+                return None
+            t = self.arrays["raw_t"]
+            visible = slice(max(np.searchsorted(t, t_min) - 1, 0), np.searchsorted(t, t_max) + 1)
+            values = self.arrays[f"raw_{i}"][visible]
+            return t[visible], values, values, values
+        t = self.arrays[f"{scale}{k}_t"]
+        visible = slice(max(np.searchsorted(t, t_min) - 1, 0), np.searchsorted(t, t_max) + 1)
+        return (
+            t[visible],
+            self.arrays[f"{scale}{k}_min"][i, visible],
+            self.arrays[f"{scale}{k}_max"][i, visible],
+            self.arrays[f"{scale}{k}_mean"][i, visible],
+        )
+
+
+def _up_to_date_pyramid(result_path) -> Optional[Path]:
+    path = pyramid_path(result_path)
+    if not path.exists() or path.stat().st_mtime_ns < Path(result_path).stat().st_mtime_ns:
+        return None
+    return path
+
+
+def read_raw_series(result_path, names: Iterable[str]) -> Optional[tuple]:
+    """Reads the metadata, ``raw_t`` and the raw series ``names`` from the pyramid of a result.
+
+    Only the requested arrays are decompressed, the levels are not read.
+
+    Returns:
+        (metadata, t, *series), None if the pyramid is missing, outdated,
+        incomplete or lacks one of the series
+    """
+    path = _up_to_date_pyramid(result_path)
+    if path is None:
+        return None
+    with np.load(path) as npz:
+        if "raw_t" not in npz.files or "metadata" not in npz.files:
+            return None
+        index = {str(name): i for i, name in enumerate(npz["quantities"])}
+        names = list(names)
+        if any(name not in index for name in names):
+            return None
+        return (
+            json.loads(str(npz["metadata"])),
+            npz["raw_t"],
+            *(npz[f"raw_{index[name]}"] for name in names),
+        )
+
+
+def plot_envelope(ax, t, lo, hi, mean, **kwargs):
+    """Plots the mean of a pyramid level with its min/max band."""
+    (line,) = ax.plot(t, mean, **kwargs)
+    ax.fill_between(t, lo, hi, color=line.get_color(), alpha=0.25, linewidth=0)
+    return line
+
+
+def main():
+    import argparse
+
+    from results_reader import ResultsReader
+
+    parser = argparse.ArgumentParser(description="Write min/max/mean pyramids of result files")
+    parser.add_argument("results_dir", type=Path, help="Directory with JSON files")
+    parser.add_argument("--factor", type=int, default=4, help="Resolution ratio between levels (default: 4)")
+    parser.add_argument("--min-buckets", dest="min_buckets", type=int, default=256,
+                        help="Buckets of the coarsest level (default: 256)")
+    parser.add_argument("--all", action="store_true", help="Rewrite pyramids that are up to date")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel JSON parsing threads")
+    args = parser.parse_args()
+
+    paths = sorted(args.results_dir.glob("*.json"))
+    if not args.all:
+        paths = [p for p in paths if Pyramid.for_result(p) is None]
+    reader = ResultsReader(args.results_dir, workers=args.workers, cache_size=0)
+    for path, data in reader.iter_results(paths):
+        if "t" not in data or len(data["t"]) == 0:
+            print(f"[WARN] Skipping {path.name}: missing 't' array.")
+            continue
+        out_path = write_pyramid(path, data, factor=args.factor, min_buckets=args.min_buckets)
+        print(f"[OK] Saved {out_path.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite store of per-bin results and input table metadata.
+
+``ingest`` loads every result JSON of a results directory (parsed in parallel
+by ``results_reader``) together with the rows of ``input_table.csv`` into one
+SQLite file. Files already ingested with the same mtime and size are skipped,
+changed files are replaced. Queries by bin, material, mode, location, quantity,
+species and time window then run on the indexes without touching the JSON.
+
+Tables:
+- bins(bin_id, bin_number, material, material_group, mode, mode_category,
+  location, component, thickness, surface_area, parent_area)       input table rows
+- results(result_id, file, bin_id, bin_number, material_group, mode_category,
+  location, surface_area, ...)                                      one per JSON file
+- quantities(quantity_id, result_id, name, species)                one per series
+- series(quantity_id, t, step, value)                              samples, keyed by (quantity_id, t, step)
+
+Usage:
+    python results_db.py ingest results.db ../results_folder --input-table ../input_files/input_table.csv
+    python results_db.py query results.db --material B --mode shadow --species T --at 100 --hours --sum
+    python results_db.py query results.db --bins 12 --quantity T_trap1 --t-min 0 --t-max 3600 --csv out.csv
+
+    from results_db import ResultsDB
+    db = ResultsDB("results.db")
+    df = db.at_time(360000.0, material="B", mode="shadow", species="T")
+"""
+
+import argparse
+import csv
+import re
+import sqlite3
+from itertools import repeat
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from inventory_aggregator import (
+    atoms_to_grams,
+    material_from_result,
+    material_group,
+    mode_category,
+    parse_result_stem,
+    species_of_key,
+)
+from results_reader import ResultsReader
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bins (
+    bin_id INTEGER PRIMARY KEY,
+    bin_number INTEGER,
+    material TEXT,
+    material_group TEXT,
+    mode TEXT,
+    mode_category TEXT,
+    location TEXT,
+    component TEXT,
+    thickness REAL,
+    surface_area REAL,
+    parent_area REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    result_id INTEGER PRIMARY KEY,
+    file TEXT UNIQUE,
+    mtime_ns INTEGER,
+    size INTEGER,
+    bin_id INTEGER,
+    bin_number INTEGER,
+    material TEXT,
+    material_group TEXT,
+    mode TEXT,
+    mode_category TEXT,
+    location TEXT,
+    component TEXT,
+    surface_area REAL,
+    n_times INTEGER,
+    t_end REAL,
+    input_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS quantities (
+    quantity_id INTEGER PRIMARY KEY,
+    result_id INTEGER REFERENCES results(result_id) ON DELETE CASCADE,
+    name TEXT,
+    species TEXT
+);
+CREATE TABLE IF NOT EXISTS series (
+    quantity_id INTEGER REFERENCES quantities(quantity_id) ON DELETE CASCADE,
+    t REAL,
+    step INTEGER,
+    value REAL,
+    PRIMARY KEY (quantity_id, t, step)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bins_number ON bins(bin_number, mode_category);
+CREATE INDEX IF NOT EXISTS idx_results_bin ON results(bin_id);
+CREATE INDEX IF NOT EXISTS idx_results_number ON results(bin_number);
+CREATE INDEX IF NOT EXISTS idx_results_select ON results(material_group, location, mode_category);
+CREATE INDEX IF NOT EXISTS idx_quantities_result ON quantities(result_id, name);
+CREATE INDEX IF NOT EXISTS idx_quantities_species ON quantities(species, name);
+"""
+
+LOCATION_COMPONENTS = {"FW": "wall", "DIV": "divertor", "DIVERTOR": "divertor"}
+
+
+def _location_key(location: Optional[str]) -> Optional[str]:
+    if location is None:
+        return None
+    location = location.strip().upper()
+    return "DIV" if location == "DIVERTOR" else location
+
+
+class ResultsDB:
+    """SQLite store of results (see module docstring).
+
+    Args:
+        path: database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------ ingestion
+
+    def ingest_input_table(self, csv_path):
+        """Replaces the bins table with the rows of an input table (bin_id = 1-based row)."""
+        rows = []
+        with open(csv_path, "r", newline="") as f:
+            for row_index, row in enumerate(csv.DictReader(f)):
+                location = _location_key(row["location"])
+                rows.append((
+                    row_index + 1,
+                    int(row["Bin number"]),
+                    row["Material"],
+                    material_group(row["Material"]),
+                    row["mode"],
+                    mode_category(row["mode"]),
+                    location,
+                    LOCATION_COMPONENTS.get(location, "wall"),
+                    float(row["Thickness (m)"]),
+                    float(row["Surface area (m^2)"]),
+                    float(row["S. Area parent bin (m^2)"]),
+                ))
+        with self.conn:
+            self.conn.execute("DELETE FROM bins")
+            self.conn.executemany("INSERT INTO bins VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+        return len(rows)
+
+    def _input_row(self, bin_id: Optional[int], bin_number: Optional[int], mode: Optional[str]):
+        """Input table row of a result: by bin_id, else by (bin number, mode category)."""
+        columns = "bin_id, bin_number, material, mode, location, component, surface_area"
+        if bin_id is not None:
+            row = self.conn.execute(f"SELECT {columns} FROM bins WHERE bin_id = ?", (bin_id,)).fetchone()
+            if row is not None:
+                return row
+        if bin_number is None:
+            return None
+        return self.conn.execute(
+            f"SELECT {columns} FROM bins WHERE bin_number = ? "
+            "AND (mode_category IS ? OR component = 'divertor') ORDER BY bin_id LIMIT 1",
+            (bin_number, mode),
+        ).fetchone()
+
+    def _insert_result(self, path: Path, data: dict):
+        stat = path.stat()
+        stem_bin_number, stem_mode = parse_result_stem(path.stem)
+        id_match = re.match(r"id_(\d+)_", path.stem)
+        bin_id = data.get("bin_id", int(id_match.group(1)) if id_match else None)
+        bin_number = data.get("bin_number", stem_bin_number)
+        mode = data.get("mode")
+        mode_cat = mode_category(mode) if mode else stem_mode
+
+        input_row = self._input_row(bin_id, bin_number, mode_cat)
+        if input_row is not None:
+            bin_id, bin_number, table_material, table_mode, location, component, area = input_row
+            mode = mode or table_mode
+            mode_cat = mode_category(mode)
+        else:
+            table_material, location, component, area = None, None, None, None
+        material = data.get("material", table_material)
+        group = material_group(material) if isinstance(material, str) else material_from_result(data)
+        location = _location_key(data.get("location", location))
+        component = LOCATION_COMPONENTS.get(location, component)
+        area = data.get("surface_area", area)
+
+        t = np.asarray(data["t"], dtype=float)
+        cursor = self.conn.execute(
+            "INSERT INTO results (file, mtime_ns, size, bin_id, bin_number, material, material_group, mode, "
+            "mode_category, location, component, surface_area, n_times, t_end, input_hash) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            (str(path.resolve()), stat.st_mtime_ns, stat.st_size, bin_id, bin_number, material, group, mode,
+             mode_cat, location, component, area, len(t), float(t[-1]) if len(t) else None,
+             data.get("input_hash")),
+        )
+        result_id = cursor.lastrowid
+        steps = range(len(t))
+        for key, values in data.items():
+            if isinstance(values, dict) and "data" in values:
+                values = values["data"]
+            if key == "t" or not isinstance(values, list) or len(values) != len(t):
+                continue
+            cursor = self.conn.execute(
+                "INSERT INTO quantities (result_id, name, species) VALUES (?,?,?)",
+                (result_id, key, species_of_key(key)),
+            )
+            self.conn.executemany(
+                "INSERT INTO series VALUES (?,?,?,?)",
+                zip(repeat(cursor.lastrowid), t.tolist(), steps, np.asarray(values, dtype=float).tolist()),
+            )
+
+    def ingest(self, results_dir, input_table=None, pattern: str = "*.json", workers: Optional[int] = None, verbose: bool = True):
+        """Ingests the result files of a directory; unchanged files are skipped.
+
+        Returns:
+            (number of files ingested, number of unchanged files skipped)
+        """
+        if input_table is not None:
+            self.ingest_input_table(input_table)
+        known = {
+            file: (mtime_ns, size)
+            for file, mtime_ns, size in self.conn.execute("SELECT file, mtime_ns, size FROM results")
+        }
+        paths, unchanged = [], 0
+        for path in sorted(Path(results_dir).glob(pattern)):
+            stat = path.stat()
+            if known.get(str(path.resolve())) == (stat.st_mtime_ns, stat.st_size):
+                unchanged += 1
+            else:
+                paths.append(path)
+
+        reader = ResultsReader(results_dir, pattern=pattern, workers=workers, cache_size=0)
+        ingested = 0
+        self.conn.execute("PRAGMA synchronous = OFF")
+        for path, data in reader.iter_results(paths):
+            if "t" not in data:
+                if verbose:
+                    print(f"[WARN] Skipping {path.name}: missing 't' array.")
+                continue
+            with self.conn:
+                self.conn.execute("DELETE FROM results WHERE file = ?", (str(path.resolve()),))
+                self._insert_result(path, data)
+            ingested += 1
+            if verbose:
+                print(f"[OK] Ingested {path.name}")
+        self.conn.execute("PRAGMA synchronous = FULL")
+        return ingested, unchanged
+
+    # ------------------------------------------------------------------ queries
+
+    @staticmethod
+    def _filters(
+        bin_ids: Optional[Sequence[int]] = None,
+        bin_numbers: Optional[Sequence[int]] = None,
+        material: Optional[str] = None,
+        mode: Optional[str] = None,
+        location: Optional[str] = None,
+        quantity: Optional[str] = None,
+        species: Optional[str] = None,
+    ):
+        clauses, params = [], []
+        if bin_ids:
+            clauses.append(f"r.bin_id IN ({','.join('?' * len(bin_ids))})")
+            params.extend(bin_ids)
+        if bin_numbers:
+            clauses.append(f"r.bin_number IN ({','.join('?' * len(bin_numbers))})")
+            params.extend(bin_numbers)
+        if material:
+            clauses.append("r.material_group = ?")
+            params.append(material_group(material))
+        if mode:
+            clauses.append("r.mode_category = ?")
+            params.append(mode_category(mode) or mode)
+        if location:
+            clauses.append("r.location = ?")
+            params.append(_location_key(location))
+        if quantity:
+            clauses.append("q.name = ?")
+            params.append(quantity)
+        if species:
+            clauses.append("q.species = ?")
+            params.append(species)
+        return clauses, params
+
+    def query(self, t_min: Optional[float] = None, t_max: Optional[float] = None, **filters):
+        """Samples of the selected series in a time window, as a DataFrame.
+
+        Args:
+            t_min, t_max: time window (s), inclusive
+            **filters: bin_ids, bin_numbers, material, mode, location, quantity, species
+
+        Returns:
+            DataFrame with bin_id, bin_number, material_group, mode_category, location,
+            surface_area, quantity, species, t, value
+        """
+        import pandas as pd
+
+        clauses, params = self._filters(**filters)
+        if t_min is not None:
+            clauses.append("s.t >= ?")
+            params.append(t_min)
+        if t_max is not None:
+            clauses.append("s.t <= ?")
+            params.append(t_max)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            "SELECT r.bin_id, r.bin_number, r.material_group, r.mode_category, r.location, r.surface_area, "
+            "q.name AS quantity, q.species, s.t, s.value "
+            "FROM series s JOIN quantities q ON q.quantity_id = s.quantity_id "
+            f"JOIN results r ON r.result_id = q.result_id {where} "
+            "ORDER BY r.bin_id, q.name, s.t, s.step"
+        )
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def at_time(self, t: float, **filters):
+        """Value of each selected series at the sample nearest to ``t`` (first of repeated times).
+
+        Returns:
+            DataFrame as ``query``, one row per series
+        """
+        import pandas as pd
+
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # nearest sample on each side of t, found on the (quantity_id, t) key
+        sql = (
+            "WITH bounds AS ("
+            "  SELECT q.quantity_id,"
+            "    (SELECT MAX(s.t) FROM series s WHERE s.quantity_id = q.quantity_id AND s.t <= ?) AS t_lo,"
+            "    (SELECT MIN(s.t) FROM series s WHERE s.quantity_id = q.quantity_id AND s.t >= ?) AS t_hi"
+            f"  FROM quantities q JOIN results r ON r.result_id = q.result_id {where}"
+            "), nearest AS ("
+            "  SELECT quantity_id, CASE WHEN t_hi IS NULL OR (t_lo IS NOT NULL AND ? - t_lo <= t_hi - ?)"
+            "    THEN t_lo ELSE t_hi END AS t FROM bounds"
+            ") "
+            "SELECT r.bin_id, r.bin_number, r.material_group, r.mode_category, r.location, r.surface_area, "
+            "q.name AS quantity, q.species, n.t, "
+            "(SELECT s.value FROM series s WHERE s.quantity_id = n.quantity_id AND s.t = n.t "
+            " ORDER BY s.step LIMIT 1) AS value "
+            "FROM nearest n JOIN quantities q ON q.quantity_id = n.quantity_id "
+            "JOIN results r ON r.result_id = q.result_id ORDER BY r.bin_id, q.name"
+        )
+        return pd.read_sql_query(sql, self.conn, params=[t, t, *params, t, t])
+
+
+def parse_bins(spec: Optional[str]) -> Optional[list]:
+    """Parses a bin specification such as ``"1-5, 10"``."""
+    if not spec:
+        return None
+    bins = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-")
+            bins.extend(range(int(start), int(end) + 1))
+        elif part:
+            bins.append(int(part))
+    return bins
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Indexed SQLite store of per-bin results")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Load result JSON files and the input table")
+    ingest_parser.add_argument("db", type=Path, help="Database file")
+    ingest_parser.add_argument("results_dir", type=Path, help="Directory with JSON files")
+    ingest_parser.add_argument("--input-table", dest="input_table", type=Path, default=None,
+                               help="Input table with bin configuration")
+    ingest_parser.add_argument("--workers", type=int, default=None, help="Parallel JSON parsing threads")
+
+    query_parser = subparsers.add_parser("query", help="Query series by bin, material, mode, location and time")
+    query_parser.add_argument("db", type=Path, help="Database file")
+    query_parser.add_argument("--bins", default=None, help='Bin IDs (input table rows), e.g. "1-5, 10"')
+    query_parser.add_argument("--bin-numbers", dest="bin_numbers", default=None, help="Bin numbers, e.g. \"0-17\"")
+    query_parser.add_argument("--material", default=None, help="W, B, SS or other")
+    query_parser.add_argument("--mode", default=None, help="high, low or shadow")
+    query_parser.add_argument("--location", default=None, help="FW or DIV")
+    query_parser.add_argument("--quantity", default=None, help="Quantity key, e.g. T_trap1")
+    query_parser.add_argument("--species", default=None, help="D or T")
+    query_parser.add_argument("--at", type=float, default=None, help="Single time (nearest sample)")
+    query_parser.add_argument("--t-min", dest="t_min", type=float, default=None, help="Start of the time window")
+    query_parser.add_argument("--t-max", dest="t_max", type=float, default=None, help="End of the time window")
+    query_parser.add_argument("--hours", action="store_true", help="Times are given in hours instead of seconds")
+    query_parser.add_argument("--sum", action="store_true",
+                              help="Print the area-weighted sum (atoms and grams of T) instead of the rows")
+    query_parser.add_argument("--csv", type=Path, default=None, help="Write the rows to a CSV file")
+
+    args = parser.parse_args(argv)
+    with ResultsDB(args.db) as db:
+        if args.command == "ingest":
+            ingested, unchanged = db.ingest(args.results_dir, args.input_table, workers=args.workers)
+            print(f"[OK] {ingested} files ingested, {unchanged} unchanged, database: {args.db}")
+            return
+
+        scale = 3600.0 if args.hours else 1.0
+        filters = dict(
+            bin_ids=parse_bins(args.bins),
+            bin_numbers=parse_bins(args.bin_numbers),
+            material=args.material,
+            mode=args.mode,
+            location=args.location,
+            quantity=args.quantity,
+            species=args.species,
+        )
+        if args.at is not None:
+            df = db.at_time(args.at * scale, **filters)
+        else:
+            df = db.query(
+                t_min=None if args.t_min is None else args.t_min * scale,
+                t_max=None if args.t_max is None else args.t_max * scale,
+                **filters,
+            )
+
+    if args.csv is not None:
+        df.to_csv(args.csv, index=False)
+        print(f"[OK] Saved {len(df)} rows to {args.csv}")
+    elif args.sum:
+        weighted = df["value"] * df["surface_area"]
+        unit = "h" if args.hours else "s"
+        if args.at is not None:
+            # nearest samples of different series may not share the same time
+            atoms = weighted.sum()
+            print(f"t = {args.at:.6g} {unit}: {atoms:.6e} atoms, {atoms_to_grams(atoms):.6e} g T")
+            return
+        for t, atoms in weighted.groupby(df["t"]).sum().items():
+            print(f"t = {t / scale:.6g} {unit}: {atoms:.6e} atoms, {atoms_to_grams(atoms):.6e} g T")
+    else:
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Parallel loading of per-bin result JSON files.
+
+Shared by the plotting scripts. Files are parsed in a thread or process pool,
+in a single pass that only keeps the requested keys (names, or a picklable
+predicate on the key for process pools). Interactive sessions can keep parsed
+results in an in-memory LRU (``cache_size``) so unchanged files are not re-read;
+batch scripts leave it disabled so memory stays bounded by one result.
+
+Usage:
+    from results_reader import ResultsReader
+
+    reader = ResultsReader(RESULTS_DIR, workers=8)
+    for path, data in reader.iter_results(keys=["t", "T_trap1"]):
+        ...
+
+    # interactive: repeated loads of an unchanged file come from the cache
+    reader = ResultsReader(RESULTS_DIR, cache_size=128)
+    data = reader.load(path)
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+KeySelector = Union[None, Iterable[str], Callable[[str], bool]]
+
+
+def _freeze_keys(keys: KeySelector):
+    """Returns a hashable, picklable form of a key selector."""
+    if keys is None or callable(keys):
+        return keys
+    return frozenset(keys)
+
+
+def load_result(path, keys: KeySelector = None) -> dict:
+    """Parses one result file and keeps only the selected keys.
+
+    Args:
+        path: JSON result file
+        keys: None for every key, an iterable of key names or a predicate on the key
+
+    Returns:
+        the (filtered) result dictionary
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    if keys is None:
+        return data
+    if callable(keys):
+        return {key: value for key, value in data.items() if keys(key)}
+    return {key: data[key] for key in keys if key in data}
+
+
+class ResultsReader:
+    """Loads the result files of a results directory in parallel.
+
+    Args:
+        results_dir: directory containing the result JSON files
+        pattern: glob pattern of the result files
+        workers: pool size (default: number of CPUs, at most 8)
+        executor: ``thread`` or ``process``
+        cache_size: number of parsed results kept in the LRU (default 0: disabled)
+    """
+
+    def __init__(
+        self,
+        results_dir,
+        pattern: str = "*.json",
+        workers: Optional[int] = None,
+        executor: str = "thread",
+        cache_size: int = 0,
+    ):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"executor must be 'thread' or 'process', got {executor}")
+        self.results_dir = Path(results_dir)
+        self.pattern = pattern
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.executor = executor
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def files(self) -> List[Path]:
+        return sorted(self.results_dir.glob(self.pattern))
+
+    def _cache_key(self, path: Path, keys) -> Optional[tuple]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (str(path.resolve()), stat.st_mtime_ns, stat.st_size, keys)
+
+    def _cache_get(self, cache_key) -> Optional[dict]:
+        if cache_key is None or self.cache_size <= 0:
+            return None
+        with self._lock:
+            data = self._cache.get(cache_key)
+            if data is not None:
+                self._cache.move_to_end(cache_key)
+            return data
+
+    def _cache_put(self, cache_key, data: dict):
+        if cache_key is None or self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[cache_key] = data
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def load(self, path, keys: KeySelector = None) -> dict:
+        """Loads one result file, from the LRU if it is unchanged since it was parsed.
+
+        Cached dictionaries are shared between calls and must not be modified.
+        """
+        path = Path(path)
+        frozen = _freeze_keys(keys)
+        cache_key = self._cache_key(path, frozen)
+        data = self._cache_get(cache_key)
+        if data is None:
+            data = load_result(path, frozen)
+            self._cache_put(cache_key, data)
+        return data
+
+    def iter_results(
+        self,
+        paths: Optional[Iterable] = None,
+        keys: KeySelector = None,
+        on_error: str = "warn",
+    ) -> Iterator[Tuple[Path, dict]]:
+        """Yields ``(path, data)`` in file order while the next files are parsed in the pool.
+
+        At most ``2 * workers`` files are parsed ahead of the consumer.
+
+        Args:
+            paths: files to load (default: every file matching the pattern)
+            keys: key selector (see ``load_result``); process pools need picklable selectors
+            on_error: ``warn`` prints and skips unreadable files, ``raise`` re-raises
+        """
+        paths = [Path(p) for p in (self.files() if paths is None else paths)]
+        frozen = _freeze_keys(keys)
+        pool_class = ThreadPoolExecutor if self.executor == "thread" else ProcessPoolExecutor
+        window = 2 * self.workers
+        with pool_class(max_workers=self.workers) as pool:
+            pending: "OrderedDict[int, tuple]" = OrderedDict()
+            next_index = 0
+
+            def submit_until_full():
+                nonlocal next_index
+                while next_index < len(paths) and len(pending) < window:
+                    path = paths[next_index]
+                    cache_key = self._cache_key(path, frozen)
+                    cached = self._cache_get(cache_key)
+                    future = None if cached is not None else pool.submit(load_result, path, frozen)
+                    pending[next_index] = (path, cache_key, cached, future)
+                    next_index += 1
+
+            submit_until_full()
+            while pending:
+                _, (path, cache_key, data, future) = pending.popitem(last=False)
+                if future is not None:
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        if on_error == "raise":
+                            raise
+                        print(f"[ERROR] Failed loading {path.name}: {e}")
+                        submit_until_full()
+                        continue
+                    self._cache_put(cache_key, data)
+                submit_until_full()
+                yield path, data
+
+    def load_all(self, paths: Optional[Iterable] = None, keys: KeySelector = None) -> Dict[Path, dict]:
+        """Loads every result file, returning ``{path: data}``."""
+        return dict(self.iter_results(paths, keys))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+Equivalence classes of physically identical bins.
+
+Many rows of an input table only differ by their coordinates and areas: same
+material, thickness, Cu thickness, mode, boundary conditions, solver settings,
+ion scaling factor, mesh and plasma data values. Their results are per m², so
+they are identical. Bins are grouped by a hash of these inputs
+(``class_key``); only the representative of each class (lowest bin ID) is
+simulated and its result is copied to the other members with their own bin
+metadata (ID, number, location, areas and input hash), so reactor totals are
+unchanged.
+
+Usage:
+    python run_on_cluster/bin_classes.py <input_folder> <scenario_folder> <scenario_name>
+        [--bins "1-5, 10"] [--stale] [--class-map bin_classes.json] [-v]
+
+Prints the representative bin IDs on stdout, separated by spaces (with
+``--stale``, only the classes with at least one missing or outdated result)
+and writes the classes to ``--class-map`` as ``{representative: [members]}``.
+Pass that file to ``run_new_csv_bin.py --class-map`` so that each
+representative run also writes the results of its members.
+"""
+
+import argparse
+import contextlib
+import copy
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+hisp_src = os.path.abspath(os.path.join(parent_dir, "hisp", "src"))
+if hisp_src not in sys.path:
+    sys.path.insert(0, hisp_src)
+
+from input_hashing import bin_record, hash_record, mesh_record, plasma_data_record, result_input_hash, scenario_record
+from output_policy import OutputPolicies
+from phase_policy import PhasePolicy
+from run_bin_functions import existing_input_hash, result_paths
+
+# Bin fields that do not change the per-m² result (ion_scaling_factor is hashed instead of the areas)
+IDENTITY_FIELDS = ("bin_number", "coordinates", "parent_bin_surf_area", "surface_area", "f_ion_flux_fraction")
+
+# Result fields describing the bin rather than the simulation, rewritten for every member
+MEMBER_FIELDS = ("bin_id", "bin_number", "location", "surface_area", "parent_bin_surf_area", "ion_scaling_factor")
+
+
+def _without_bin_index(row: dict) -> dict:
+    return {column: value for column, value in row.items() if column != "Bin_Index"}
+
+
+def class_key(bin, mesh, scenario, plasma_data_handling, coolant_temp: float, output_policy: Optional[dict] = None) -> str:
+    """Returns the hash of the inputs that determine the per-m² result of a bin.
+
+    Same inputs as ``result_input_hash`` without the identity and area fields of
+    the bin and with the plasma data values only (not the row index they come from).
+    """
+    record = {key: value for key, value in bin_record(bin).items() if key not in IDENTITY_FIELDS}
+    record["ion_scaling_factor"] = bin.ion_scaling_factor
+    plasma_data = plasma_data_record(plasma_data_handling, bin, [pulse.pulse_type for pulse in scenario.pulses])
+    for pulse_type, rows in plasma_data.items():
+        if isinstance(rows, list):
+            plasma_data[pulse_type] = [_without_bin_index(row) for row in rows]
+        elif isinstance(rows, dict) and not pulse_type.endswith("_slices"):
+            plasma_data[pulse_type] = _without_bin_index(rows)
+    return hash_record({
+        "bin": record,
+        "mesh": mesh_record(mesh),
+        "pulses": scenario_record(scenario.pulses),
+        "plasma_data": plasma_data,
+        "coolant_temp": coolant_temp,
+        "output_policy": output_policy,
+    })
+
+
+def bin_classes(bins, bins_meshes, scenario, plasma_data_handling, input_dir=None) -> List[list]:
+    """Groups bins into equivalence classes (each bin at the coolant temperature of its row).
+
+    Returns:
+        list of classes (lists of bins sorted by bin ID, the first being the
+        representative), sorted by representative bin ID
+    """
+    classes: Dict[str, list] = {}
+    for target_bin in bins:
+        key = class_key(
+            target_bin,
+            bins_meshes.get(target_bin.bin_id),
+            scenario,
+            plasma_data_handling,
+            target_bin.coolant_temp,
+            output_policy=OutputPolicies.for_bin(target_bin, input_dir).record(),
+        )
+        classes.setdefault(key, []).append(target_bin)
+    groups = [sorted(members, key=lambda b: b.bin_id) for members in classes.values()]
+    return sorted(groups, key=lambda members: members[0].bin_id)
+
+
+def write_class_map(path, classes: List[list]):
+    """Writes ``{representative bin ID: [member bin IDs]}`` (members exclude the representative)."""
+    class_map = {str(members[0].bin_id): [b.bin_id for b in members[1:]] for members in classes}
+    with open(path, "w") as f:
+        json.dump(class_map, f, indent=2)
+
+
+def read_class_map(path) -> Dict[int, List[int]]:
+    with open(path, "r") as f:
+        return {int(representative): [int(b) for b in members] for representative, members in json.load(f).items()}
+
+
+def member_result(data: dict, representative, member, input_hash: str) -> dict:
+    """Copy of a representative's result dictionary with the metadata of a member."""
+    result = copy.copy(data)
+    for field in MEMBER_FIELDS:
+        result[field] = getattr(member, field)
+    result["input_hash"] = input_hash
+    result["representative_bin_id"] = representative.bin_id
+    return result
+
+
+def fan_out(input_dir, representative, members, bins_meshes, scenario, plasma_data_handling,
+            force: bool = False, cycle_acceleration: Optional[dict] = None) -> List[str]:
+    """Writes the results of the members of a class from the representative's result files.
+
+    Members whose class key differs from the representative's (inputs changed
+    since the class map was written) are left out with a warning, as are those
+    whose result is already up to date unless ``force`` is set. ``cycle_acceleration``
+    is the record of the representative's run, hashed with the members' inputs
+    (as is the phase policy of the folder, unless the representative's run ignored it).
+
+    Returns:
+        paths of the written result files
+    """
+    output_file, profiles_file = result_paths(input_dir, representative)
+    with open(output_file, "r") as f:
+        data = json.load(f)
+    profiles = None
+    if os.path.exists(profiles_file):
+        with open(profiles_file, "r") as f:
+            profiles = json.load(f)
+
+    def key_of(target_bin):
+        return class_key(
+            target_bin, bins_meshes.get(target_bin.bin_id), scenario, plasma_data_handling, target_bin.coolant_temp,
+            output_policy=OutputPolicies.for_bin(target_bin, input_dir).record(),
+        )
+
+    representative_key = key_of(representative)
+    phase_policy = None if data.get("phase_policy_ignored") else PhasePolicy.from_input_dir(input_dir).record()
+    written = []
+    for member in members:
+        if key_of(member) != representative_key:
+            print(f"Warning: bin {member.bin_id} is no longer equivalent to bin {representative.bin_id}, "
+                  f"run it on its own")
+            continue
+        input_hash = result_input_hash(
+            member, bins_meshes.get(member.bin_id), scenario, plasma_data_handling, member.coolant_temp,
+            output_policy=OutputPolicies.for_bin(member, input_dir).record(),
+            cycle_acceleration=cycle_acceleration,
+            phase_policy=phase_policy,
+        )
+        member_file, member_profiles_file = result_paths(input_dir, member)
+        if not force and existing_input_hash(member_file) == input_hash:
+            continue
+        with open(member_file, "w") as f:
+            json.dump(member_result(data, representative, member, input_hash), f, indent=4)
+        if profiles is not None:
+            os.makedirs(os.path.dirname(member_profiles_file), exist_ok=True)
+            with open(member_profiles_file, "w") as f:
+                json.dump(profiles, f, indent=4)
+        written.append(member_file)
+    return written
+
+
+def main():
+    from bins_from_csv.csv_bin_loader import CSVBinLoader
+    from pipeline import parse_bin_spec
+    from run_bin_functions import load_bins_meshes, load_plasma_data_handling, load_scenario_variable
+    from stale_bins import stale_bins
+
+    parser = argparse.ArgumentParser(description="Group physically identical bins and list one representative per class")
+    parser.add_argument("input_folder", help="Input folder (input_table.csv, materials.csv, mesh.py)")
+    parser.add_argument("scenario_folder", help="Scenario folder path")
+    parser.add_argument("scenario_name", help="Scenario name")
+    parser.add_argument("--csv-file", dest="csv_file", default=None,
+                        help="Input table (default: <input_folder>/input_table.csv)")
+    parser.add_argument("--bins", default=None, help='Bin specification, e.g. "1-5, 10" (default: all bins)')
+    parser.add_argument("--stale", action="store_true",
+                        help="Only list the classes with at least one missing or outdated result")
+    parser.add_argument("--class-map", dest="class_map", default=None,
+                        help="Write the classes to this JSON file (for run_new_csv_bin.py --class-map)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the classes on stderr")
+    args = parser.parse_args()
+
+    input_dir = args.input_folder
+    # progress messages of the loaders go to stderr, stdout only carries the bin IDs
+    with contextlib.redirect_stdout(sys.stderr):
+        scenario = load_scenario_variable(args.scenario_folder, args.scenario_name)
+        if scenario is None:
+            sys.exit(1)
+
+        csv_file = args.csv_file or os.path.join(input_dir, "input_table.csv")
+        materials_path = None
+        if input_dir and input_dir != "input_files":
+            materials_in_dir = os.path.join(input_dir, "materials.csv")
+            if os.path.exists(materials_in_dir):
+                materials_path = materials_in_dir
+        reactor = CSVBinLoader(csv_file, materials_csv_path=materials_path).load_reactor()
+        bins = reactor.bins
+        if args.bins:
+            selected = set(parse_bin_spec(args.bins))
+            bins = [b for b in bins if b.bin_id in selected]
+
+        bins_meshes = load_bins_meshes(input_dir, reactor, [b.bin_id for b in bins])
+        plasma_data_handling = load_plasma_data_handling(scenario)
+        classes = bin_classes(bins, bins_meshes, scenario, plasma_data_handling, input_dir)
+        if args.stale:
+            stale = set(stale_bins(input_dir, scenario, bins, bins_meshes, plasma_data_handling))
+            classes = [members for members in classes if any(b.bin_id in stale for b in members)]
+
+    if args.class_map:
+        write_class_map(args.class_map, classes)
+    if args.verbose:
+        for members in classes:
+            print(f"  bin {members[0].bin_id}: {[b.bin_id for b in members[1:]]}", file=sys.stderr)
+    print(f"{len(classes)} classes for {sum(len(members) for members in classes)} bins", file=sys.stderr)
+    print(" ".join(str(members[0].bin_id) for members in classes))
+
+
+if __name__ == "__main__":
+    main()
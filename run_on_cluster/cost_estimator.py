@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+"""
+Per-bin cost estimation for SLURM scheduling.
+
+Estimates the wall time and memory of each bin of an input folder so that the
+submitter can request matching resources, pick a partition and batch small
+bins together instead of submitting every bin with the same reservation.
+
+Two estimation levels are available:
+
+- model (default, cheap): a calibrated model of the number of solver steps
+  (from the scenario and the bin stepsize settings), the number of mesh nodes,
+  the number of trapped species and the boundary condition type.
+- pre-run (coarse-to-fine): each bin is run over the first half and over the
+  whole of a short simulated window in its own Python process, with the same
+  milestones and phase policy as the real run. The two lengths give the setup
+  time and the time per step, which are extrapolated to the full scenario with
+  the same step-count model; the startup of the process (imports, inputs) is
+  measured separately and added once. The peak memory is that of the process.
+
+Usage:
+    python run_on_cluster/cost_estimator.py <input_folder> [--bins "1-5, 10"] [--pre-run 3600]
+        [--calibration measurements.csv] [--partition sirius:300:64] [--output estimates.csv]
+
+The output CSV has one row per bin with the columns
+bin_id, est_time_s, est_mem_mb, time_request, mem_request_mb, partition, batch
+and is read by ``slurm_new_csv_jobs.sh --estimates`` and ``pipeline.py --estimates``.
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+from phase_policy import PhasePolicy
+from pipeline import parse_bin_spec
+from run_bin_functions import (
+    DEFAULT_COOLANT_TEMP,
+    install_milestones,
+    install_phase_policy,
+    load_bins_meshes,
+    load_plasma_data_handling,
+    load_scenario_variable,
+)
+
+# Number of mesh nodes assumed when a bin has no entry in BINS_MESHES
+DEFAULT_NB_NODES = 1000
+
+# Relative cost of the plasma-facing boundary conditions (Robin BCs are stiffer)
+BC_COST_FACTORS = {
+    "robin": 1.5,
+    "dirichlet": 1.0,
+    "neumann": 1.0,
+}
+
+
+@dataclass
+class CostModel:
+    """Linear cost model, calibrated on measured runs.
+
+    wall time (s) = overhead_s + seconds_per_unit * steps * nodes * species * bc_factor
+    memory (MB)   = mem_base_mb + mem_per_node_species_mb * nodes * species
+    """
+    overhead_s: float = 120.0
+    seconds_per_unit: float = 2e-5
+    mem_base_mb: float = 400.0
+    mem_per_node_species_mb: float = 0.05
+
+    @classmethod
+    def from_json(cls, path: str) -> "CostModel":
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+    def to_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(asdict(self), f, indent=4)
+
+    def time_s(self, units: float) -> float:
+        return self.overhead_s + self.seconds_per_unit * units
+
+    def mem_mb(self, node_species: float) -> float:
+        return self.mem_base_mb + self.mem_per_node_species_mb * node_species
+
+
+def estimate_nb_steps(scenario, bin_config, phase_policy: Optional[PhasePolicy] = None) -> float:
+    """Estimates the number of solver steps of a bin over a scenario.
+
+    Plasma-on segments are stepped at most at ``fp_max_stepsize`` for FP pulses,
+    all other segments at most at ``max_stepsize_no_fp``, unless the phase
+    policy (``phase_policy.json``) sets another stepsize. Every milestone forces
+    a small step and a few steps to grow back, counted as ``log2`` of the ratio
+    between the maximum stepsize and the initial stepsize (1 s).
+    """
+    phase_policy = phase_policy or PhasePolicy()
+    steps = 0.0
+    for pulse in scenario.pulses:
+        on_stepsize, off_stepsize = phase_policy.pulse_stepsizes(pulse, bin_config)
+        steps += pulse.nb_pulses * (pulse.duration_no_waiting / on_stepsize + pulse.waiting / off_stepsize)
+    regrowth = np.log2(max(bin_config.max_stepsize_no_fp, 2.0))
+    steps += sum(1 for _ in scenario.iter_milestones()) * regrowth
+    return float(steps)
+
+
+def bc_factor(bin_config) -> float:
+    """Returns the relative cost of the bin boundary conditions."""
+    bc = bin_config.bc_plasma_facing_surface.lower()
+    for name, factor in BC_COST_FACTORS.items():
+        if bc.startswith(name):
+            return factor
+    return 1.0
+
+
+def bin_features(bin, scenario, bins_meshes, phase_policy: Optional[PhasePolicy] = None) -> Dict[str, float]:
+    """Returns the cost features of a bin (steps, nodes, species, BC factor)."""
+    mesh = bins_meshes.get(bin.bin_id)
+    nb_nodes = len(mesh.mesh) if mesh is not None else DEFAULT_NB_NODES
+    # mobile D and T plus one trapped D and T species per trap
+    nb_species = 2 * (1 + len(bin.material.traps))
+    return {
+        "steps": estimate_nb_steps(scenario, bin.bin_configuration, phase_policy),
+        "nodes": nb_nodes,
+        "species": nb_species,
+        "bc_factor": bc_factor(bin.bin_configuration),
+    }
+
+
+def cost_units(features: Dict[str, float]) -> float:
+    return features["steps"] * features["nodes"] * features["species"] * features["bc_factor"]
+
+
+def calibrate(model: CostModel, features: Dict[int, Dict[str, float]], measurements_csv: str) -> CostModel:
+    """Fits the cost model on measured runs.
+
+    Args:
+        model: model providing the defaults for unmeasured coefficients
+        features: bin_id -> features of the bins of the current input folder
+        measurements_csv: CSV with columns bin_id, elapsed_s, max_rss_mb
+            (e.g. exported from ``sacct``) for runs of the same input folder
+
+    Returns:
+        the calibrated model
+    """
+    units, elapsed, node_species, rss = [], [], [], []
+    with open(measurements_csv, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            bin_id = int(row["bin_id"])
+            if bin_id not in features:
+                continue
+            units.append(cost_units(features[bin_id]))
+            elapsed.append(float(row["elapsed_s"]))
+            node_species.append(features[bin_id]["nodes"] * features[bin_id]["species"])
+            rss.append(float(row["max_rss_mb"]))
+    if len(units) < 2:
+        print(f"Warning: fewer than 2 usable measurements in {measurements_csv}, keeping default model")
+        return model
+
+    (slope, intercept), *_ = np.linalg.lstsq(np.vstack([units, np.ones(len(units))]).T, elapsed, rcond=None)
+    (mem_slope, mem_intercept), *_ = np.linalg.lstsq(np.vstack([node_species, np.ones(len(rss))]).T, rss, rcond=None)
+    return CostModel(
+        overhead_s=max(float(intercept), 0.0),
+        seconds_per_unit=max(float(slope), model.seconds_per_unit * 1e-3),
+        mem_base_mb=max(float(mem_intercept), 100.0),
+        mem_per_node_species_mb=max(float(mem_slope), 0.0),
+    )
+
+
+def pre_run_windows(window_s: float) -> List[float]:
+    """Simulated windows (s) of the pre-run of a bin: the first half of ``window_s`` and all of it."""
+    return [window_s / 2, window_s]
+
+
+def pre_run(bin, scenario, input_dir: str, scenario_name: str, window_s: float,
+            phase_policy: Optional[PhasePolicy] = None) -> Dict[str, float]:
+    """Runs a bin over the ``pre_run_windows`` of the scenario and measures it.
+
+    The windows are run by a child process (``--pre-run-child``), so the peak
+    memory is that of the bin alone rather than the peak of this process. The
+    startup of the child is its wall time outside the windows.
+
+    Returns:
+        dictionary with the startup time (s), the setup time and time per step
+        of a run (``fit_pre_runs``) and the peak memory (MB)
+    """
+    fd, result_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    command = [
+        sys.executable, os.path.abspath(__file__), input_dir, "--scenario", scenario_name,
+        "--bins", str(bin.bin_id), "--pre-run", str(window_s), "--pre-run-child", result_path,
+    ]
+    try:
+        start = time.perf_counter()
+        child = subprocess.Popen(command)
+        # rusage of this child only (RUSAGE_CHILDREN would be the peak of every pre-run so far)
+        _, status, rusage = os.wait4(child.pid, 0)
+        total_s = time.perf_counter() - start
+        child.returncode = os.waitstatus_to_exitcode(status)
+        if child.returncode != 0:
+            raise RuntimeError(f"Pre-run of bin {bin.bin_id} failed with exit code {child.returncode}")
+        with open(result_path, "r") as f:
+            elapsed = json.load(f)["elapsed_s"]
+    finally:
+        os.remove(result_path)
+    steps = [
+        estimate_nb_steps(scenario.truncate(window), bin.bin_configuration, phase_policy)
+        for window in pre_run_windows(window_s)
+    ]
+    setup_s, per_step_s = fit_pre_runs(steps, elapsed)
+    return {
+        "startup_s": max(total_s - sum(elapsed), 0.0),
+        "setup_s": setup_s,
+        "per_step_s": per_step_s,
+        # ru_maxrss is in kB on Linux
+        "max_rss_mb": rusage.ru_maxrss / 1024.0,
+    }
+
+
+def fit_pre_runs(steps: List[float], elapsed: List[float]):
+    """Fits ``elapsed = setup_s + per_step_s * steps`` on pre-runs of different lengths.
+
+    Returns:
+        (setup_s, per_step_s); without two distinct step counts or with a
+        non-increasing elapsed time, the setup time is 0 and the time per step
+        that of the longest (then slowest) pre-run
+    """
+    steps = np.asarray(steps, dtype=float)
+    elapsed = np.asarray(elapsed, dtype=float)
+    if len(np.unique(steps)) >= 2:
+        (per_step_s, setup_s), *_ = np.linalg.lstsq(np.vstack([steps, np.ones(len(steps))]).T, elapsed, rcond=None)
+        if per_step_s > 0:
+            setup_s = min(max(float(setup_s), 0.0), float(elapsed.min()))
+            return setup_s, float(per_step_s)
+    longest = max(range(len(steps)), key=lambda i: (steps[i], elapsed[i]))
+    return 0.0, float(elapsed[longest] / max(steps[longest], 1.0))
+
+
+def run_pre_run_window(bin, scenario, make_new_model, window_s: float,
+                       phase_policy: Optional[PhasePolicy] = None) -> float:
+    """Runs a bin over the first ``window_s`` seconds of the scenario and returns the elapsed time (s).
+
+    The model gets the milestones and phase policy of ``run_new_csv_bin.py``,
+    so it takes the steps counted by ``estimate_nb_steps``.
+    """
+    window = scenario.truncate(window_s)
+    start = time.perf_counter()
+    new_model = make_new_model(window)
+    install_milestones(new_model, window, bin.bin_configuration)
+    install_phase_policy(new_model, window, bin.bin_configuration, phase_policy or PhasePolicy())
+    new_model.run_bin(bin, exports=False)
+    return time.perf_counter() - start
+
+
+def new_model_factory(reactor, scenario, bins_meshes, coolant_temp=DEFAULT_COOLANT_TEMP):
+    """Returns a callable building a HISP NewModel for a (truncated) scenario.
+
+    HISP is only imported here so that model-based estimates run without it.
+    """
+    hisp_src = os.path.join(parent_dir, "hisp", "src")
+    if hisp_src not in sys.path:
+        sys.path.insert(0, hisp_src)
+    from hisp.new_model import NewModel
+
+    plasma_data_handling = load_plasma_data_handling(scenario)
+
+    def make_new_model(model_scenario):
+        return NewModel(
+            reactor=reactor,
+            scenario=model_scenario,
+            plasma_data_handling=plasma_data_handling,
+            coolant_temp=coolant_temp,
+            bins_meshes=bins_meshes,
+        )
+
+    return make_new_model
+
+
+@dataclass
+class Partition:
+    name: str
+    max_hours: float
+    max_mem_gb: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "Partition":
+        """Parses ``name:max_hours:max_mem_gb``."""
+        name, max_hours, max_mem_gb = spec.split(":")
+        return cls(name, float(max_hours), float(max_mem_gb))
+
+
+def format_slurm_time(seconds: float) -> str:
+    """Formats seconds as a SLURM ``HH:MM:SS`` time request."""
+    seconds = int(np.ceil(seconds))
+    return f"{seconds // 3600}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def choose_partition(time_s: float, mem_mb: float, partitions: List[Partition]) -> Optional[Partition]:
+    """Returns the first partition (in the given order) accepting the request."""
+    for partition in partitions:
+        if time_s <= partition.max_hours * 3600 and mem_mb <= partition.max_mem_gb * 1024:
+            return partition
+    return None
+
+
+def plan_batches(estimates: List[dict], max_batch_s: float) -> List[dict]:
+    """Groups bins into sequential batches of at most ``max_batch_s`` seconds.
+
+    Bins are placed first-fit in decreasing order of estimated time, only with
+    bins of the same partition. A bin longer than ``max_batch_s`` gets its own batch.
+    The ``batch`` field of every estimate is set in place.
+    """
+    batches: List[dict] = []
+    for estimate in sorted(estimates, key=lambda e: -e["est_time_s"]):
+        for batch in batches:
+            if (
+                batch["partition"] == estimate["partition"]
+                and batch["time_s"] + estimate["est_time_s"] <= max_batch_s
+            ):
+                break
+        else:
+            batch = {"id": len(batches), "partition": estimate["partition"], "time_s": 0.0}
+            batches.append(batch)
+        batch["time_s"] += estimate["est_time_s"]
+        estimate["batch"] = batch["id"]
+    return estimates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate per-bin SLURM time and memory requests")
+    parser.add_argument("input_folder", help="Input folder (input_table.csv, materials.csv, mesh.py, scenario)")
+    parser.add_argument("--scenario", default=None, help="Scenario name (default: the .py file of the input folder)")
+    parser.add_argument("--bins", default=None, help='Bin specification, e.g. "1-5, 10" (default: all bins)')
+    parser.add_argument("--pre-run", dest="pre_run", type=float, default=None,
+                        help="Simulated window (s) of a short pre-run used to calibrate each bin")
+    parser.add_argument("--calibration", default=None,
+                        help="CSV of measured runs (bin_id, elapsed_s, max_rss_mb) to fit the cost model")
+    parser.add_argument("--model", default=None, help="JSON cost model to start from")
+    parser.add_argument("--save-model", dest="save_model", default=None, help="Write the (calibrated) model to JSON")
+    parser.add_argument("--safety", type=float, default=1.5, help="Safety factor on time and memory (default: 1.5)")
+    parser.add_argument("--partition", action="append", default=None,
+                        help="Partition as name:max_hours:max_mem_gb, in order of preference (repeatable)")
+    parser.add_argument("--max-batch-hours", dest="max_batch_hours", type=float, default=1.0,
+                        help="Bins shorter than this are batched together up to this duration (default: 1 h)")
+    parser.add_argument("--output", default=None, help="Output CSV (default: <input_folder>/cost_estimates.csv)")
+    # internal: run the --pre-run windows of one bin and write their elapsed times to this JSON file
+    parser.add_argument("--pre-run-child", dest="pre_run_child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    input_dir = args.input_folder
+    if args.scenario is None:
+        from run_bin_from_folder import find_scenario_file
+        scenario_name = os.path.splitext(os.path.basename(find_scenario_file(input_dir)))[0]
+    else:
+        scenario_name = args.scenario
+    scenario = load_scenario_variable(input_dir, scenario_name)
+    if scenario is None:
+        print(f"Error: could not load scenario '{scenario_name}' from {input_dir}")
+        sys.exit(1)
+
+    loader = CSVBinLoader(
+        os.path.join(input_dir, "input_table.csv"),
+        materials_csv_path=os.path.join(input_dir, "materials.csv"),
+    )
+    reactor = loader.load_reactor()
+    bin_ids = parse_bin_spec(args.bins) if args.bins else [b.bin_id for b in reactor.bins]
+    bins_meshes = load_bins_meshes(input_dir, reactor, bin_ids)
+    bins = [b for b in reactor.bins if b.bin_id in set(bin_ids)]
+
+    phase_policy = PhasePolicy.from_input_dir(input_dir)
+    if args.pre_run_child:
+        make_new_model = new_model_factory(reactor, scenario, bins_meshes, coolant_temp=bins[0].coolant_temp)
+        elapsed = [
+            run_pre_run_window(bins[0], scenario, make_new_model, window, phase_policy)
+            for window in pre_run_windows(args.pre_run)
+        ]
+        with open(args.pre_run_child, "w") as f:
+            json.dump({"elapsed_s": elapsed}, f)
+        return
+
+    model = CostModel.from_json(args.model) if args.model else CostModel()
+    features = {b.bin_id: bin_features(b, scenario, bins_meshes, phase_policy) for b in bins}
+    if args.calibration:
+        model = calibrate(model, features, args.calibration)
+
+    pre_runs = {}
+    if args.pre_run:
+        for b in bins:
+            print(f"Pre-running bin {b.bin_id} over {args.pre_run:.0f} s...")
+            pre_runs[b.bin_id] = pre_run(b, scenario, input_dir, scenario_name, args.pre_run, phase_policy)
+
+    partitions = [Partition.parse(p) for p in (args.partition or ["sirius:300:64"])]
+    estimates = []
+    for b in bins:
+        f = features[b.bin_id]
+        node_species = f["nodes"] * f["species"]
+        if b.bin_id in pre_runs:
+            measured = pre_runs[b.bin_id]
+            # extrapolate the measured windows to the full scenario
+            time_s = measured["startup_s"] + measured["setup_s"] + measured["per_step_s"] * f["steps"]
+            mem_mb = max(measured["max_rss_mb"], model.mem_mb(node_species))
+        else:
+            time_s = model.time_s(cost_units(f))
+            mem_mb = model.mem_mb(node_species)
+        time_s *= args.safety
+        mem_mb *= args.safety
+        partition = choose_partition(time_s, mem_mb, partitions)
+        if partition is None:
+            print(f"Warning: bin {b.bin_id} exceeds every partition, using {partitions[-1].name}")
+            partition = partitions[-1]
+        estimates.append({
+            "bin_id": b.bin_id,
+            "est_time_s": round(time_s, 1),
+            "est_mem_mb": round(mem_mb, 1),
+            "partition": partition.name,
+        })
+
+    plan_batches(estimates, args.max_batch_hours * 3600)
+    # batch requests: sum of times and max of memories of the bins of each batch
+    batch_time = {}
+    batch_mem = {}
+    for e in estimates:
+        batch_time[e["batch"]] = batch_time.get(e["batch"], 0.0) + e["est_time_s"]
+        batch_mem[e["batch"]] = max(batch_mem.get(e["batch"], 0.0), e["est_mem_mb"])
+    for e in estimates:
+        e["time_request"] = format_slurm_time(batch_time[e["batch"]])
+        e["mem_request_mb"] = int(np.ceil(batch_mem[e["batch"]]))
+
+    output = args.output or os.path.join(input_dir, "cost_estimates.csv")
+    fieldnames = ["bin_id", "est_time_s", "est_mem_mb", "time_request", "mem_request_mb", "partition", "batch"]
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for e in sorted(estimates, key=lambda e: e["bin_id"]):
+            writer.writerow(e)
+    if args.save_model:
+        model.to_json(args.save_model)
+
+    print(f"✓ Estimated {len(estimates)} bins in {len(batch_time)} batches -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Cycle acceleration of long repetitive scenario rows for single-bin runs.
+
+Scenario rows repeating the same pulse many times (e.g. ``10FPdays``,
+``20pulses`` after ``Scenario.compress``) change the bin state slowly from one
+cycle to the next. For such rows the bin is run one cycle at a time; once the
+per-cycle state increment is smooth, the state is projected several cycles
+ahead (projective integration):
+
+    S(k + M) = S(k) + M * (S(k) - S(k - 1))
+
+The jump M is the largest one whose second-order error estimate,
+M² / 2 * |second difference of S|, stays below ``tol`` times |S(k)| (at most
+``max_jump`` cycles). ``tol`` bounds each projection: the errors of
+successive jumps add up, so a row with many jumps deviates by a few times
+``tol`` from a full run. Every jump is followed by a full-resolution cycle that
+checks the projection: when its increment differs from the predicted one by
+more than ``check_tol`` times the increment, the jump is rejected, the run
+resumes from the state before the jump and the maximum jump of the row is
+halved. Rows with fewer than ``min_cycles`` pulses are run in full.
+
+Skipped cycles have no time-resolved series: every quantity gets one sample
+per skipped cycle end, extrapolated from the last two simulated cycle ends
+(the cycle-end envelope). The extrapolated time intervals are reported with
+the result.
+
+Restarting needs a HISP version whose ``NewModel.run_bin`` accepts an
+``initial_state`` (see ``scenario_checkpoints.supports_initial_state``);
+``run_new_csv_bin.py`` refuses ``--cycle-acceleration`` at argument parsing
+without it.
+The NewModel of the one-cycle stage of a row is built once and reused for
+every simulated cycle of that row, as one model runs many bins in ``main.py``.
+"""
+
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from scenario_checkpoints import ChainedSeries, extract_state, quantities_segment, supports_initial_state
+
+
+@dataclass(frozen=True)
+class CycleAcceleration:
+    """Settings of the cycle acceleration (see module docstring)."""
+
+    tol: float = 1e-3
+    check_tol: float = 0.1
+    max_jump: int = 50
+    min_cycles: int = 10
+
+    def record(self) -> dict:
+        """Serialisable form for result files and input hashes."""
+        return asdict(self)
+
+
+def _flatten(state: Dict[str, np.ndarray]) -> np.ndarray:
+    return np.concatenate([np.ravel(state[name]) for name in sorted(state)]) if state else np.zeros(0)
+
+
+def _unflatten(vector: np.ndarray, like: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    state, start = {}, 0
+    for name in sorted(like):
+        size = np.size(like[name])
+        state[name] = vector[start:start + size].reshape(np.shape(like[name]))
+        start += size
+    return state
+
+
+def _append(history: Dict[str, Tuple[np.ndarray, np.ndarray]], segment: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+    """Appends a segment to the history, dropping points not after the current end (as CheckpointStore.history)."""
+    for name, (t, data) in segment.items():
+        if name in history:
+            t_prev, data_prev = history[name]
+            keep = t > t_prev[-1] if len(t_prev) else slice(None)
+            history[name] = (np.concatenate([t_prev, t[keep]]), np.concatenate([data_prev, data[keep]]))
+        else:
+            history[name] = (np.asarray(t, dtype=float), np.asarray(data, dtype=float))
+
+
+def jump_size(states: List[np.ndarray], tol: float, max_jump: int, remaining: int) -> int:
+    """Number of cycles to project from the last three cycle-end states (0: keep simulating)."""
+    if len(states) < 3 or remaining < 2:
+        return 0
+    increment = states[-1] - states[-2]
+    second_difference = increment - (states[-2] - states[-3])
+    scale = np.linalg.norm(states[-1])
+    curvature = np.linalg.norm(second_difference)
+    if scale == 0:
+        return 0
+    if curvature == 0:
+        jump = remaining
+    else:
+        jump = int(np.sqrt(2 * tol * scale / curvature))
+    jump = min(jump, max_jump, remaining)
+    return jump if jump >= 2 else 0
+
+
+def run_accelerated(make_new_model, target_bin, scenario, initial_state=None,
+                    settings: CycleAcceleration = CycleAcceleration()) -> Tuple[object, dict, List[dict]]:
+    """Runs a bin's scenario with cycle acceleration of its repetitive rows.
+
+    Args:
+        make_new_model: callable taking a (sub-)scenario and returning a NewModel
+        target_bin: Bin object to simulate
+        scenario: full Scenario object (compressed, so repeated pulses are one row)
+        initial_state: species state at t=0 (None: HISP initial conditions)
+        settings: CycleAcceleration settings
+
+    Raises:
+        TypeError: if the models' ``run_bin`` does not accept an ``initial_state``
+
+    Returns:
+        (model of the last run, quantities, extrapolated intervals) where
+        quantities maps each scalar quantity to a ``ChainedSeries`` over the
+        full scenario (plus the profile exports of the last run) and the
+        intervals are ``{"t_start", "t_end", "cycles", "row"}`` dictionaries
+    """
+    history: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    extrapolated: List[dict] = []
+    state = initial_state
+    model, quantities = None, {}
+
+    def run(new_model, t_offset):
+        nonlocal model, quantities, state
+        if not supports_initial_state(new_model):
+            raise TypeError("Cycle acceleration needs a HISP NewModel.run_bin accepting an initial_state")
+        model, quantities = new_model.run_bin(target_bin, exports=False, initial_state=state)
+        state = extract_state(model)
+        segment = quantities_segment(quantities, t_offset)
+        _append(history, segment)
+        return segment
+
+    row = 0
+    n_rows = len(scenario.pulses)
+    while row < n_rows:
+        pulse = scenario.pulses[row]
+        t_row = scenario.get_time_till_row(row)
+        if pulse.nb_pulses < settings.min_cycles or pulse.total_duration <= 0:
+            # run every following non-repetitive row in one stage
+            end_row = row + 1
+            while end_row < n_rows and (scenario.pulses[end_row].nb_pulses < settings.min_cycles
+                                        or scenario.pulses[end_row].total_duration <= 0):
+                end_row += 1
+            run(make_new_model(scenario.sub_scenario(row, end_row)), t_row)
+            row = end_row
+            continue
+
+        period = pulse.total_duration
+        cycle_model = make_new_model(scenario.sub_scenario(row, row + 1).truncate(period))
+        states = [_flatten(state)] if state else []
+        cycle_ends: List[Dict[str, float]] = []
+        max_jump = settings.max_jump
+        done = 0
+        print(f"  Cycle acceleration of row {row}: {pulse.nb_pulses} x {pulse.pulse_type} ({period:.0f} s)")
+        while done < pulse.nb_pulses:
+            segment = run(cycle_model, t_row + done * period)
+            done += 1
+            states.append(_flatten(state))
+            cycle_ends.append({name: float(data[-1]) for name, (_, data) in segment.items() if len(data)})
+
+            # one cycle is kept after the jump to check it
+            jump = jump_size(states, settings.tol, max_jump, pulse.nb_pulses - done - 1)
+            if jump == 0:
+                continue
+            before_jump = dict(state)
+            increment = states[-1] - states[-2]
+            predicted_next = increment + (jump + 1) * (increment - (states[-2] - states[-3]))
+            projected = np.maximum(states[-1] + jump * increment, 0.0)
+            state = _unflatten(projected, before_jump)
+
+            # full-resolution check of the projection
+            t_jump = t_row + (done + jump) * period
+            saved_history = {name: (t.copy(), data.copy()) for name, (t, data) in history.items()}
+            check_segment = run(cycle_model, t_jump)
+            checked = _flatten(state)
+            error = np.linalg.norm(checked - projected - predicted_next)
+            if error > settings.check_tol * max(np.linalg.norm(increment), 1e-300):
+                print(f"    Rejected jump of {jump} cycles at cycle {done} (error {error:.3e}), halving")
+                history = saved_history
+                state = before_jump
+                max_jump = max(jump // 2, 1)
+                continue
+
+            # cycle-end envelope of the skipped cycles (the last one is the start of the check cycle)
+            t_end = t_row + done * period
+            skipped = np.arange(1, jump)
+            for name, value in cycle_ends[-1].items():
+                slope = value - cycle_ends[-2].get(name, value) if len(cycle_ends) > 1 else 0.0
+                t_skipped = t_end + period * skipped
+                t_prev, data_prev = history[name]
+                keep = t_prev <= t_end
+                after = ~keep
+                history[name] = (
+                    np.concatenate([t_prev[keep], t_skipped, t_prev[after]]),
+                    np.concatenate([data_prev[keep], value + slope * skipped, data_prev[after]]),
+                )
+            extrapolated.append({"row": row, "t_start": t_end, "t_end": t_jump, "cycles": jump})
+            print(f"    Projected {jump} cycles: t = {t_end:.0f} s -> {t_jump:.0f} s")
+            done += jump + 1
+            states = [projected, checked]
+            # the check cycle end gives the slope of the next envelope
+            cycle_ends = [{name: float(data[-1]) for name, (_, data) in check_segment.items() if len(data)}]
+        row += 1
+
+    result = {name: ChainedSeries(t, data) for name, (t, data) in history.items()}
+    result.update({k: v for k, v in quantities.items() if k.endswith("_profile")})
+    return model, result, extrapolated
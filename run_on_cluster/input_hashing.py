@@ -0,0 +1,178 @@
+"""
+Content hashes of the inputs of a single-bin simulation.
+
+The hashes are computed from a canonical JSON serialisation of the inputs so
+that they are stable across processes and machines. They are used to key
+cached bin states (scenario checkpoints) and to detect unchanged results.
+"""
+
+import hashlib
+import json
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+
+def _canonical(value: Any) -> Any:
+    """Converts numpy scalars/arrays and tuples into JSON-serialisable values."""
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return _canonical(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value != value:
+        return "nan"
+    return value
+
+
+def hash_record(record: Dict[str, Any]) -> str:
+    """Returns the sha256 hex digest of a record of inputs.
+
+    Args:
+        record: nested dictionary of JSON-serialisable values (numpy allowed)
+
+    Returns:
+        the hex digest
+    """
+    payload = json.dumps(_canonical(record), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def bin_record(bin) -> Dict[str, Any]:
+    """Returns the simulation-relevant fields of a CSV bin.
+
+    Args:
+        bin: Bin object from bins_from_csv
+
+    Returns:
+        dictionary with geometry, material, operating and solver settings
+    """
+    return {
+        "bin_number": bin.bin_number,
+        "coordinates": [bin.z_start, bin.r_start, bin.z_end, bin.r_end],
+        "material": bin.material.to_dict(),
+        "thickness": bin.thickness,
+        "cu_thickness": bin.cu_thickness,
+        "mode": bin.mode,
+        "location": bin.location,
+        "parent_bin_surf_area": bin.parent_bin_surf_area,
+        "surface_area": bin.surface_area,
+        "f_ion_flux_fraction": bin.f_ion_flux_fraction,
+        "coolant_temp": bin.coolant_temp,
+        "calculate_implantation_params": bin.calculate_implantation_params,
+        # the output policy is hashed by result_input_hash once resolved with the input folder settings
+        "bin_configuration": {
+            key: value for key, value in asdict(bin.bin_configuration).items() if key != "output_policy"
+        },
+    }
+
+
+def mesh_record(mesh) -> Optional[str]:
+    """Returns the sha256 digest of a mesh vertex array (None if no custom mesh).
+
+    Args:
+        mesh: MeshBin object, numpy array of vertices or None
+    """
+    if mesh is None:
+        return None
+    vertices = getattr(mesh, "mesh", mesh)
+    vertices = np.ascontiguousarray(np.asarray(vertices, dtype=float))
+    return hashlib.sha256(vertices.tobytes()).hexdigest()
+
+
+def scenario_record(pulses: Iterable) -> list:
+    """Returns the serialised list of pulses (one dictionary per scenario row)."""
+    return [pulse.to_dict() for pulse in pulses]
+
+
+def plasma_data_record(plasma_data_handling, bin, pulse_types: Iterable[str]) -> Dict[str, Any]:
+    """Returns the plasma data rows read for a bin, per pulse type of the scenario.
+
+    Args:
+        plasma_data_handling: PlasmaDataHandling object
+        bin: Bin object (rows are selected with ``bin.bin_number``)
+        pulse_types: pulse types present in the scenario
+
+    Returns:
+        dictionary mapping pulse type to the bin's data row (None if absent),
+        a list of at most one wall row for transient pulse types, plus the
+        hash of the time slices of strike point bins (``<pulse type>_slices``)
+    """
+    record = {}
+    for pulse_type in sorted(set(pulse_types)):
+        if pulse_type == "BAKE":
+            continue
+        if plasma_data_handling.is_transient(pulse_type):
+            # transient pulses (RISP, ROSP) read the bin's row of the wall table...
+            row = plasma_data_handling.wall_row(bin.bin_number)
+            record[pulse_type] = [] if row is None else [row]
+            # ...and, for strike point bins, its values in every time slice
+            transient = plasma_data_handling.transient_data(pulse_type) if plasma_data_handling.strike_point else None
+            if transient is not None and bin.is_divertor and bin.bin_number in transient:
+                values = np.ascontiguousarray(transient.bin_values(bin.bin_number))
+                record[f"{pulse_type}_slices"] = {
+                    "times": transient.times.tolist(),
+                    "values": hashlib.sha256(values.tobytes()).hexdigest(),
+                    "interpolate": transient.interpolate,
+                }
+            continue
+        data = plasma_data_handling.pulse_type_to_data.get(pulse_type)
+        if data is None or bin.bin_number not in data.index:
+            record[pulse_type] = None
+        else:
+            record[pulse_type] = data.loc[bin.bin_number].to_dict()
+    return record
+
+
+def input_record(
+    bin, mesh, pulses: Iterable, plasma_data_handling, coolant_temp: float, output_policy: Optional[dict] = None,
+    cycle_acceleration: Optional[dict] = None, phase_policy: Optional[dict] = None,
+) -> Dict[str, Any]:
+    """Returns the record of the inputs of a bin run over a list of scenario rows.
+
+    See ``result_input_hash`` for the fields. Scenario checkpoints hash the
+    record of a prefix of the rows (``scenario_checkpoints.prefix_key``).
+    """
+    pulses = list(pulses)
+    record = {
+        "bin": bin_record(bin),
+        "mesh": mesh_record(mesh),
+        "pulses": scenario_record(pulses),
+        "plasma_data": plasma_data_record(
+            plasma_data_handling, bin, [pulse.pulse_type for pulse in pulses]
+        ),
+        "coolant_temp": coolant_temp,
+    }
+    if output_policy is not None:
+        record["output_policy"] = output_policy
+    if cycle_acceleration is not None:
+        record["cycle_acceleration"] = cycle_acceleration
+    if phase_policy is not None:
+        record["phase_policy"] = phase_policy
+    return record
+
+
+def result_input_hash(
+    bin, mesh, scenario, plasma_data_handling, coolant_temp: float, output_policy: Optional[dict] = None,
+    cycle_acceleration: Optional[dict] = None, phase_policy: Optional[dict] = None,
+) -> str:
+    """Returns the hash of every input that determines the result of a bin run.
+
+    Covers the bin row (geometry, material, solver settings), the mesh, the
+    serialised scenario, the plasma data rows of the bin, the coolant
+    temperature, the output policy (``OutputPolicies.record()``, left out
+    when every sample is kept), the cycle acceleration settings
+    (``CycleAcceleration.record()``, left out for exact runs) and the phase
+    stepsize policy (``PhasePolicy.record()``, left out for the default
+    stepping). Two runs with the same hash produce the same result.
+    """
+    return hash_record(
+        input_record(
+            bin, mesh, scenario.pulses, plasma_data_handling, coolant_temp, output_policy=output_policy,
+            cycle_acceleration=cycle_acceleration, phase_policy=phase_policy,
+        )
+    )
@@ -0,0 +1,197 @@
+"""
+Output sampling policies of the per-bin result series.
+
+Every solver step is exported by HISP. Before serialisation the runner keeps
+only the samples selected by a policy:
+
+- ``all``                keep every step (default)
+- ``interval:<s>``       the first sample of every ``<s>`` seconds
+- ``max_points:<n>``     about ``<n>`` samples evenly spread in time
+- ``adaptive:<rel>``     error-bounded decimation: dropped samples are within
+                         ``<rel>`` times the range of the series of the linear
+                         interpolation between kept ones, and the minimum and
+                         maximum of the series are kept
+
+Decimating policies also keep the first and last samples, both samples of
+repeated times (stage boundaries) and the samples around the scenario
+milestones (pulse edges).
+
+The policy of a bin is the ``Output policy`` column of the input table,
+falling back to the ``default`` of ``<input_dir>/output_policy.json``.
+That file can also set policies per quantity (fnmatch patterns, first match
+wins):
+
+    {"default": "max_points:20000",
+     "quantities": {"*flux*": "interval:60", "T_trap*": "adaptive:1e-4"}}
+
+All quantities of a result share one time array, so each quantity keeps the
+union of the samples selected for every quantity.
+"""
+
+import fnmatch
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+POLICY_FILE = "output_policy.json"
+POLICY_KINDS = ("all", "interval", "max_points", "adaptive")
+
+
+@dataclass(frozen=True)
+class OutputPolicy:
+    """One sampling policy (see module docstring)."""
+
+    kind: str = "all"
+    value: Optional[float] = None
+
+    @classmethod
+    def parse(cls, spec: Optional[str]) -> "OutputPolicy":
+        """Parses ``all``, ``interval:<s>``, ``max_points:<n>`` or ``adaptive:<rel>``."""
+        if spec is None or str(spec).strip() == "":
+            return cls()
+        kind, _, value = str(spec).strip().partition(":")
+        kind = kind.strip().lower()
+        if kind not in POLICY_KINDS:
+            raise ValueError(f"Unknown output policy '{spec}', expected one of {POLICY_KINDS}")
+        if kind == "all":
+            return cls()
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"Output policy '{spec}' needs a numeric value, e.g. '{kind}:100'")
+        if value <= 0 or (kind == "max_points" and value < 2):
+            raise ValueError(f"Output policy '{spec}' needs a positive value (max_points at least 2)")
+        return cls(kind, value)
+
+    def __str__(self) -> str:
+        return self.kind if self.kind == "all" else f"{self.kind}:{self.value:g}"
+
+    def indices(self, t: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Indices of the samples of one series selected by the policy (sorted)."""
+        n = len(t)
+        if self.kind == "all" or n <= 2:
+            return np.arange(n)
+        if self.kind == "interval":
+            return _interval_indices(t, self.value)
+        if self.kind == "max_points":
+            if n <= self.value:
+                return np.arange(n)
+            return _interval_indices(t, (t[-1] - t[0]) / (self.value - 1))
+        tolerance = self.value * (np.max(values) - np.min(values))
+        kept = _adaptive_indices(t, values, tolerance)
+        return np.union1d(kept, [np.argmin(values), np.argmax(values)])
+
+
+def _interval_indices(t: np.ndarray, interval: float) -> np.ndarray:
+    """First sample of every ``interval`` seconds, plus the last sample."""
+    if interval <= 0:
+        return np.arange(len(t))
+    bucket = np.floor((t - t[0]) / interval)
+    first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    return np.union1d(first, [len(t) - 1])
+
+
+def _adaptive_indices(t: np.ndarray, values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Ramer-Douglas-Peucker selection: every dropped sample is within ``tolerance``
+    of the straight line between the kept samples around it."""
+    keep = np.zeros(len(t), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(t) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner_t = t[start + 1:end]
+        span = t[end] - t[start]
+        if span > 0:
+            line = values[start] + (values[end] - values[start]) * (inner_t - t[start]) / span
+        else:
+            line = np.full(len(inner_t), values[start])
+        deviation = np.abs(values[start + 1:end] - line)
+        worst = int(np.argmax(deviation))
+        if deviation[worst] > tolerance:
+            split = start + 1 + worst
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+class OutputPolicies:
+    """Default and per-quantity policies of one bin.
+
+    Args:
+        default: policy of quantities not matched by ``quantities``
+        quantities: fnmatch pattern -> policy
+    """
+
+    def __init__(self, default: OutputPolicy = OutputPolicy(), quantities: Optional[Dict[str, OutputPolicy]] = None):
+        self.default = default
+        self.quantities = quantities or {}
+
+    @classmethod
+    def for_bin(cls, bin, input_dir: Optional[str] = None) -> "OutputPolicies":
+        """Policies of a bin: its ``Output policy`` column, then ``<input_dir>/output_policy.json``."""
+        settings = {}
+        if input_dir:
+            settings_path = os.path.join(input_dir, POLICY_FILE)
+            if os.path.exists(settings_path):
+                with open(settings_path, "r") as f:
+                    settings = json.load(f)
+        column = getattr(bin.bin_configuration, "output_policy", None)
+        default = OutputPolicy.parse(column if column else settings.get("default"))
+        quantities = {
+            pattern: OutputPolicy.parse(spec) for pattern, spec in settings.get("quantities", {}).items()
+        }
+        return cls(default, quantities)
+
+    @property
+    def keeps_all(self) -> bool:
+        return self.default.kind == "all" and all(p.kind == "all" for p in self.quantities.values())
+
+    def policy(self, quantity: str) -> OutputPolicy:
+        for pattern, policy in self.quantities.items():
+            if fnmatch.fnmatchcase(quantity, pattern):
+                return policy
+        return self.default
+
+    def indices(self, t, series: Dict[str, np.ndarray], keep_times: Optional[Iterable[float]] = None) -> np.ndarray:
+        """Union of the samples selected for every series, with the edges and boundaries kept.
+
+        Args:
+            t: exported times (sorted, possibly repeated at stage boundaries)
+            series: quantity name -> values on ``t``
+            keep_times: times whose neighbouring samples are always kept (e.g. scenario milestones)
+
+        Returns:
+            sorted indices into ``t``
+        """
+        t = np.asarray(t, dtype=float)
+        n = len(t)
+        if self.keeps_all or n <= 2:
+            return np.arange(n)
+        selected = [np.array([0, n - 1])]
+        for name, values in series.items():
+            selected.append(self.policy(name).indices(t, np.asarray(values, dtype=float)))
+            if len(selected[-1]) == n:
+                return np.arange(n)
+        # both samples of repeated times (stage boundaries)
+        repeated = np.flatnonzero(t[1:] == t[:-1])
+        selected.extend([repeated, repeated + 1])
+        if keep_times is not None:
+            keep_times = np.fromiter(keep_times, dtype=float)
+            after = np.clip(np.searchsorted(t, keep_times, side="left"), 0, n - 1)
+            selected.extend([after, np.clip(after - 1, 0, n - 1)])
+        return np.unique(np.concatenate(selected))
+
+    def record(self) -> Optional[dict]:
+        """Serialisable form for result files and input hashes; None when every sample is kept."""
+        if self.keeps_all:
+            return None
+        return {
+            "default": str(self.default),
+            "quantities": {pattern: str(policy) for pattern, policy in self.quantities.items()},
+        }
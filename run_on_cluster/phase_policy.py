@@ -0,0 +1,126 @@
+"""
+Maximum solver stepsize per scenario phase.
+
+By default HISP steps at most ``fp_max_stepsize`` during the plasma-on part of
+FP pulses and ``max_stepsize_no_fp`` everywhere else. Source-free intervals
+(no particle flux, only thermal desorption and diffusion) can be stepped much
+more coarsely. They are detected from the scenario pulse list:
+
+- the waiting part of every pulse (after the ramp-down)
+- the whole of ``BAKE`` pulses (``get_particle_flux`` returns 0)
+- the whole of pulses with ``flux_scaling == 0``
+
+``<input_dir>/phase_policy.json`` sets the maximum stepsize (s) of each kind of
+phase, the most specific key winning:
+
+    {"source_free": 2000, "waiting": 5000, "pulse_types": {"BAKE": 10000, "GDC": 50}}
+
+- ``pulse_types``: plasma-on part of pulses of a type
+- ``waiting``: waiting part of every pulse
+- ``source_free``: any source-free interval not matched above
+
+Phases without a key keep the bin's ``fp_max_stepsize``/``max_stepsize_no_fp``.
+The milestones (``Scenario.iter_milestones``) still force a step at every
+phase edge, so a large stepsize never steps over the start of a pulse.
+"""
+
+import json
+import os
+from bisect import bisect_right
+from typing import Dict, Optional, Tuple
+
+POLICY_FILE = "phase_policy.json"
+
+# Pulse types whose particle flux is zero (PlasmaDataHandling.get_particle_flux)
+FLUX_FREE_PULSE_TYPES = ("BAKE",)
+
+
+def is_source_free(pulse) -> bool:
+    """True if the plasma-on part of a pulse has no particle flux."""
+    return pulse.pulse_type in FLUX_FREE_PULSE_TYPES or pulse.flux_scaling == 0
+
+
+class PhasePolicy:
+    """Maximum stepsizes of the phases of a scenario (see module docstring).
+
+    Args:
+        source_free: maximum stepsize of source-free intervals (s)
+        waiting: maximum stepsize of waiting periods (s)
+        pulse_types: pulse type -> maximum stepsize of its plasma-on part (s)
+    """
+
+    def __init__(self, source_free: Optional[float] = None, waiting: Optional[float] = None,
+                 pulse_types: Optional[Dict[str, float]] = None):
+        self.source_free = source_free
+        self.waiting = waiting
+        self.pulse_types = pulse_types or {}
+        for name, value in [("source_free", source_free), ("waiting", waiting), *self.pulse_types.items()]:
+            if value is not None and value <= 0:
+                raise ValueError(f"Phase policy stepsize of '{name}' must be positive, got {value}")
+
+    @classmethod
+    def from_input_dir(cls, input_dir: Optional[str] = None) -> "PhasePolicy":
+        """Policy of ``<input_dir>/phase_policy.json`` (empty without the file)."""
+        settings = {}
+        if input_dir:
+            settings_path = os.path.join(input_dir, POLICY_FILE)
+            if os.path.exists(settings_path):
+                with open(settings_path, "r") as f:
+                    settings = json.load(f)
+        return cls(
+            source_free=settings.get("source_free"),
+            waiting=settings.get("waiting"),
+            pulse_types={pulse_type: float(value) for pulse_type, value in settings.get("pulse_types", {}).items()},
+        )
+
+    @property
+    def is_default(self) -> bool:
+        return self.source_free is None and self.waiting is None and not self.pulse_types
+
+    def pulse_stepsizes(self, pulse, bin_config) -> Tuple[float, float]:
+        """Maximum stepsizes (s) of the plasma-on and waiting parts of a pulse."""
+        if pulse.pulse_type in self.pulse_types:
+            on = self.pulse_types[pulse.pulse_type]
+        elif is_source_free(pulse) and self.source_free is not None:
+            on = self.source_free
+        elif pulse.pulse_type == "FP":
+            on = bin_config.fp_max_stepsize
+        else:
+            on = bin_config.max_stepsize_no_fp
+        if self.waiting is not None:
+            off = self.waiting
+        elif self.source_free is not None:
+            off = self.source_free
+        else:
+            off = bin_config.max_stepsize_no_fp
+        return on, off
+
+    def stepsize_function(self, scenario, bin_config):
+        """Returns ``max_stepsize(t)`` over a scenario (bisection on the rows, no per-pulse table)."""
+        starts = [scenario.get_time_till_row(row) for row in range(len(scenario.pulses))]
+        rows = [(pulse, *self.pulse_stepsizes(pulse, bin_config)) for pulse in scenario.pulses]
+
+        def max_stepsize(t: float) -> float:
+            row = min(max(bisect_right(starts, t) - 1, 0), len(rows) - 1)
+            pulse, on, off = rows[row]
+            t_rel = (t - starts[row]) % pulse.total_duration if pulse.total_duration > 0 else 0.0
+            return on if t_rel < pulse.duration_no_waiting else off
+
+        return max_stepsize
+
+    def source_free_fraction(self, scenario) -> float:
+        """Fraction of the scenario duration without particle flux."""
+        total = scenario.get_maximum_time()
+        if total <= 0:
+            return 0.0
+        free = sum(
+            pulse.nb_pulses * (pulse.total_duration if is_source_free(pulse) else pulse.waiting)
+            for pulse in scenario.pulses
+        )
+        return free / total
+
+    def record(self) -> Optional[dict]:
+        """Serialisable form for result files and input hashes; None for the default stepping."""
+        if self.is_default:
+            return None
+        return {"source_free": self.source_free, "waiting": self.waiting, "pulse_types": dict(self.pulse_types)}
@@ -0,0 +1,467 @@
+#!/usr/bin/env python
+"""
+Dependency-aware campaign pipeline.
+
+Chains the stages of a campaign and only reruns the stages whose inputs changed:
+
+    bin_data (optional) ─┐
+    just_d_make ─────────┴─> simulate_<bin_id> (one per input_table.csv row) ─> aggregate
+
+Every stage is keyed by a content hash of its command, its input files, any
+extra record (e.g. the bin's row of input_table.csv) and the keys of the
+stages it depends on. The key of every successful stage is stored in
+``<input_folder>/.pipeline_state.json``; a stage is up to date when its key is
+unchanged and its outputs exist. Editing one row of input_table.csv therefore
+only reruns that bin and the aggregation, while editing materials.csv, mesh.py
+or the scenario reruns every bin.
+
+Backends:
+    - local: runs the stages in a process pool, as soon as their dependencies succeed
+    - slurm: submits one job per stage with ``--dependency=afterok`` on its
+      dependencies; each job records its own key when it succeeds
+
+Usage:
+    python run_on_cluster/pipeline.py status <input_folder> [--bins "1-5"]
+    python run_on_cluster/pipeline.py run <input_folder> [--bins "1-5"] [--backend local|slurm]
+        [--workers 4] [--with-binning] [--estimates cost_estimates.csv] [--force] [--dry-run]
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from input_hashing import hash_record
+
+STATE_FILE = ".pipeline_state.json"
+
+# The SLURM jobs activate the environment of this submitter, or the shell
+# snippet named by $PIPELINE_ENV_SETUP
+ENV_SETUP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "slurm_new_csv_jobs.sh")
+ENV_SETUP_START = "# Activate virtual environment"
+ENV_SETUP_END = "# Load other modules"
+
+
+def slurm_env_setup() -> str:
+    """Returns the environment setup of the SLURM jobs.
+
+    Reads the file named by ``$PIPELINE_ENV_SETUP`` if set, otherwise the
+    activation block of ``slurm_new_csv_jobs.sh``, so the pipeline jobs run in
+    the same environment as the submitters.
+    """
+    path = os.environ.get("PIPELINE_ENV_SETUP")
+    if path:
+        with open(path, "r") as f:
+            return f.read().strip()
+    with open(ENV_SETUP_SCRIPT, "r") as f:
+        lines = f.read().splitlines()
+    try:
+        start = lines.index(ENV_SETUP_START)
+        end = lines.index(ENV_SETUP_END, start)
+    except ValueError:
+        raise ValueError(
+            f"No '{ENV_SETUP_START}' ... '{ENV_SETUP_END}' block in {ENV_SETUP_SCRIPT}; "
+            "set PIPELINE_ENV_SETUP to a file with the environment setup"
+        )
+    return "\n".join(lines[start + 1:end]).strip()
+
+
+# Inputs of bin_data/bin_data.py (read relative to the repository root)
+BIN_DATA_INPUTS = [
+    "wdn_data/Background_Flux_Data",
+    "imas_data/fp_tg_i.2481.dat",
+    "imas_data/fp_tg_o.2481.dat",
+    "imas_data/ld_tg_i.2481.dat",
+    "imas_data/ld_tg_o.2481.dat",
+    "imas_data/inner_target.shot122481.run1.dat",
+    "imas_data/outer_target.shot122481.run1.dat",
+    "iter_bins/FWpanelcorners.txt",
+    "iter_bins/Divbincorners.txt",
+]
+
+# Plasma data read by every simulation (see run_new_csv_bin.py)
+PLASMA_DATA_INPUTS = [
+    "data/Binned_Flux_Data.dat",
+    "data/ICWC_data.dat",
+    "data/GDC_data.dat",
+    "data/RISP_Wall_data.dat",
+]
+
+
+def plasma_data_inputs() -> List[str]:
+    """Returns PLASMA_DATA_INPUTS plus the slices of the transient folders (``data/<pulse type>_data/time<t>.dat``)."""
+    slices = sorted(glob.glob(os.path.join(parent_dir, "data", "*_data", "time*.dat")))
+    return PLASMA_DATA_INPUTS + [os.path.relpath(path, parent_dir) for path in slices]
+
+
+@dataclass
+class Stage:
+    """A node of the pipeline.
+
+    Args:
+        name: unique stage name
+        command: command run from the repository root
+        inputs: files whose content is part of the stage key (relative to the repository root)
+        outputs: files or glob patterns that must exist after a successful run
+        deps: names of the stages that must succeed first
+        extra: additional JSON-serialisable record hashed into the key
+        slurm: per-stage SLURM options (time, mem, partition)
+    """
+    name: str
+    command: List[str]
+    inputs: List[str] = field(default_factory=list)
+    outputs: List[str] = field(default_factory=list)
+    deps: List[str] = field(default_factory=list)
+    extra: dict = field(default_factory=dict)
+    slurm: dict = field(default_factory=dict)
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Returns the sha256 of a file content (None if the file does not exist)."""
+    full_path = os.path.join(parent_dir, path)
+    if not os.path.exists(full_path):
+        return None
+    sha = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def outputs_exist(stage: Stage) -> bool:
+    return all(glob.glob(os.path.join(parent_dir, pattern)) for pattern in stage.outputs)
+
+
+class Pipeline:
+    """A set of stages with content-hash based up-to-date checks."""
+
+    def __init__(self, state_path: str):
+        self.stages: Dict[str, Stage] = {}
+        self.state_path = state_path
+
+    def add(self, stage: Stage):
+        for dep in stage.deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self.stages[stage.name] = stage
+
+    def order(self) -> List[Stage]:
+        """Returns the stages in dependency order (stages are added after their deps)."""
+        return list(self.stages.values())
+
+    def keys(self) -> Dict[str, str]:
+        """Computes the key of every stage, propagating the keys of its dependencies."""
+        keys = {}
+        for stage in self.order():
+            keys[stage.name] = hash_record(
+                {
+                    "command": stage.command,
+                    "inputs": {path: file_digest(path) for path in stage.inputs},
+                    "extra": stage.extra,
+                    "deps": {dep: keys[dep] for dep in stage.deps},
+                }
+            )
+        return keys
+
+    def load_state(self) -> Dict[str, str]:
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def outdated(self, force: bool = False) -> List[str]:
+        """Returns the names of the stages to (re)run, dependents of outdated stages included."""
+        keys = self.keys()
+        state = self.load_state()
+        outdated = []
+        for stage in self.order():
+            if (
+                force
+                or state.get(stage.name) != keys[stage.name]
+                or not outputs_exist(stage)
+                or any(dep in outdated for dep in stage.deps)
+            ):
+                outdated.append(stage.name)
+        return outdated
+
+
+def mark_done(state_path: str, name: str, key: str):
+    """Records the key of a successful stage (safe for concurrent SLURM jobs)."""
+    with open(f"{state_path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r") as f:
+                state = json.load(f)
+        state[name] = key
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, state_path)
+
+
+def _run_command(command: List[str]) -> int:
+    return subprocess.run(command, cwd=parent_dir).returncode
+
+
+class LocalPoolBackend:
+    """Runs the outdated stages in a local process pool."""
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max_workers
+
+    def run(self, pipeline: Pipeline, to_run: List[str], keys: Dict[str, str]) -> bool:
+        pending = [name for name in to_run]
+        done, failed = set(), set()
+        running = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = [dep for dep in pipeline.stages[name].deps if dep in to_run]
+                    if any(dep in failed for dep in deps):
+                        print(f"[SKIP] {name}: a dependency failed")
+                        pending.remove(name)
+                        failed.add(name)
+                    elif all(dep in done for dep in deps):
+                        print(f"[RUN ] {name}: {' '.join(pipeline.stages[name].command)}")
+                        running[pool.submit(_run_command, pipeline.stages[name].command)] = name
+                        pending.remove(name)
+                if not running:
+                    continue
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.result() == 0 and outputs_exist(pipeline.stages[name]):
+                        mark_done(pipeline.state_path, name, keys[name])
+                        done.add(name)
+                        print(f"[DONE] {name}")
+                    else:
+                        failed.add(name)
+                        print(f"[FAIL] {name}")
+        return not failed
+
+
+class SlurmBackend:
+    """Submits the outdated stages as SLURM jobs chained with ``afterok`` dependencies."""
+
+    def __init__(self, log_dir: str = "logs", defaults: Optional[dict] = None):
+        self.log_dir = log_dir
+        self.defaults = {"time": "300:00:00", "mem": "1gb", "partition": "sirius"}
+        self.defaults.update(defaults or {})
+
+    def job_script(self, pipeline: Pipeline, stage: Stage, key: str) -> str:
+        options = dict(self.defaults, **stage.slurm)
+        command = " ".join(stage.command)
+        mark = f"python -s run_on_cluster/pipeline.py mark {pipeline.state_path} {stage.name} {key}"
+        return f"""#!/bin/bash
+#SBATCH --job-name={stage.name}
+#SBATCH --output={self.log_dir}/pipeline_{stage.name}_%j.out
+#SBATCH --error={self.log_dir}/pipeline_{stage.name}_%j.err
+#SBATCH --time={options["time"]}
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task=1
+#SBATCH --mem={options["mem"]}
+#SBATCH --partition={options["partition"]}
+
+{slurm_env_setup()}
+
+cd {parent_dir}
+PYTHONNOUSERSITE=1 {command} && {mark}
+"""
+
+    def run(self, pipeline: Pipeline, to_run: List[str], keys: Dict[str, str]) -> bool:
+        os.makedirs(os.path.join(parent_dir, self.log_dir), exist_ok=True)
+        job_ids = {}
+        for name in to_run:
+            stage = pipeline.stages[name]
+            sbatch = ["sbatch", "--parsable"]
+            dep_ids = [job_ids[dep] for dep in stage.deps if dep in job_ids]
+            if dep_ids:
+                sbatch.append(f"--dependency=afterok:{':'.join(dep_ids)}")
+            result = subprocess.run(
+                sbatch,
+                input=self.job_script(pipeline, stage, keys[name]),
+                capture_output=True,
+                text=True,
+                cwd=parent_dir,
+            )
+            if result.returncode != 0:
+                print(f"[FAIL] sbatch for {name}: {result.stderr.strip()}")
+                return False
+            job_ids[name] = result.stdout.strip().split(";")[0]
+            print(f"[SUBMITTED] {name}: job {job_ids[name]}")
+        return True
+
+
+def parse_bin_spec(spec: str) -> List[int]:
+    """Expands a bin specification like ``"1-5, 10"`` (same format as the submitters)."""
+    bin_ids = set()
+    for token in spec.replace(",", " ").split():
+        if "-" in token:
+            start, end = token.split("-")
+            bin_ids.update(range(int(start), int(end) + 1))
+        else:
+            bin_ids.add(int(token))
+    return sorted(bin_ids)
+
+
+def load_estimates(path: str) -> Dict[int, dict]:
+    """Reads per-bin SLURM requests from a cost_estimator.py output CSV."""
+    estimates = {}
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            estimates[int(row["bin_id"])] = {
+                "time": row["time_request"],
+                "mem": f"{row['mem_request_mb']}M",
+                "partition": row["partition"],
+            }
+    return estimates
+
+
+def build_campaign(
+    input_dir: str,
+    bin_ids: Optional[List[int]] = None,
+    with_binning: bool = False,
+    estimates: Optional[Dict[int, dict]] = None,
+) -> Pipeline:
+    """Builds the pipeline of a campaign input folder.
+
+    Args:
+        input_dir: input folder (input_table.csv, materials.csv, mesh.py, scenario .py)
+        bin_ids: bins to simulate (default: every row of input_table.csv)
+        with_binning: also run bin_data/bin_data.py (needs the SOLPS/wall source files)
+        estimates: optional per-bin SLURM requests (see cost_estimator.py)
+    """
+    from run_bin_from_folder import find_scenario_file
+
+    input_dir = os.path.relpath(os.path.abspath(input_dir), parent_dir)
+    folder_name = os.path.basename(os.path.normpath(input_dir))
+    results_dir = os.path.join(input_dir, f"results_{folder_name}")
+    input_table = os.path.join(input_dir, "input_table.csv")
+    scenario_file = os.path.relpath(find_scenario_file(os.path.join(parent_dir, input_dir)), parent_dir)
+    estimates = estimates or {}
+
+    pipeline = Pipeline(os.path.join(parent_dir, input_dir, STATE_FILE))
+    if with_binning:
+        # writes ~/hisp/flux_data/*.dat; converting them to data/Binned_Flux_Data.dat is manual
+        pipeline.add(Stage(
+            name="bin_data",
+            command=["python", "-m", "bin_data.bin_data"],
+            inputs=BIN_DATA_INPUTS + ["bin_data/bin_data.py", "bin_data/map_sources_to_bins.py"],
+            outputs=[os.path.relpath(os.path.expanduser("~/hisp/flux_data/Binned_Flux_Data.dat"), parent_dir)],
+        ))
+    pipeline.add(Stage(
+        name="just_d_make",
+        command=["python", "bin_data/just_d_make.py"],
+        inputs=["data/Binned_Flux_Data.dat", "bin_data/just_d_make.py"],
+        outputs=["data/Binned_Flux_Data_just_D_pulse.dat"],
+    ))
+
+    # one simulation per row, keyed by the row content rather than the whole table
+    with open(os.path.join(parent_dir, input_table), "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    if bin_ids is None:
+        bin_ids = list(range(1, len(rows) + 1))
+    shared_inputs = [
+        os.path.join(input_dir, "materials.csv"),
+        os.path.join(input_dir, "mesh.py"),
+        scenario_file,
+    ] + plasma_data_inputs()
+    simulations = []
+    for bin_id in bin_ids:
+        if not 1 <= bin_id <= len(rows):
+            raise ValueError(f"Bin ID {bin_id} out of range (1-{len(rows)})")
+        name = f"simulate_{bin_id}"
+        pipeline.add(Stage(
+            name=name,
+            command=["python", "run_on_cluster/run_bin_from_folder.py", input_dir, str(bin_id)],
+            inputs=shared_inputs,
+            outputs=[os.path.join(results_dir, f"id_{bin_id}_bin_num_*.json")],
+            deps=["just_d_make"],
+            extra={"row": rows[bin_id - 1]},
+            slurm=estimates.get(bin_id, {}),
+        ))
+        simulations.append(name)
+
+    plots_dir = os.path.join(input_dir, f"plots_{folder_name}")
+    pipeline.add(Stage(
+        name="aggregate",
+        command=[
+            "python", "plotting/total_inv_bar_plot.py",
+            "--results-dir", results_dir,
+            "--input-table", input_table,
+            "--plots-dir", plots_dir,
+        ],
+        inputs=[input_table, "plotting/total_inv_bar_plot.py"],
+        outputs=[os.path.join(plots_dir, "tritium_inventory_per_bin_*.png")],
+        deps=simulations,
+    ))
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a campaign, recomputing only outdated stages")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    for action in ("run", "status"):
+        sub = subparsers.add_parser(action)
+        sub.add_argument("input_folder", help="Input folder (input_table.csv, materials.csv, mesh.py, scenario)")
+        sub.add_argument("--bins", default=None, help='Bin specification, e.g. "1-5, 10" (default: all bins)')
+        sub.add_argument("--with-binning", dest="with_binning", action="store_true",
+                         help="Include the bin_data.py binning stage")
+        sub.add_argument("--force", action="store_true", help="Consider every stage outdated")
+        if action == "run":
+            sub.add_argument("--backend", choices=["local", "slurm"], default="local")
+            sub.add_argument("--workers", type=int, default=1, help="Local backend: number of parallel stages")
+            sub.add_argument("--estimates", default=None,
+                             help="SLURM backend: per-bin requests from cost_estimator.py")
+            sub.add_argument("--dry-run", dest="dry_run", action="store_true",
+                             help="Only list the stages that would run")
+
+    mark = subparsers.add_parser("mark", help="Record a successful stage (used by the SLURM jobs)")
+    mark.add_argument("state_path")
+    mark.add_argument("stage")
+    mark.add_argument("key")
+
+    args = parser.parse_args()
+
+    if args.action == "mark":
+        mark_done(args.state_path, args.stage, args.key)
+        return
+
+    bin_ids = parse_bin_spec(args.bins) if args.bins else None
+    estimates = load_estimates(args.estimates) if getattr(args, "estimates", None) else None
+    pipeline = build_campaign(args.input_folder, bin_ids, args.with_binning, estimates)
+    to_run = pipeline.outdated(force=args.force)
+
+    if args.action == "status" or args.dry_run:
+        for stage in pipeline.order():
+            print(f"  {'OUTDATED  ' if stage.name in to_run else 'up to date'}  {stage.name}")
+        print(f"{len(to_run)}/{len(pipeline.stages)} stages to run")
+        return
+
+    if not to_run:
+        print("✓ Everything is up to date")
+        return
+    keys = pipeline.keys()
+    if args.backend == "slurm":
+        backend = SlurmBackend()
+    else:
+        backend = LocalPoolBackend(max_workers=args.workers)
+    ok = backend.run(pipeline, to_run, keys)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
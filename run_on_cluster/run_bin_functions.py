@@ -1,6 +1,12 @@
 import os
+import json
 import importlib.util
 
+import numpy as np
+
+# Coolant temperature (K) of bins without a "Coolant Temp. (K)" column in the input table
+DEFAULT_COOLANT_TEMP = 343.0
+
 # def find_sub_bin(bin_index, sub_bin_mode, FW_bins):
 #     """Find the sub_bin based on bin_index and sub_bin_mode."""
 #     for fw_bin in FW_bins.bins:
@@ -45,4 +51,318 @@ def load_scenario_variable(scenario_folder, scenario_name, variable_name="scenar
 
     except Exception as e:
         print(f"❌ Error loading script '{script_path}': {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def load_bins_meshes(input_dir, reactor=None, bin_ids=None):
+    """
+    Loads the bin meshes defined by the mesh.py of an input folder.
+
+    When mesh.py defines build_meshes(reactor, bin_ids) and a reactor is given,
+    the meshes are built from that reactor for the selected bins only, so
+    mesh.py does not load a second reactor. Otherwise its BINS_MESHES
+    dictionary is used (built from INPUT_DIR_CONTEXT).
+
+    Parameters:
+    - input_dir (str): The input folder (e.g., 'input_files' or 'DT1_5')
+    - reactor (Reactor): Reactor already loaded by the caller (optional)
+    - bin_ids (list of int): Bins whose meshes are needed (default: all)
+
+    Returns:
+    - Dictionary mapping bin_id to MeshBin, empty if no mesh configuration is found
+    """
+    mesh_config = None
+    mesh_file = None
+
+    # Try to load mesh from input_dir if available
+    if input_dir and input_dir != "input_files":
+        mesh_file = os.path.join(input_dir, "mesh.py")
+        if os.path.exists(mesh_file):
+            try:
+                # Set environment variable so mesh.py can find the correct input folder
+                os.environ["INPUT_DIR_CONTEXT"] = input_dir
+                # Dynamically import mesh.py from input_dir
+                spec = importlib.util.spec_from_file_location("mesh_config", mesh_file)
+                mesh_config = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(mesh_config)
+            except Exception as e:
+                print(f"Warning: Could not load mesh from {mesh_file}: {e}")
+                mesh_config = None
+
+    # Fall back to default input_files/mesh.py if no mesh in input_dir
+    if mesh_config is None:
+        try:
+            import input_files.mesh as mesh_config
+            mesh_file = mesh_config.__file__
+        except ImportError:
+            print("No mesh configuration found, using default mesh generation")
+            return {}
+
+    try:
+        if reactor is not None and hasattr(mesh_config, "build_meshes"):
+            BINS_MESHES = mesh_config.build_meshes(reactor, bin_ids)
+        else:
+            BINS_MESHES = getattr(mesh_config, "BINS_MESHES", {})
+    except Exception as e:
+        print(f"Warning: Could not build meshes from {mesh_file}: {e}")
+        return {}
+    print(f"Loaded mesh configuration from: {mesh_file}")
+    return BINS_MESHES
+
+
+def load_plasma_data_handling(scenario, data_folder="data", shared_store=None):
+    """
+    Returns the PlasmaDataHandling of a scenario, or the default one built from data_folder.
+
+    With a shared store, the tables are memory-mapped from the store of this
+    data under that directory (built on first use, see
+    plasma_data_handling/shared_store.py), so the workers of a node share them.
+    The store of the default data is found from the path, size and mtime of
+    its files, so workers opening an existing store do not parse them.
+
+    Parameters:
+    - scenario: Scenario object, may carry its own plasma_data_handling attribute
+    - data_folder (str): Folder with the binned flux data files (default: 'data')
+    - shared_store (str): Root directory of shared plasma data stores
+      (default: environment variable PFC_TT_PLASMA_DATA_STORE, unset: disabled)
+
+    Returns:
+    - PlasmaDataHandling object
+    """
+    from plasma_data_handling import PlasmaDataHandling
+
+    shared_store = shared_store or os.environ.get("PFC_TT_PLASMA_DATA_STORE")
+    if hasattr(scenario, "plasma_data_handling"):
+        plasma_data_handling = scenario.plasma_data_handling
+    elif shared_store:
+        from plasma_data_handling.shared_store import ensure_files_store
+
+        store_dir = ensure_files_store(
+            shared_store,
+            _default_data_files(data_folder),
+            lambda: _default_plasma_data_handling(data_folder).backend,
+        )
+        return PlasmaDataHandling.from_shared_store(store_dir)
+    else:
+        plasma_data_handling = _default_plasma_data_handling(data_folder)
+    if shared_store:
+        return PlasmaDataHandling.from_shared_store(
+            plasma_data_handling.to_shared_store(shared_store), **plasma_data_handling.options
+        )
+    return plasma_data_handling
+
+
+# Pulse type tables of the default data folder: file name and read_csv options
+DEFAULT_PULSE_TYPE_FILES = {
+    "FP": ("Binned_Flux_Data.dat", {}),
+    "FP_D": ("Binned_Flux_Data_just_D_pulse.dat", {"comment": "#"}),
+    "ICWC": ("ICWC_data.dat", {}),
+    "GDC": ("GDC_data.dat", {}),
+}
+
+
+def _default_plasma_data_handling(data_folder):
+    import pandas as pd
+    from plasma_data_handling import PlasmaDataHandling
+    from plasma_data_handling.backends import discover_transient_folders
+
+    return PlasmaDataHandling(
+        pulse_type_to_data={
+            pulse_type: pd.read_csv(os.path.join(data_folder, file_name), delimiter=",", **options)
+            for pulse_type, (file_name, options) in DEFAULT_PULSE_TYPE_FILES.items()
+        },
+        path_to_RISP_wall_data=data_folder + "/RISP_Wall_data.dat",
+        transient_folders=discover_transient_folders(data_folder),
+    )
+
+
+def _default_data_files(data_folder):
+    """Files read by _default_plasma_data_handling (tables, transient slices and wall data)."""
+    import glob
+    from plasma_data_handling.backends import discover_transient_folders
+
+    paths = [os.path.join(data_folder, file_name) for file_name, _ in DEFAULT_PULSE_TYPE_FILES.values()]
+    for folder in discover_transient_folders(data_folder).values():
+        paths += sorted(glob.glob(os.path.join(folder, "time*.dat")))
+    wall = os.path.join(data_folder, "RISP_Wall_data.dat")
+    if os.path.exists(wall):
+        paths.append(wall)
+    return paths
+
+
+def result_paths(input_dir, target_bin):
+    """
+    Return the result and profile JSON paths of a bin.
+
+    Results are saved inside the input folder, in results_<folder>/ and
+    profiles_<folder>/.
+
+    Parameters:
+    - input_dir (str): The input folder
+    - target_bin: Bin object
+
+    Returns:
+    - (output_file, profiles_file)
+    """
+    material_name = target_bin.material.name.lower()
+    mode_name = target_bin.mode.lower().replace("_", "")
+    input_folder_name = os.path.basename(os.path.normpath(input_dir)) if input_dir else "results"
+    results_dir = os.path.join(input_dir, f"results_{input_folder_name}")
+    profiles_dir = os.path.join(input_dir, f"profiles_{input_folder_name}")
+    name = f"id_{target_bin.bin_id}_bin_num_{target_bin.bin_number}_{material_name}_{mode_name}"
+    return f"{results_dir}/{name}.json", f"{profiles_dir}/{name}_profiles.json"
+
+
+def existing_input_hash(output_file):
+    """
+    Return the input hash recorded in an existing result file.
+
+    Parameters:
+    - output_file (str): Path of the result JSON
+
+    Returns:
+    - The recorded hash, None if the file is missing, unreadable or has no hash
+    """
+    return existing_run_record(output_file)["input_hash"]
+
+
+def existing_run_record(output_file):
+    """
+    Return the input hash and the run options recorded in an existing result file.
+
+    The run options are the command-line settings of run_new_csv_bin.py that
+    change the result, so that a result can be checked against its own
+    settings (see stale_bins.py).
+
+    Parameters:
+    - output_file (str): Path of the result JSON
+
+    Returns:
+    - Dictionary with "input_hash" (None if the file is missing, unreadable or
+      has no hash), "compress_scenario" (False if not recorded),
+      "cycle_acceleration" (the CycleAcceleration.record() of an accelerated
+      run, None for exact runs) and "phase_policy_ignored" (True if the HISP
+      version of the run could not apply the phase policy of the folder)
+    """
+    data = {}
+    if os.path.exists(output_file):
+        try:
+            with open(output_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    return {
+        "input_hash": data.get("input_hash"),
+        "compress_scenario": bool(data.get("compress_scenario", False)),
+        "cycle_acceleration": _cycle_acceleration_settings(data.get("cycle_acceleration")),
+        "phase_policy_ignored": bool(data.get("phase_policy_ignored", False)),
+    }
+
+
+def _cycle_acceleration_settings(recorded):
+    """Settings part of the cycle_acceleration entry of a result (the hashed record)."""
+    if not recorded:
+        return None
+    return {key: value for key, value in recorded.items() if key != "extrapolated_intervals"}
+
+
+def make_milestones(scenario, bin_config):
+    """
+    Create milestone times for adaptive timestepping based on scenario pulses.
+
+    The milestones are the waveform breakpoints of every pulse (ramp-up start,
+    flat-top start and end, ramp-down end and waiting end) so that the stepper
+    lands exactly on each transition and can take large steps in between.
+    t=0 is excluded; the end of the scenario is included.
+
+    Args:
+        scenario: Scenario object
+        bin_config: BinConfiguration of the bin (unused, kept for per-bin policies)
+
+    Returns:
+        list of the sorted milestone times (s), see ``Scenario.iter_milestones``.
+        HISP appends the final time to it and FESTIM scans it at every step, so
+        it must be a list rather than a one-shot iterator.
+    """
+    return [t for t in scenario.iter_milestones() if t > 0]
+
+
+def install_milestones(new_model, scenario, bin_config):
+    """
+    Make a NewModel use the scenario milestones instead of its own generation.
+
+    Only HISP versions whose NewModel class defines a ``make_milestones``
+    method build their stepsize milestones through it; the instance attribute
+    set here takes precedence over that method and returns a new list on
+    every call. With any other HISP version nothing is installed and the model
+    keeps its own milestones.
+
+    Args:
+        new_model: NewModel instance
+        scenario: Scenario object the model runs
+        bin_config: BinConfiguration of the bin being run
+
+    Returns:
+        True if the hook was installed
+    """
+    if not callable(getattr(type(new_model), "make_milestones", None)):
+        print("Warning: this HISP NewModel has no make_milestones method, using its own milestones")
+        return False
+    new_model.make_milestones = lambda *args, **kwargs: make_milestones(scenario, bin_config)
+    print(f"  Milestones: waveform breakpoints of {len(scenario.pulses)} scenario rows")
+    return True
+
+
+def install_phase_policy(new_model, scenario, bin_config, phase_policy):
+    """
+    Make a NewModel use the maximum stepsizes of the phase policy (phase_policy.json).
+
+    Like ``make_milestones``, only HISP versions whose NewModel class defines a
+    ``max_stepsize(t)`` method look up their maximum stepsize through it; the
+    instance attribute set here takes precedence over that method. Nothing is
+    installed for the default policy or with any other HISP version.
+
+    Args:
+        new_model: NewModel instance
+        scenario: Scenario object the model runs
+        bin_config: BinConfiguration of the bin being run
+        phase_policy: PhasePolicy of the input folder
+
+    Returns:
+        True if the phase policy was installed
+    """
+    if phase_policy.is_default:
+        return False
+    if not callable(getattr(type(new_model), "max_stepsize", None)):
+        print("Warning: this HISP NewModel has no max_stepsize method, ignoring the phase policy")
+        return False
+    new_model.max_stepsize = phase_policy.stepsize_function(scenario, bin_config)
+    return True
+
+
+
+def sample_temperatures(temperature_function, depths, t):
+    """
+    Evaluate a temperature function at several depths over a whole time array.
+
+    The temperature function (HISP's) takes an (1, n) array of positions and a
+    scalar time, so it is called once per time with all depths at once, and
+    times repeated in the exported series (stage boundaries) are evaluated once.
+
+    Parameters:
+    - temperature_function (callable): T(x, t), e.g. from make_temperature_function
+    - depths (list of float): Positions in the bin (m), e.g. [0.0, thickness]
+    - t (array-like): Times (s)
+
+    Returns:
+    - Array of shape (len(depths), len(t)) with the temperatures (K)
+    """
+    x = np.array([depths], dtype=float)
+    t = np.asarray(t, dtype=float)
+    t_unique, inverse = np.unique(t, return_inverse=True)
+
+    values = np.empty((len(depths), len(t_unique)))
+    for i, t_value in enumerate(t_unique):
+        values[:, i] = np.asarray(temperature_function(x, float(t_value)), dtype=float).reshape(-1)
+
+    return values[:, inverse]
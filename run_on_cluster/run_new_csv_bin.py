@@ -4,7 +4,6 @@ import json
 import pandas as pd
 import numpy as np
 import argparse
-import importlib.util
 
 # Ensure HISP can locate PFC-Tritium-Transport's csv_bin.py without user setup
 if "PFC_TT_PATH" not in os.environ and "HISP_PFC_TT_PATH" not in os.environ:
@@ -28,7 +27,23 @@ if hisp_src not in sys.path:
 # Import CSV bin system
 from bins_from_csv.csv_bin_loader import CSVBinLoader
 from bins_from_csv.csv_bin import Reactor
-from run_bin_functions import load_scenario_variable
+from run_bin_functions import (
+    existing_input_hash,
+    install_milestones,
+    install_phase_policy,
+    load_bins_meshes,
+    load_plasma_data_handling,
+    load_scenario_variable,
+    result_paths,
+    sample_temperatures,
+)
+from bin_classes import fan_out, read_class_map
+from cycle_acceleration import CycleAcceleration, run_accelerated
+from input_hashing import result_input_hash
+from output_policy import OutputPolicies
+from phase_policy import PhasePolicy
+from plotting.pyramids import write_pyramid
+from scenario_checkpoints import CheckpointStore, run_chained, supports_initial_state
 
 # Import implantation calculator
 from implantation_calculator import ImplantationCalculator
@@ -47,15 +62,56 @@ parser.add_argument("scenario_name", help="Scenario name")
 parser.add_argument("csv_file", help="Path to CSV input file")
 parser.add_argument("--input-dir", dest="input_dir", default="input_files",
                     help="Directory containing input files (materials.csv, mesh.py, etc.). Default: input_files")
+parser.add_argument("--checkpoint-dir", dest="checkpoint_dir", default=None,
+                    help="Experimental: directory of cached bin states at scenario phase boundaries. "
+                         "Scenarios sharing a prefix with a cached run restart from it. Requires a HISP "
+                         "NewModel.run_bin accepting an initial_state (scenario_checkpoints.py). Default: disabled")
+parser.add_argument("--compress-scenario", dest="compress_scenario", action="store_true",
+                    help="Merge adjacent identical scenario rows into periodic blocks (Scenario.compress). "
+                         "HISP then sees fewer, longer rows, so compressed runs get their own input hash. "
+                         "Default: disabled")
+parser.add_argument("--force", action="store_true",
+                    help="Run even if a result with the same input hash already exists")
+parser.add_argument("--pyramids", action="store_true",
+                    help="Also write min/max/mean pyramids of the results for plotting (plotting/pyramids.py)")
+parser.add_argument("--class-map", dest="class_map", default=None,
+                    help="Classes of identical bins (run_on_cluster/bin_classes.py). The result of this bin "
+                         "is also written for the other members of its class. Default: disabled")
+parser.add_argument("--plasma-data-store", dest="plasma_data_store", default=None,
+                    help="Directory of shared memory-mapped plasma data stores, e.g. /dev/shm/pfc_tt "
+                         "(plasma_data_handling/shared_store.py). Default: $PFC_TT_PLASMA_DATA_STORE, disabled if unset")
+parser.add_argument("--cycle-acceleration", dest="cycle_acceleration", action="store_true",
+                    help="Project the state over repetitive scenario rows instead of simulating every cycle "
+                         "(run_on_cluster/cycle_acceleration.py). Requires a HISP NewModel.run_bin accepting "
+                         "an initial_state. Default: disabled")
+parser.add_argument("--cycle-tol", dest="cycle_tol", type=float, default=CycleAcceleration.tol,
+                    help=f"Relative error target of a projection. Default: {CycleAcceleration.tol}")
+parser.add_argument("--cycle-max-jump", dest="cycle_max_jump", type=int, default=CycleAcceleration.max_jump,
+                    help=f"Maximum number of cycles projected at once. Default: {CycleAcceleration.max_jump}")
 
 # Parse positional arguments first (for backwards compatibility)
 args = parser.parse_args()
+if args.checkpoint_dir and not supports_initial_state(NewModel):
+    parser.error("--checkpoint-dir is experimental and needs a HISP NewModel.run_bin accepting an "
+                 "initial_state, which this HISP version does not have")
+if args.cycle_acceleration and not supports_initial_state(NewModel):
+    parser.error("--cycle-acceleration needs a HISP NewModel.run_bin accepting an initial_state, "
+                 "which this HISP version does not have")
 
 bin_id = args.bin_id
 scenario_folder = args.scenario_folder
 scenario_name = args.scenario_name
 csv_file_path = args.csv_file
 input_dir = args.input_dir
+checkpoint_dir = args.checkpoint_dir
+compress_scenario = args.compress_scenario
+force = args.force
+write_pyramids = args.pyramids
+class_members = read_class_map(args.class_map).get(bin_id, []) if args.class_map else []
+cycle_acceleration = (
+    CycleAcceleration(tol=args.cycle_tol, max_jump=args.cycle_max_jump) if args.cycle_acceleration else None
+)
+phase_policy = PhasePolicy.from_input_dir(input_dir)
 
 # If input_dir is provided, try to find materials and mesh files in that directory
 if input_dir and input_dir != "input_files":
@@ -76,6 +132,12 @@ if input_dir and input_dir != "input_files":
 print(f"Loading scenario: {scenario_name} from {scenario_folder}")
 scenario = load_scenario_variable(scenario_folder, scenario_name)
 
+if compress_scenario:
+    # Merge adjacent identical pulses into periodic blocks (same waveform, fewer rows)
+    n_rows = len(scenario.pulses)
+    scenario = scenario.compress()
+    print(f"Compressed scenario: {n_rows} rows -> {len(scenario.pulses)} rows")
+
 print(f"Loading CSV bins from: {csv_file_path}")
 # Load CSV reactor with optional materials path from input_dir
 materials_path = None
@@ -92,21 +154,7 @@ print(f"Loaded {len(csv_reactor)} bins from CSV")
 print(csv_reactor.get_reactor_summary())
 
 # Make a plasma data handling object. Prefer scenario-provided instance if present.
-data_folder = "data"
-if hasattr(scenario, "plasma_data_handling"):
-    plasma_data_handling = scenario.plasma_data_handling
-else:
-    plasma_data_handling = PlasmaDataHandling(
-        pulse_type_to_data={
-            "FP": pd.read_csv(data_folder + "/Binned_Flux_Data.dat", delimiter=","),
-            "FP_D": pd.read_csv(data_folder + "/Binned_Flux_Data_just_D_pulse.dat", delimiter=",", comment='#'),
-            "ICWC": pd.read_csv(data_folder + "/ICWC_data.dat", delimiter=","),
-            "GDC": pd.read_csv(data_folder + "/GDC_data.dat", delimiter=","),
-        },
-        path_to_ROSP_data=data_folder + "/ROSP_data",
-        path_to_RISP_data=data_folder + "/RISP_data",
-        path_to_RISP_wall_data=data_folder + "/RISP_Wall_data.dat",
-    )
+plasma_data_handling = load_plasma_data_handling(scenario, shared_store=args.plasma_data_store)
 
 
 def compute_and_attach_implantation_params(bin, scenario, plasma_data_handling, use_physics_model=False):
@@ -191,65 +239,69 @@ def compute_and_attach_implantation_params(bin, scenario, plasma_data_handling,
 def run_new_csv_bin_scenario(scenario, bin_id: int):
     """Run scenario for a specific CSV bin ID using NewModel class."""
     
-    coolant_temp = 343.0
-    
-    # Import BINS_MESHES from appropriate mesh configuration
-    BINS_MESHES = {}
-    
-    # Try to load mesh from input_dir if available
-    if input_dir and input_dir != "input_files":
-        mesh_file = os.path.join(input_dir, "mesh.py")
-        if os.path.exists(mesh_file):
-            try:
-                # Set environment variable so mesh.py can find the correct input folder
-                os.environ["INPUT_DIR_CONTEXT"] = input_dir
-                # Dynamically import mesh.py from input_dir
-                spec = importlib.util.spec_from_file_location("mesh_config", mesh_file)
-                mesh_config = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mesh_config)
-                if hasattr(mesh_config, 'BINS_MESHES'):
-                    BINS_MESHES = mesh_config.BINS_MESHES
-                    print(f"Loaded mesh configuration from: {mesh_file}")
-            except Exception as e:
-                print(f"Warning: Could not load mesh from {mesh_file}: {e}")
-    
-    # Fall back to default input_files/mesh.py if no mesh in input_dir
-    if not BINS_MESHES:
-        try:
-            from input_files.mesh import BINS_MESHES
-        except ImportError:
-            print("No mesh configuration found, using default mesh generation")
-            BINS_MESHES = {}
-
-    # Create NewModel instance (similar to how old script creates Model)
-    my_new_model = NewModel(
-        reactor=csv_reactor,
-        scenario=scenario,
-        plasma_data_handling=plasma_data_handling,
-        coolant_temp=coolant_temp,
-        bins_meshes=BINS_MESHES,
-    )
+    # Meshes from the input folder's mesh configuration, built for this bin (and its class members)
+    BINS_MESHES = load_bins_meshes(input_dir, csv_reactor, [bin_id] + class_members)
+
+    def make_new_model(model_scenario):
+        """Create a NewModel instance for the given (sub-)scenario."""
+        new_model = NewModel(
+            reactor=csv_reactor,
+            scenario=model_scenario,
+            plasma_data_handling=plasma_data_handling,
+            coolant_temp=coolant_temp,
+            bins_meshes=BINS_MESHES,
+        )
+        if model_scenario is not scenario:
+            install_milestones(new_model, model_scenario, target_bin.bin_configuration)
+            install_phase_policy(new_model, model_scenario, target_bin.bin_configuration, phase_policy)
+        return new_model
 
     # Find the specific bin by bin_id (1-based row index in CSV)
     try:
-        # Search through bins to find one with matching bin_id
-        target_bin = None
-        for bin in csv_reactor.bins:
-            if bin.bin_id == bin_id:
-                target_bin = bin
-                break
-        
+        target_bin = csv_reactor.bins_by_id.get(bin_id)
         if target_bin is None:
-            available_ids = [b.bin_id for b in csv_reactor.bins]
-            raise ValueError(f"No bin found with bin_id {bin_id}. Available bin IDs: {sorted(set(available_ids))}")
-        
+            raise ValueError(f"No bin found with bin_id {bin_id}. Available bin IDs: {sorted(csv_reactor.bins_by_id)}")
+
+        # Coolant temperature of the bin's row ("Coolant Temp. (K)", default 343 K)
+        coolant_temp = target_bin.coolant_temp
+
+        # Create NewModel instance (similar to how old script creates Model)
+        my_new_model = make_new_model(scenario)
+        install_milestones(my_new_model, scenario, target_bin.bin_configuration)
+        # an unsupported phase policy is not applied, so it is neither hashed nor recorded
+        phase_policy_applied = install_phase_policy(
+            my_new_model, scenario, target_bin.bin_configuration, phase_policy
+        )
+
+        # --cycle-acceleration is refused at argument parsing without initial_state support
+        accelerate = cycle_acceleration is not None
+
+        # Skip bins whose result was produced from identical inputs
+        output_policies = OutputPolicies.for_bin(target_bin, input_dir)
+        policy_records = {
+            "output_policy": output_policies.record(),
+            # only hashed (and recorded in the result) when the run is actually accelerated
+            "cycle_acceleration": cycle_acceleration.record() if accelerate else None,
+            "phase_policy": phase_policy.record() if phase_policy_applied else None,
+        }
+        input_hash = result_input_hash(
+            target_bin, BINS_MESHES.get(target_bin.bin_id), scenario, plasma_data_handling, coolant_temp,
+            **policy_records,
+        )
+        output_file, profiles_file = result_paths(input_dir, target_bin)
+        if not force and existing_input_hash(output_file) == input_hash:
+            print(f"✓ Result for bin ID {bin_id} is up to date ({output_file}), skipping. Use --force to rerun.")
+            fan_out_to_class_members(target_bin, BINS_MESHES, policy_records["cycle_acceleration"])
+            return
+
         # Compute and attach implantation parameters
         print(f"\n=== Computing implantation parameters for Bin ID {bin_id} (Bin #{target_bin.bin_number}) ===")
         compute_and_attach_implantation_params(target_bin, scenario, plasma_data_handling, use_physics_model=True)
         print()
     except ValueError as e:
         print(f"Error: {e}")
-        return
+        # non-zero exit so that the pipeline and the SLURM jobs do not record the bin as done
+        sys.exit(1)
 
     try:
         # Get bin configuration early
@@ -265,12 +317,16 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
         print(f"  Thickness: {target_bin.thickness*1e3:.2f} mm")
         print(f"  Surface area: {target_bin.surface_area:.4f} m²")
         print(f"  Cu thickness: {target_bin.cu_thickness*1e3:.2f} mm")
+        print(f"  Coolant temperature: {coolant_temp:.1f} K")
         print(f"  Ion scaling factor: {target_bin.ion_scaling_factor:.3f}")
         print(f"  BC plasma facing: {bin_config.bc_plasma_facing_surface}")
         print(f"  BC rear surface: {bin_config.bc_rear_surface}")
         print(f"  Tolerances: rtol={bin_config.rtol:.0e}, atol={bin_config.atol:.0e}")
         print(f"  Max stepsize FP: {bin_config.fp_max_stepsize:.1f} s")
         print(f"  Max stepsize no FP: {bin_config.max_stepsize_no_fp:.1f} s")
+        if phase_policy_applied:
+            print(f"  Phase policy: {phase_policy.record()} "
+                  f"({100 * phase_policy.source_free_fraction(scenario):.0f}% of the scenario is source-free)")
         print(f"{'='*60}\n")
         
         # Debug: Print flux values during flat-top
@@ -306,7 +362,24 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
         
         # Run the bin using NewModel.run_bin() method
         print("Running bin using NewModel.run_bin()...")
-        model, quantities = my_new_model.run_bin(target_bin, exports=False)
+        extrapolated = None
+        if accelerate:
+            if checkpoint_dir:
+                print("Warning: --checkpoint-dir is ignored with --cycle-acceleration")
+            print(f"Cycle acceleration enabled (tol={cycle_acceleration.tol:.0e}, "
+                  f"max jump={cycle_acceleration.max_jump} cycles)")
+            model, quantities, extrapolated = run_accelerated(
+                make_new_model, target_bin, scenario, settings=cycle_acceleration
+            )
+        elif checkpoint_dir:
+            print(f"Scenario segment chaining enabled (experimental, checkpoints in {checkpoint_dir})")
+            model, quantities = run_chained(
+                make_new_model, target_bin, BINS_MESHES.get(target_bin.bin_id), scenario,
+                CheckpointStore(checkpoint_dir), plasma_data_handling=plasma_data_handling,
+                coolant_temp=coolant_temp, **policy_records,
+            )
+        else:
+            model, quantities = my_new_model.run_bin(target_bin, exports=False)
         
         # Get temperature function for recording
         from hisp.festim_models.new_mb_model import make_temperature_function
@@ -325,8 +398,19 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
         t_sampled = None
         for key, value in quantities.items():
             if not key.endswith('_profile'):
-                t_sampled = value.t[::1]
+                t_sampled = np.asarray(value.t, dtype=float)
                 break
+
+        # Samples kept by the output policy (one index set shared by every quantity)
+        kept = None
+        if t_sampled is not None and not output_policies.keeps_all:
+            kept = output_policies.indices(
+                t_sampled,
+                {key: value.data for key, value in quantities.items() if not key.endswith('_profile')},
+                keep_times=scenario.iter_milestones(),
+            )
+            print(f"  Output policy {output_policies.default}: keeping {len(kept)}/{len(t_sampled)} samples")
+            t_sampled = t_sampled[kept]
         
         for key, value in quantities.items():
             if key.endswith('_profile'):
@@ -343,13 +427,14 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
                 }
             else:
                 # Scalar quantity (TotalVolume, SurfaceFlux, etc.)
+                data = np.asarray(value.data, dtype=float)
                 scalar_data[key] = {
-                    "data": value.data[::1].tolist() if hasattr(value.data, 'tolist') else value.data[::1]
+                    "data": (data if kept is None else data[kept]).tolist()
                 }
         
         # Build final output dict
         csv_bin_data = scalar_data
-        csv_bin_data["t"] = t_sampled.tolist() if hasattr(t_sampled, 'tolist') else list(t_sampled)
+        csv_bin_data["t"] = t_sampled.tolist()
         
         # Add CSV bin specific information
         csv_bin_data["bin_id"] = target_bin.bin_id
@@ -362,6 +447,8 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
         csv_bin_data["ion_scaling_factor"] = target_bin.ion_scaling_factor
         csv_bin_data["surface_area"] = target_bin.surface_area
         csv_bin_data["parent_bin_surf_area"] = target_bin.parent_bin_surf_area
+        csv_bin_data["input_hash"] = input_hash
+        csv_bin_data["compress_scenario"] = compress_scenario
         
         # Add bin configuration parameters
         csv_bin_data["bin_configuration"] = {
@@ -371,66 +458,80 @@ def run_new_csv_bin_scenario(scenario, bin_id: int):
             "max_stepsize_no_fp": bin_config.max_stepsize_no_fp,
             "bc_plasma_facing_surface": bin_config.bc_plasma_facing_surface,
             "bc_rear_surface": bin_config.bc_rear_surface,
+            "output_policy": output_policies.record(),
+            "phase_policy": policy_records["phase_policy"],
         }
+        if not phase_policy.is_default and not phase_policy_applied:
+            # stale_bins.py and the class fan-out hash this result without the policy
+            csv_bin_data["phase_policy_ignored"] = True
+        if accelerate:
+            csv_bin_data["cycle_acceleration"] = {
+                **cycle_acceleration.record(),
+                "extrapolated_intervals": extrapolated,
+            }
+
+        # Temperature at x=0 (plasma-facing surface) and x=thickness (rear surface)
+        temperature_values, temperature_rear_values = sample_temperatures(
+            temperature_function, [0.0, target_bin.thickness], t_sampled
+        )
+        csv_bin_data["temperature_at_x0"] = temperature_values.tolist()
+        csv_bin_data["temperature_at_rear"] = temperature_rear_values.tolist()
 
-        # Calculate temperature at x=0 (plasma-facing surface)
-        x_eval = np.array([[0.0]])  # x = 0
-        temperature_values = [float(temperature_function(x_eval, float(t))[0]) for t in t_sampled]
-        csv_bin_data["temperature_at_x0"] = temperature_values
-
-        # Calculate temperature at x=thickness (rear surface)
-        x_rear = np.array([[target_bin.thickness]])  # x = thickness
-        temperature_rear_values = [float(temperature_function(x_rear, float(t))[0]) for t in t_sampled]
-        csv_bin_data["temperature_at_rear"] = temperature_rear_values
-
-        # Save results to JSON files
-        material_name = target_bin.material.name.lower()
-        mode_name = target_bin.mode.lower().replace("_", "")
-        
-        # Use input folder name for results directory, save inside the input folder
-        input_folder_name = os.path.basename(os.path.normpath(input_dir)) if input_dir else "results"
-        results_dir = os.path.join(input_dir, f"results_{input_folder_name}")
-        profiles_dir = os.path.join(input_dir, f"profiles_{input_folder_name}")
-        
-        base_filename = f"{results_dir}/id_{target_bin.bin_id}_bin_num_{target_bin.bin_number}_{material_name}_{mode_name}"
-        output_file = f"{base_filename}.json"
-        
-        profiles_base = f"{profiles_dir}/id_{target_bin.bin_id}_bin_num_{target_bin.bin_number}_{material_name}_{mode_name}"
-        profiles_file = f"{profiles_base}_profiles.json"
-        
-        os.makedirs(results_dir, exist_ok=True)
+        # Save results to JSON files (paths from result_paths)
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
         # Save scalar quantities
         with open(output_file, "w") as f:
             json.dump(csv_bin_data, f, indent=4)
+
+        if write_pyramids:
+            pyramid_file = write_pyramid(output_file, csv_bin_data)
         
         # Save profile data to separate folder
         if profile_data:
-            os.makedirs(profiles_dir, exist_ok=True)
+            os.makedirs(os.path.dirname(profiles_file), exist_ok=True)
             with open(profiles_file, "w") as f:
                 json.dump(profile_data, f, indent=4)
 
         print(f"\n{'='*60}")
         print(f"✓ Simulation complete!")
         print(f"  Quantities saved to: {output_file}")
+        if write_pyramids:
+            print(f"  Plot pyramids saved to: {pyramid_file}")
         if profile_data:
             print(f"  Profiles saved to: {profiles_file}")
             print(f"  Profile export times: {len(profile_data[list(profile_data.keys())[0]]['t'])} timesteps")
         print(f"{'='*60}\n")
 
+        fan_out_to_class_members(target_bin, BINS_MESHES, policy_records["cycle_acceleration"])
+
     except Exception as e:
         print(f"Failed to process CSV bin ID {bin_id}: {e}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
 
 
-def make_milestones(scenario, bin_config):
+def fan_out_to_class_members(target_bin, bins_meshes, cycle_acceleration_record):
     """
-    Create milestone times for adaptive timestepping based on scenario pulses.
-    
-    Note: This function is not currently used. HISP provides its own milestone generation.
+    Write the results of the other members of the bin's class (--class-map) from its result.
+
+    Args:
+        target_bin: Bin that was run (representative of its class)
+        bins_meshes: meshes of the bin and of its class members
+        cycle_acceleration_record: CycleAcceleration.record() of an accelerated run, None otherwise
     """
-    return []
+    if not class_members:
+        return
+    members = [csv_reactor.bins_by_id[member_id] for member_id in class_members if member_id in csv_reactor.bins_by_id]
+    written = fan_out(
+        input_dir, target_bin, members, bins_meshes, scenario, plasma_data_handling, force=force,
+        cycle_acceleration=cycle_acceleration_record,
+    )
+    for member_file in written:
+        if write_pyramids:
+            write_pyramid(member_file)
+    print(f"✓ Result copied to {len(written)}/{len(members)} bins of the class of bin ID {target_bin.bin_id}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,307 @@
+"""
+Scenario segment chaining for single-bin runs (experimental).
+
+A bin's scenario is split at its phase boundaries (see
+``Scenario.phase_boundaries``). The state of the bin at the end of each
+phase is persisted together with the quantities recorded during that phase,
+keyed by the hash of the same inputs as the result input hash
+(``input_hashing.result_input_hash``) restricted to the pulse prefix, except
+the output policy, which only selects the exported points.
+
+A scenario whose first phases match an already simulated scenario can then
+restart from the cached state and only simulate its own tail: N variants of
+a campaign cost one shared prefix plus N short tails.
+
+Each checkpoint stores only the segment of the time series simulated in its
+own stage and the key of its parent checkpoint, so that the full history is
+rebuilt by walking the chain back to t=0.
+
+Restarting needs a HISP ``NewModel.run_bin`` accepting an ``initial_state``
+(``supports_initial_state``) and restoring every field of ``extract_state``
+from it. No released HISP version has it yet, so chaining is only enabled by
+``run_new_csv_bin.py --checkpoint-dir``, which refuses to start without it.
+"""
+
+import inspect
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from input_hashing import hash_record, input_record
+
+
+def prefix_key(bin, mesh, scenario, n_rows: int, plasma_data_handling, coolant_temp: float, **policies) -> str:
+    """Returns the checkpoint key of the first ``n_rows`` rows of a scenario for a bin.
+
+    Args:
+        bin: Bin object
+        mesh: MeshBin (or vertex array) used for this bin, None for the default mesh
+        scenario: Scenario object
+        n_rows: number of scenario rows in the prefix
+        plasma_data_handling: PlasmaDataHandling object of the run
+        coolant_temp: coolant temperature of the run (K)
+        policies: ``cycle_acceleration``/``phase_policy`` records, as passed to
+            ``input_hashing.result_input_hash``; an ``output_policy`` record is
+            ignored since it does not change the state
+
+    Returns:
+        the hex digest identifying the bin state at the end of the prefix
+    """
+    policies.pop("output_policy", None)
+    return hash_record(
+        input_record(bin, mesh, scenario.pulses[:n_rows], plasma_data_handling, coolant_temp, **policies)
+    )
+
+
+def _solution_array(field) -> Optional[np.ndarray]:
+    solution = getattr(field, "post_processing_solution", None)
+    if solution is None:
+        solution = getattr(field, "solution", field)
+    array = getattr(getattr(solution, "x", None), "array", None)
+    return None if array is None else np.array(array, copy=True)
+
+
+def extract_state(model) -> Dict[str, np.ndarray]:
+    """Returns the degrees of freedom of a solved FESTIM model.
+
+    These are the solutions of every species, mobile and trapped, under their
+    name, the occupancies of models listing their ``traps`` separately under
+    ``trap:<name>`` and a solved temperature field (``temperature_fenics``)
+    under ``temperature``. A prescribed temperature has no degrees of freedom
+    and is not stored.
+
+    Args:
+        model: the FESTIM model returned by ``NewModel.run_bin``
+
+    Returns:
+        dictionary mapping field name to a copy of its solution array
+    """
+    state = {}
+    for species in getattr(model, "species", []):
+        array = _solution_array(species)
+        if array is not None:
+            state[species.name] = array
+    for trap in getattr(model, "traps", None) or []:
+        array = _solution_array(trap)
+        if array is not None:
+            state[f"trap:{trap.name}"] = array
+    temperature = _solution_array(getattr(model, "temperature_fenics", None))
+    if temperature is not None:
+        state["temperature"] = temperature
+    return state
+
+
+def supports_initial_state(new_model) -> bool:
+    """Checks whether ``new_model.run_bin`` can restart from a given state (NewModel class or instance)."""
+    try:
+        parameters = inspect.signature(new_model.run_bin).parameters
+    except (TypeError, ValueError):
+        return False
+    return "initial_state" in parameters
+
+
+class CheckpointStore:
+    """On-disk store of bin states at scenario phase boundaries.
+
+    Every checkpoint ``<key>`` is made of two files in ``root``:
+        - ``<key>.json``: metadata (parent key, stage start/end times, quantity names)
+        - ``<key>.npz``: species state arrays and the time series of the stage
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, key)
+        return f"{base}.json", f"{base}.npz"
+
+    def __contains__(self, key: str) -> bool:
+        meta_path, arrays_path = self._paths(key)
+        return os.path.exists(meta_path) and os.path.exists(arrays_path)
+
+    def save(
+        self,
+        key: str,
+        state: Dict[str, np.ndarray],
+        segment: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        t_start: float,
+        t_end: float,
+        parent: Optional[str] = None,
+    ):
+        """Saves the state at the end of a stage and the series recorded during it.
+
+        Args:
+            key: checkpoint key (see ``prefix_key``)
+            state: species name -> solution array at ``t_end``
+            segment: quantity name -> (t, data) recorded during the stage, absolute times
+            t_start: absolute start time of the stage (s)
+            t_end: absolute end time of the stage (s)
+            parent: key of the checkpoint the stage was started from (None from t=0)
+        """
+        meta_path, arrays_path = self._paths(key)
+        arrays = {f"state__{name}": values for name, values in state.items()}
+        for name, (t, data) in segment.items():
+            arrays[f"t__{name}"] = np.asarray(t, dtype=float)
+            arrays[f"data__{name}"] = np.asarray(data, dtype=float)
+        # write arrays first: a checkpoint only exists once its metadata is written
+        tmp_arrays = f"{arrays_path}.tmp.npz"
+        np.savez(tmp_arrays, **arrays)
+        os.replace(tmp_arrays, arrays_path)
+        meta = {
+            "parent": parent,
+            "t_start": float(t_start),
+            "t_end": float(t_end),
+            "species": sorted(state.keys()),
+            "quantities": sorted(segment.keys()),
+        }
+        tmp_meta = f"{meta_path}.tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f, indent=4)
+        os.replace(tmp_meta, meta_path)
+
+    def load(self, key: str) -> Tuple[dict, Dict[str, np.ndarray], Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+        """Loads a checkpoint.
+
+        Returns:
+            (metadata, state, segment) as passed to ``save``
+        """
+        meta_path, arrays_path = self._paths(key)
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        with np.load(arrays_path) as arrays:
+            state = {name: arrays[f"state__{name}"] for name in meta["species"]}
+            segment = {
+                name: (arrays[f"t__{name}"], arrays[f"data__{name}"])
+                for name in meta["quantities"]
+            }
+        return meta, state, segment
+
+    def history(self, key: str) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Returns the series from t=0 up to the checkpoint, following the parent chain."""
+        segments = []
+        while key is not None:
+            meta, _, segment = self.load(key)
+            segments.append(segment)
+            key = meta["parent"]
+        history = {}
+        for segment in reversed(segments):
+            for name, (t, data) in segment.items():
+                if name in history:
+                    t_prev, data_prev = history[name]
+                    # the first point of a stage repeats the last point of its parent
+                    keep = t > t_prev[-1] if len(t_prev) else slice(None)
+                    history[name] = (
+                        np.concatenate([t_prev, t[keep]]),
+                        np.concatenate([data_prev, data[keep]]),
+                    )
+                else:
+                    history[name] = (t, data)
+        return history
+
+    def longest_cached_prefix(self, bin, mesh, scenario, **inputs) -> Tuple[int, Optional[str]]:
+        """Finds the longest phase prefix of ``scenario`` with a cached bin state.
+
+        ``inputs`` are the other arguments of ``prefix_key``.
+
+        Returns:
+            (number of rows covered, checkpoint key), (0, None) if nothing is cached
+        """
+        for n_rows in reversed(scenario.phase_boundaries()):
+            key = prefix_key(bin, mesh, scenario, n_rows, **inputs)
+            if key in self:
+                return n_rows, key
+        return 0, None
+
+
+class ChainedSeries:
+    """Minimal stand-in for a HISP exported quantity (``.t`` and ``.data``)."""
+
+    def __init__(self, t: np.ndarray, data: np.ndarray):
+        self.t = t
+        self.data = data
+
+
+def quantities_segment(quantities: dict, t_offset: float) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Returns the scalar quantities of a stage as (t, data) arrays shifted by ``t_offset``.
+
+    Profile exports (keys ending in ``_profile``) are not chained.
+    """
+    segment = {}
+    for key, value in quantities.items():
+        if key.endswith("_profile"):
+            continue
+        t = np.asarray(value.t, dtype=float) + t_offset
+        segment[key] = (t, np.asarray(value.data, dtype=float))
+    return segment
+
+
+def run_chained(
+    make_new_model,
+    target_bin,
+    mesh,
+    scenario,
+    store: CheckpointStore,
+    **inputs,
+) -> Tuple[object, dict]:
+    """Runs a bin's scenario phase by phase, restarting from the longest cached prefix.
+
+    Args:
+        make_new_model: callable taking a (sub-)scenario and returning a NewModel
+        target_bin: Bin object to simulate
+        mesh: MeshBin used for this bin (None for the default mesh)
+        scenario: full Scenario object
+        store: CheckpointStore holding the cached states
+        inputs: other inputs of the checkpoint keys (``plasma_data_handling``,
+            ``coolant_temp`` and the policy records, see ``prefix_key``)
+
+    Returns:
+        (model of the last stage, quantities) where quantities maps each scalar
+        quantity to a ``ChainedSeries`` covering the full scenario, and each
+        profile export of the last stage (with times shifted to absolute time)
+    """
+    boundaries: List[int] = scenario.phase_boundaries()
+    start_row, parent = store.longest_cached_prefix(target_bin, mesh, scenario, **inputs)
+    state = None
+    if parent is not None:
+        _, state, _ = store.load(parent)
+        print(
+            f"Restarting from cached state after row {start_row}/{len(scenario.pulses)} "
+            f"(t = {scenario.get_time_till_row(start_row):.1f} s, key {parent[:12]})"
+        )
+    else:
+        print("No cached prefix found, running from t = 0")
+
+    model = None
+    profiles = {}
+    for end_row in boundaries:
+        if end_row <= start_row:
+            continue
+        t_offset = scenario.get_time_till_row(start_row)
+        stage = scenario.sub_scenario(start_row, end_row)
+        print(f"  Stage rows {start_row}-{end_row - 1}: t = {t_offset:.1f} s -> {t_offset + stage.get_maximum_time():.1f} s")
+        model, stage_quantities = make_new_model(stage).run_bin(
+            target_bin, exports=False, initial_state=state
+        )
+        state = extract_state(model)
+        key = prefix_key(target_bin, mesh, scenario, end_row, **inputs)
+        store.save(
+            key,
+            state=state,
+            segment=quantities_segment(stage_quantities, t_offset),
+            t_start=t_offset,
+            t_end=t_offset + stage.get_maximum_time(),
+            parent=parent,
+        )
+        profiles = {k: v for k, v in stage_quantities.items() if k.endswith("_profile")}
+        for value in profiles.values():
+            if getattr(value, "t", None) is not None:
+                value.t = [float(t) + t_offset for t in value.t]
+        parent = key
+        start_row = end_row
+
+    quantities = {name: ChainedSeries(t, data) for name, (t, data) in store.history(parent).items()}
+    quantities.update(profiles)
+    return model, quantities
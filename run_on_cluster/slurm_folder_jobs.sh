@@ -9,7 +9,9 @@
 #SBATCH --partition=sirius
 
 # New CSV Bin SLURM Job Submitter
-# Usage: ./slurm_new_csv_bin input_files
+# Usage: ./slurm_new_csv_bin [--force] input_files [bin_specification]
+#
+# Bins whose result JSON records the same input hash as the current inputs are skipped unless --force is given.
 # 
 # Where input_files folder contains:
 #   - input_table.csv (bin definitions)
@@ -35,7 +37,7 @@ module unload scifem              2>/dev/null
 
 # Parse command line arguments
 if [ $# -eq 0 ]; then
-    echo "Usage: $0 input_files [bin_specification]"
+    echo "Usage: $0 [--force] input_files [bin_specification]"
     echo ""
     echo "Where input_files is a folder containing:"
     echo "  - input_table.csv"
@@ -50,6 +52,12 @@ if [ $# -eq 0 ]; then
     exit 1
 fi
 
+FORCE=0
+if [ "$1" = "--force" ]; then
+    FORCE=1
+    shift
+fi
+
 INPUT_DIR="$1"
 BIN_SPEC="${@:2}"  # Everything after input_dir
 
@@ -140,6 +148,21 @@ else
     echo "  Total bins: ${#BIN_IDS_ARRAY[@]}"
 fi
 
+# Skip bins whose result already matches the current inputs (see run_on_cluster/stale_bins.py)
+if [ "$FORCE" = "1" ]; then
+    RUN_FLAGS="--force"
+    echo "  --force: submitting every selected bin"
+else
+    RUN_FLAGS=""
+    STALE_OUTPUT=$(PYTHONNOUSERSITE=1 python -s run_on_cluster/stale_bins.py "$INPUT_DIR" "$SCENARIO_FOLDER" "$SCENARIO_NAME" --csv-file "$CSV_FILE" --bins "${BIN_IDS_ARRAY[*]}")
+    if [ $? -ne 0 ]; then
+        echo "  Warning: could not check existing results, submitting every selected bin"
+    else
+        BIN_IDS_ARRAY=($STALE_OUTPUT)
+        echo "  Bins with missing or outdated results: ${#BIN_IDS_ARRAY[@]}"
+    fi
+fi
+
 # Create logs directory
 mkdir -p logs
 
@@ -175,7 +198,7 @@ module unload numpy               2>/dev/null
 module unload mpi4py              2>/dev/null
 module unload scifem              2>/dev/null
 
-PYTHONNOUSERSITE=1 python -s run_on_cluster/run_new_csv_bin.py $bin_id $SCENARIO_FOLDER $SCENARIO_NAME $CSV_FILE --input-dir $INPUT_DIR
+PYTHONNOUSERSITE=1 python -s run_on_cluster/run_new_csv_bin.py $bin_id $SCENARIO_FOLDER $SCENARIO_NAME $CSV_FILE --input-dir $INPUT_DIR $RUN_FLAGS
 
 EOF
     echo "Submitted job for bin ID: $bin_id"
@@ -14,6 +14,14 @@
 #   ./slurm_new_csv_jobs.sh scenario_name "n-m, p-q, r-s..."                   # Run specific bin ranges with custom scenario
 #   ./slurm_new_csv_jobs.sh --input-dir /path/to/folder scenario_name          # Run all bins with input folder
 #   ./slurm_new_csv_jobs.sh --input-dir /path/to/folder scenario_name "1-5"    # Run specific bins with input folder
+#   ./slurm_new_csv_jobs.sh --input-dir /path/to/folder --estimates cost_estimates.csv scenario_name
+#                                                                              # Per-batch time/memory/partition from cost_estimator.py
+#   ./slurm_new_csv_jobs.sh --force scenario_name                             # Rerun bins whose results are up to date
+#   ./slurm_new_csv_jobs.sh --dedupe scenario_name                            # Run one bin per class of identical bins
+#
+# Bins whose result JSON records the same input hash as the current inputs are skipped unless --force is given.
+# With --dedupe, physically identical bins (run_on_cluster/bin_classes.py) are only run once and the result is
+# copied to the other bins of the class.
 #
 # Examples:
 #   ./slurm_new_csv_jobs.sh just_glow                          # Run all bins with just_glow scenario (uses input_files/)
@@ -53,6 +61,9 @@ DEFAULT_INPUT_DIR="input_files"
 if [ $# -eq 0 ]; then
     echo "Usage: $0 scenario_name [\"n-m, p-q, r-s...\"]"
     echo "   or: $0 --input-dir <folder> scenario_name [\"n-m, p-q, r-s...\"]"
+    echo "   or: $0 [--input-dir <folder>] --estimates <cost_estimates.csv> scenario_name [\"n-m, p-q, r-s...\"]"
+    echo "   or: $0 --force [--input-dir <folder>] scenario_name [\"n-m, p-q, r-s...\"]   # also rerun up-to-date bins"
+    echo "   or: $0 --dedupe [--input-dir <folder>] scenario_name [\"n-m, p-q, r-s...\"]  # one run per class of identical bins"
     echo ""
     echo "Examples:"
     echo "  $0 just_glow                                      # Run all bins with just_glow scenario (default input_files/ folder)"
@@ -64,18 +75,45 @@ if [ $# -eq 0 ]; then
     exit 1
 fi
 
-# Check for --input-dir flag
+# Check for --input-dir, --estimates, --force and --dedupe flags
 INPUT_DIR="$DEFAULT_INPUT_DIR"
+ESTIMATES_FILE=""
+FORCE=0
+DEDUPE=0
 SCENARIO_START_INDEX=1
 
-if [ "$1" = "--input-dir" ] || [ "$1" = "-i" ]; then
-    if [ $# -lt 3 ]; then
-        echo "Error: --input-dir requires a folder path and scenario name"
-        echo "Usage: $0 --input-dir <folder> scenario_name [bin_specification]"
-        exit 1
+while [ $SCENARIO_START_INDEX -le $# ]; do
+    FLAG="${!SCENARIO_START_INDEX}"
+    VALUE_INDEX=$((SCENARIO_START_INDEX + 1))
+    if [ "$FLAG" = "--input-dir" ] || [ "$FLAG" = "-i" ]; then
+        if [ $# -lt $((SCENARIO_START_INDEX + 2)) ]; then
+            echo "Error: --input-dir requires a folder path and scenario name"
+            echo "Usage: $0 --input-dir <folder> scenario_name [bin_specification]"
+            exit 1
+        fi
+        INPUT_DIR="${!VALUE_INDEX}"
+        SCENARIO_START_INDEX=$((SCENARIO_START_INDEX + 2))
+    elif [ "$FLAG" = "--estimates" ]; then
+        if [ $# -lt $((SCENARIO_START_INDEX + 2)) ]; then
+            echo "Error: --estimates requires a CSV file (see run_on_cluster/cost_estimator.py) and scenario name"
+            exit 1
+        fi
+        ESTIMATES_FILE="${!VALUE_INDEX}"
+        SCENARIO_START_INDEX=$((SCENARIO_START_INDEX + 2))
+    elif [ "$FLAG" = "--force" ]; then
+        FORCE=1
+        SCENARIO_START_INDEX=$((SCENARIO_START_INDEX + 1))
+    elif [ "$FLAG" = "--dedupe" ]; then
+        DEDUPE=1
+        SCENARIO_START_INDEX=$((SCENARIO_START_INDEX + 1))
+    else
+        break
     fi
-    INPUT_DIR="$2"
-    SCENARIO_START_INDEX=3
+done
+
+if [ -n "$ESTIMATES_FILE" ] && [ ! -f "$ESTIMATES_FILE" ]; then
+    echo "Error: Estimates file '$ESTIMATES_FILE' not found!"
+    exit 1
 fi
 
 # Validate input directory
@@ -173,6 +211,38 @@ else
     echo "  Total bins: ${#BIN_IDS_ARRAY[@]}"
 fi
 
+# Skip bins whose result already matches the current inputs (see run_on_cluster/stale_bins.py)
+if [ "$DEDUPE" = "1" ]; then
+    # One representative per class of identical bins; its run also writes the results of the class members
+    CLASS_MAP="$INPUT_DIR/bin_classes.json"
+    if [ "$FORCE" = "1" ]; then
+        RUN_FLAGS="--force --class-map $CLASS_MAP"
+        CLASS_FLAGS=""
+    else
+        RUN_FLAGS="--class-map $CLASS_MAP"
+        CLASS_FLAGS="--stale"
+    fi
+    CLASS_OUTPUT=$(PYTHONNOUSERSITE=1 python -s run_on_cluster/bin_classes.py "$INPUT_DIR" "$SCENARIO_FOLDER" "$SCENARIO_NAME" --csv-file "$CSV_FILE" --bins "${BIN_IDS_ARRAY[*]}" --class-map "$CLASS_MAP" $CLASS_FLAGS)
+    if [ $? -ne 0 ]; then
+        echo "Error: could not group the bins into classes (run_on_cluster/bin_classes.py)"
+        exit 1
+    fi
+    BIN_IDS_ARRAY=($CLASS_OUTPUT)
+    echo "  --dedupe: submitting ${#BIN_IDS_ARRAY[@]} class representatives (classes in $CLASS_MAP)"
+elif [ "$FORCE" = "1" ]; then
+    RUN_FLAGS="--force"
+    echo "  --force: submitting every selected bin"
+else
+    RUN_FLAGS=""
+    STALE_OUTPUT=$(PYTHONNOUSERSITE=1 python -s run_on_cluster/stale_bins.py "$INPUT_DIR" "$SCENARIO_FOLDER" "$SCENARIO_NAME" --csv-file "$CSV_FILE" --bins "${BIN_IDS_ARRAY[*]}")
+    if [ $? -ne 0 ]; then
+        echo "  Warning: could not check existing results, submitting every selected bin"
+    else
+        BIN_IDS_ARRAY=($STALE_OUTPUT)
+        echo "  Bins with missing or outdated results: ${#BIN_IDS_ARRAY[@]}"
+    fi
+fi
+
 # Create logs directory if it doesn't exist
 mkdir -p logs
 
@@ -180,10 +250,69 @@ echo ""
 echo "Submitting jobs to SLURM cluster (using new_mb_model)..."
 echo "=========================================="
 
-# Loop over specified bin IDs
-for bin_id in "${BIN_IDS_ARRAY[@]}"; do
-    # Submit a new job for each bin ID
-    sbatch <<EOF
+if [ -n "$ESTIMATES_FILE" ]; then
+    # One job per batch of the estimates file, with the batch time/memory/partition.
+    # Bins of a batch run sequentially; selected bins missing from the file are skipped.
+    SELECTED_BINS=" ${BIN_IDS_ARRAY[*]} "
+    NUM_JOBS=0
+    for batch in $(tail -n +2 "$ESTIMATES_FILE" | cut -d, -f7 | sort -n | uniq); do
+        BATCH_BINS=()
+        while IFS=, read -r b_id est_time est_mem time_request mem_request partition b_batch; do
+            if [ "$b_batch" = "$batch" ] && [[ "$SELECTED_BINS" == *" $b_id "* ]]; then
+                BATCH_BINS+=($b_id)
+                BATCH_TIME="$time_request"
+                BATCH_MEM="$mem_request"
+                BATCH_PARTITION="$partition"
+            fi
+        done < <(tail -n +2 "$ESTIMATES_FILE")
+        if [ ${#BATCH_BINS[@]} -eq 0 ]; then
+            continue
+        fi
+
+        RUN_COMMANDS=""
+        for bin_id in "${BATCH_BINS[@]}"; do
+            RUN_COMMANDS+="PYTHONNOUSERSITE=1 python -s run_on_cluster/run_new_csv_bin.py $bin_id $SCENARIO_FOLDER $SCENARIO_NAME $CSV_FILE --input-dir $INPUT_DIR $RUN_FLAGS"$'\n'
+        done
+
+        sbatch <<EOF
+#!/bin/bash
+#SBATCH --job-name=new_csv_batch_${batch}
+#SBATCH --output=logs/new_csv_batch_${batch}_%j.out
+#SBATCH --error=logs/new_csv_batch_${batch}_%j.err
+#SBATCH --time=${BATCH_TIME}
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task=1
+#SBATCH --mem=${BATCH_MEM}M
+#SBATCH --partition=${BATCH_PARTITION}
+
+# Load modules and activate environment
+
+module load IMAS
+source /home/ITER/llealsa/miniconda3/etc/profile.d/conda.sh
+conda activate PFC-TT
+export PATH="/home/ITER/llealsa/miniconda3/envs/PFC-TT/bin:$PATH"
+
+unset PYTHONPATH
+export PYTHONNOUSERSITE=1
+
+module unload SciPy-bundle        2>/dev/null
+module unload Python-bundle-PyPI  2>/dev/null
+module unload Python              2>/dev/null
+module unload numpy               2>/dev/null
+module unload mpi4py              2>/dev/null
+module unload scifem              2>/dev/null
+
+# Run the bins of this batch sequentially
+$RUN_COMMANDS
+EOF
+        echo "Submitted batch $batch (${BATCH_TIME}, ${BATCH_MEM} MB, ${BATCH_PARTITION}): bins ${BATCH_BINS[*]}"
+        NUM_JOBS=$((NUM_JOBS + 1))
+    done
+else
+    # Loop over specified bin IDs
+    for bin_id in "${BIN_IDS_ARRAY[@]}"; do
+        # Submit a new job for each bin ID
+        sbatch <<EOF
 #!/bin/bash
 #SBATCH --job-name=new_csv_${bin_id}
 #SBATCH --output=logs/new_csv_bin_${bin_id}_%j.out
@@ -216,12 +345,14 @@ module unload scifem              2>/dev/null
 # Run the Python script with new_mb_model
 
 # Run CSV bin script with user-site disabled
-PYTHONNOUSERSITE=1 python -s run_on_cluster/run_new_csv_bin.py $bin_id $SCENARIO_FOLDER $SCENARIO_NAME $CSV_FILE --input-dir $INPUT_DIR
+PYTHONNOUSERSITE=1 python -s run_on_cluster/run_new_csv_bin.py $bin_id $SCENARIO_FOLDER $SCENARIO_NAME $CSV_FILE --input-dir $INPUT_DIR $RUN_FLAGS
 
 
 EOF
-    echo "Submitted job for bin ID: $bin_id"
-done
+        echo "Submitted job for bin ID: $bin_id"
+    done
+    NUM_JOBS=${#BIN_IDS_ARRAY[@]}
+fi
 
 echo ""
 echo "=========================================="
@@ -237,7 +368,7 @@ else
     echo "  Python sys.prefix: $PY_PREFIX"
 fi
 echo "  Scenario: $SCENARIO_NAME"
-echo "  Jobs submitted: ${#BIN_IDS_ARRAY[@]}"
+echo "  Jobs submitted: $NUM_JOBS"
 echo "  Using: new_mb_model (dynamic FESTIM model builder)"
 echo ""
 echo "Monitor jobs with: squeue -u \$USER"
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+List the bins of an input folder whose results are missing or outdated.
+
+A result is up to date when its JSON records the same ``input_hash`` as the
+current inputs of the bin (bin row, material, mesh, scenario, plasma data rows
+and solver settings, see ``input_hashing.result_input_hash``). Results are
+hashed with the run options they record (``--compress-scenario`` and
+``--cycle-acceleration`` of the runner) and without the phase policy when
+their HISP version ignored it. The submitters use this to only submit the bins that need to run.
+
+Usage:
+    python run_on_cluster/stale_bins.py <input_folder> <scenario_folder> <scenario_name> [--bins "1-5, 10"] [-v]
+
+Prints the stale bin IDs on stdout, separated by spaces.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+hisp_src = os.path.abspath(os.path.join(parent_dir, "hisp", "src"))
+if hisp_src not in sys.path:
+    sys.path.insert(0, hisp_src)
+
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+from input_hashing import result_input_hash
+from output_policy import OutputPolicies
+from phase_policy import PhasePolicy
+from run_bin_functions import (
+    existing_run_record,
+    load_bins_meshes,
+    load_plasma_data_handling,
+    load_scenario_variable,
+    result_paths,
+)
+from pipeline import parse_bin_spec
+
+
+def stale_bins(input_dir, scenario, bins, bins_meshes, plasma_data_handling, verbose=False):
+    """Returns the IDs of the bins whose result is missing or has a different input hash.
+
+    ``scenario`` is the scenario as loaded; it is compressed for the results
+    recording ``compress_scenario``.
+    """
+    stale = []
+    phase_policy = PhasePolicy.from_input_dir(input_dir).record()
+    compressed = None
+    for target_bin in bins:
+        output_file, _ = result_paths(input_dir, target_bin)
+        recorded = existing_run_record(output_file)
+        if recorded["compress_scenario"] and compressed is None:
+            compressed = scenario.compress()
+        input_hash = result_input_hash(
+            target_bin,
+            bins_meshes.get(target_bin.bin_id),
+            compressed if recorded["compress_scenario"] else scenario,
+            plasma_data_handling,
+            target_bin.coolant_temp,
+            output_policy=OutputPolicies.for_bin(target_bin, input_dir).record(),
+            cycle_acceleration=recorded["cycle_acceleration"],
+            phase_policy=None if recorded["phase_policy_ignored"] else phase_policy,
+        )
+        if recorded["input_hash"] != input_hash:
+            stale.append(target_bin.bin_id)
+            if verbose:
+                reason = "missing" if recorded["input_hash"] is None else "inputs changed"
+                print(f"  bin {target_bin.bin_id}: {reason}", file=sys.stderr)
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List bins whose results are missing or outdated")
+    parser.add_argument("input_folder", help="Input folder (input_table.csv, materials.csv, mesh.py)")
+    parser.add_argument("scenario_folder", help="Scenario folder path")
+    parser.add_argument("scenario_name", help="Scenario name")
+    parser.add_argument("--csv-file", dest="csv_file", default=None,
+                        help="Input table (default: <input_folder>/input_table.csv)")
+    parser.add_argument("--bins", default=None, help='Bin specification, e.g. "1-5, 10" (default: all bins)')
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print the reason of each stale bin on stderr")
+    args = parser.parse_args()
+
+    input_dir = args.input_folder
+    # progress messages of the loaders go to stderr, stdout only carries the bin IDs
+    with contextlib.redirect_stdout(sys.stderr):
+        scenario = load_scenario_variable(args.scenario_folder, args.scenario_name)
+        if scenario is None:
+            sys.exit(1)
+
+        # same materials as the runner: materials.csv of the input folder if present
+        csv_file = args.csv_file or os.path.join(input_dir, "input_table.csv")
+        materials_path = None
+        if input_dir and input_dir != "input_files":
+            materials_in_dir = os.path.join(input_dir, "materials.csv")
+            if os.path.exists(materials_in_dir):
+                materials_path = materials_in_dir
+        reactor = CSVBinLoader(csv_file, materials_csv_path=materials_path).load_reactor()
+        bins = reactor.bins
+        if args.bins:
+            selected = set(parse_bin_spec(args.bins))
+            bins = [b for b in bins if b.bin_id in selected]
+
+        stale = stale_bins(
+            input_dir,
+            scenario,
+            bins,
+            load_bins_meshes(input_dir, reactor, [b.bin_id for b in bins]),
+            load_plasma_data_handling(scenario),
+            verbose=args.verbose,
+        )
+    print(f"{len(stale)}/{len(bins)} bins to run", file=sys.stderr)
+    print(" ".join(str(bin_id) for bin_id in stale))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+"""
+Surrogate inventory model trained on completed bin runs.
+
+Answers what-if questions ("flux scaling 0.4 in FPO3?") in seconds instead of
+running FESTIM for every bin. A bootstrap ensemble of quadratic ridge
+regressions (numpy only) predicts log10 of the inventory per m² of a bin at
+the end of every scenario phase from:
+
+- bin features of input_table.csv (thickness, Cu thickness, ion scaling
+  factor, location, mode, boundary condition) and the bin's FP plasma data
+  (ion/atom flux and heat)
+- material features of materials.csv (D0, E_D, K_R, E_R, trap densities and
+  detrapping energies)
+- scenario features up to the phase end (time, T and D fluence factors,
+  plasma and baking time, time since the last plasma pulse)
+
+Uncertainty combines the spread of the ensemble with the out-of-bag residual
+of the fit. Bins whose prediction is uncertain (standard deviation above
+``--threshold`` decades) or outside the training range are listed as the
+bins worth running with FESTIM.
+
+Usage:
+    python run_on_cluster/surrogate.py train surrogate.json <input_folder> [<input_folder> ...] [--species T]
+        [--scenario <scenario_name>]
+    python run_on_cluster/surrogate.py predict surrogate.json <input_folder> <scenario_folder> <scenario_name>
+        [--threshold 0.2] [--output predictions.csv]
+
+Training folders are completed runs (input_table.csv, materials.csv, the
+scenario .py and results_<folder>/; ``--scenario`` names the scenario when a
+folder holds several), e.g. the variants of a sweep
+(run_on_cluster/sweep.py). ``predict`` prints the reactor inventory at every
+phase end with a 95% band and the bins recommended for FESTIM, separated by
+spaces as in the submitters' bin specification.
+"""
+
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+from run_bin_functions import load_plasma_data_handling, load_scenario_variable
+
+AVOGADRO = 6.02214076e23  # atoms/mol
+TRITIUM_MASS = 3.0160492  # g/mol
+DEUTERIUM_MASS = 2.0141018  # g/mol
+
+# Pulse types without incident particle flux
+NO_FLUX_PULSES = ("BAKE",)
+
+
+def _log(x: float, floor: float = 1e-30) -> float:
+    return float(np.log10(max(float(x), floor)))
+
+
+def log_inventory(inventory: float) -> float:
+    """Regression target of an inventory per m²: log10, floored at 1 particle/m²."""
+    return _log(inventory, 1.0)
+
+
+def inventory_from_log(y):
+    """Inverse of ``log_inventory`` (inventories below the floor come back as 1 particle/m²)."""
+    return 10.0 ** np.asarray(y)
+
+
+def bin_features(bin, plasma_data_handling) -> Dict[str, float]:
+    """Features of a bin row, its material and its FP plasma data row."""
+    material = bin.material
+    trap_densities = [trap.Trap_density for trap in material.traps]
+    total_density = sum(trap_densities)
+    detrapping = [trap.E_p or 0.0 for trap in material.traps]
+    features = {
+        "log_thickness": _log(bin.thickness),
+        "log_cu_thickness": _log(bin.cu_thickness, 1e-6),
+        "log_ion_scaling": _log(bin.ion_scaling_factor, 1e-6),
+        "coolant_temp": float(bin.coolant_temp),
+        "divertor": float(bin.is_divertor),
+        "shadowed": float(bin.is_shadowed),
+        "dirichlet_bc": float(bin.bin_configuration.bc_plasma_facing_surface.lower().startswith("dirichlet")),
+        "log_D0": _log(material.D0),
+        "E_D": float(material.E_D),
+        "log_K_R": _log(material.K_R or 0.0),
+        "E_R": float(material.E_R or 0.0),
+        "log_trap_density": _log(total_density, 1e-12),
+        "mean_E_p": float(np.dot(trap_densities, detrapping) / total_density) if total_density > 0 else 0.0,
+        "max_E_p": max(detrapping, default=0.0),
+        "n_traps": float(len(material.traps)),
+    }
+    fp_data = getattr(plasma_data_handling, "pulse_type_to_data", {}).get("FP")
+    for name, column in (("log_flux_ion", "Flux_Ion"), ("log_flux_atom", "Flux_Atom"), ("log_heat", "heat_total")):
+        value = 0.0
+        if fp_data is not None and column in fp_data and bin.bin_number in fp_data.index:
+            value = float(fp_data[column][bin.bin_number])
+        features[name] = _log(value, 1.0)
+    return features
+
+
+def phase_ends(scenario) -> List[Tuple[int, float]]:
+    """(row index, time) at the end of every phase of a scenario."""
+    return [(row, scenario.get_time_till_row(row)) for row in scenario.phase_boundaries()]
+
+
+def scenario_features(scenario, end_row: int) -> Dict[str, float]:
+    """Summary of the scenario rows before ``end_row``."""
+    t = 0.0
+    fluence_T = fluence_D = plasma_time = bake_time = heat_time = 0.0
+    last_plasma_end = 0.0
+    last_type = None
+    for pulse in scenario.pulses[:end_row]:
+        duration = pulse.nb_pulses * pulse.total_duration
+        if pulse.pulse_type in NO_FLUX_PULSES:
+            bake_time += duration
+        else:
+            on_time = pulse.nb_pulses * pulse.duration_no_waiting
+            plasma_time += on_time
+            fluence_T += on_time * pulse.flux_scaling * pulse.tritium_fraction
+            fluence_D += on_time * pulse.flux_scaling * (1 - pulse.tritium_fraction)
+            heat_time += on_time * pulse.heat_scaling
+            last_plasma_end = t + duration - pulse.waiting
+        t += duration
+        last_type = pulse.pulse_type
+    return {
+        "log_t": _log(t, 1.0),
+        "log_fluence_T": _log(fluence_T, 1.0),
+        "log_fluence_D": _log(fluence_D, 1.0),
+        "log_plasma_time": _log(plasma_time, 1.0),
+        "log_bake_time": _log(bake_time, 1.0),
+        "log_time_since_plasma": _log(t - last_plasma_end, 1.0),
+        "mean_heat_scaling": heat_time / plasma_time if plasma_time > 0 else 0.0,
+        "ends_with_bake": float(last_type in NO_FLUX_PULSES),
+    }
+
+
+def find_scenario(input_dir: str, scenario_name: Optional[str] = None) -> Tuple[str, str]:
+    """(scenario folder, scenario name) of an input folder.
+
+    ``scenario_name`` is looked up in the folder; without it the folder must
+    hold a single .py file other than mesh.py, since training on the wrong
+    scenario would silently pair results with other phase ends.
+    """
+    if scenario_name is not None:
+        if not os.path.exists(os.path.join(input_dir, f"{scenario_name}.py")):
+            raise FileNotFoundError(f"Scenario '{scenario_name}.py' not found in '{input_dir}'")
+        return input_dir, scenario_name
+    candidates = sorted(
+        f for f in glob.glob(os.path.join(input_dir, "*.py")) if os.path.basename(f) != "mesh.py"
+    )
+    if not candidates:
+        raise FileNotFoundError(f"No scenario .py file found in '{input_dir}' (excluding mesh.py)")
+    if len(candidates) > 1:
+        names = [os.path.basename(f) for f in candidates]
+        raise ValueError(f"Several scenario candidates in '{input_dir}': {names}, pass --scenario")
+    return input_dir, os.path.splitext(os.path.basename(candidates[0]))[0]
+
+
+def load_inputs(input_dir: str, scenario_folder: Optional[str] = None, scenario_name: Optional[str] = None):
+    """Reactor, scenario and plasma data of an input folder (loader messages go to stderr).
+
+    Without ``scenario_folder``, the scenario is looked up in the input folder
+    (see ``find_scenario``).
+    """
+    if scenario_folder is None:
+        scenario_folder, scenario_name = find_scenario(input_dir, scenario_name)
+    with contextlib.redirect_stdout(sys.stderr):
+        scenario = load_scenario_variable(scenario_folder, scenario_name)
+        if scenario is None:
+            raise FileNotFoundError(f"Scenario '{scenario_name}' could not be loaded from {scenario_folder}")
+        reactor = CSVBinLoader(
+            os.path.join(input_dir, "input_table.csv"), materials_csv_path=os.path.join(input_dir, "materials.csv")
+        ).load_reactor()
+        plasma_data_handling = load_plasma_data_handling(scenario)
+    return reactor, scenario, plasma_data_handling
+
+
+def training_samples(input_dir: str, species: str = "T",
+                     scenario_name: Optional[str] = None) -> Tuple[List[Dict[str, float]], List[float]]:
+    """Features and log10 inventories per m² (``log_inventory``) at every phase end of the completed bins of a folder.
+
+    ``scenario_name`` is the scenario file of the folder the results were run with (see ``find_scenario``).
+    """
+    from plotting.pyramids import result_series
+
+    reactor, scenario, plasma_data_handling = load_inputs(input_dir, scenario_name=scenario_name)
+    folder_name = os.path.basename(os.path.normpath(input_dir))
+    ends = [(row, t_end, scenario_features(scenario, row)) for row, t_end in phase_ends(scenario)]
+    features, targets = [], []
+    for path in sorted(glob.glob(os.path.join(input_dir, f"results_{folder_name}", "*.json"))):
+        with open(path, "r") as f:
+            data = json.load(f)
+        bin = reactor.bins_by_id.get(data.get("bin_id"))
+        if bin is None or not data.get("t"):
+            continue
+        t = np.asarray(data["t"], dtype=float)
+        inventory = result_series(data)[f"total_{species}"]
+        row_features = bin_features(bin, plasma_data_handling)
+        for _, t_end, summary in ends:
+            if t_end > t[-1] * (1 + 1e-9):
+                break  # result does not cover this phase
+            i = max(int(np.searchsorted(t, t_end, side="right")) - 1, 0)
+            features.append({**row_features, **summary})
+            targets.append(log_inventory(inventory[i]))
+    return features, targets
+
+
+@dataclass
+class Surrogate:
+    """Bootstrap ensemble of ridge regressions on standardised features and their squares."""
+
+    feature_names: List[str]
+    mean: List[float]
+    scale: List[float]
+    z_min: List[float]
+    z_max: List[float]
+    coefficients: List[List[float]]
+    residual_std: float
+    alpha: float = 1.0
+    species: str = "T"
+    n_samples: int = 0
+
+    @staticmethod
+    def _design(z: np.ndarray) -> np.ndarray:
+        return np.hstack([np.ones((len(z), 1)), z, z ** 2])
+
+    def _standardise(self, X: np.ndarray) -> np.ndarray:
+        return (X - np.asarray(self.mean)) / np.asarray(self.scale)
+
+    @classmethod
+    def fit(cls, features: List[Dict[str, float]], targets: List[float], alpha: float = 1.0,
+            n_members: int = 32, seed: Optional[int] = 0, species: str = "T") -> "Surrogate":
+        names = sorted(features[0])
+        X = np.array([[f[name] for name in names] for f in features], dtype=float)
+        y = np.asarray(targets, dtype=float)
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        z = (X - mean) / scale
+        A = cls._design(z)
+        penalty = alpha * np.eye(A.shape[1])
+        penalty[0, 0] = 0.0  # intercept is not penalised
+
+        rng = np.random.default_rng(seed)
+        n = len(y)
+        coefficients = []
+        oob_sum, oob_count = np.zeros(n), np.zeros(n)
+        for _ in range(n_members):
+            sample = rng.integers(0, n, n)
+            A_s, y_s = A[sample], y[sample]
+            coef = np.linalg.solve(A_s.T @ A_s + penalty, A_s.T @ y_s)
+            coefficients.append(coef)
+            out_of_bag = np.setdiff1d(np.arange(n), sample)
+            oob_sum[out_of_bag] += A[out_of_bag] @ coef
+            oob_count[out_of_bag] += 1
+        covered = oob_count > 0
+        if covered.any():
+            residuals = y[covered] - oob_sum[covered] / oob_count[covered]
+        else:
+            residuals = y - A @ np.mean(coefficients, axis=0)
+        return cls(
+            feature_names=names,
+            mean=mean.tolist(),
+            scale=scale.tolist(),
+            z_min=z.min(axis=0).tolist(),
+            z_max=z.max(axis=0).tolist(),
+            coefficients=np.array(coefficients).tolist(),
+            residual_std=float(np.sqrt(np.mean(residuals ** 2))),
+            alpha=alpha,
+            species=species,
+            n_samples=n,
+        )
+
+    @classmethod
+    def from_json(cls, path: str) -> "Surrogate":
+        with open(path, "r") as f:
+            return cls(**json.load(f))
+
+    def to_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(asdict(self), f)
+
+    def member_predictions(self, features: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (predictions of every member [members, samples], outside-training-range flags)."""
+        X = np.array([[f[name] for name in self.feature_names] for f in features], dtype=float)
+        z = self._standardise(X)
+        margin = 0.1 * (np.asarray(self.z_max) - np.asarray(self.z_min))
+        outside = ((z < np.asarray(self.z_min) - margin) | (z > np.asarray(self.z_max) + margin)).any(axis=1)
+        return np.asarray(self.coefficients) @ self._design(z).T, outside
+
+    def predict(self, features: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns (mean log10 inventory per m², standard deviation in decades, outside-range flags)."""
+        members, outside = self.member_predictions(features)
+        std = np.sqrt(members.var(axis=0) + self.residual_std ** 2)
+        return members.mean(axis=0), std, outside
+
+
+def reactor_totals(members: np.ndarray, areas: np.ndarray, residual_std: float, n_draws: int = 500,
+                   seed: Optional[int] = 0) -> Tuple[float, float, float]:
+    """Median and 95% band of the area-weighted total of per-bin log10 predictions (particles).
+
+    Draws pick an ensemble member and add independent residual noise per bin.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, members.shape[0], n_draws)
+    noise = rng.normal(0.0, residual_std, (n_draws, members.shape[1]))
+    totals = (inventory_from_log(members[picks] + noise) * areas).sum(axis=1)
+    low, median, high = np.percentile(totals, [2.5, 50, 97.5])
+    return float(median), float(low), float(high)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Surrogate inventory model trained on completed bin runs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="Fit the surrogate on completed input folders")
+    train.add_argument("model", help="Output model file (JSON)")
+    train.add_argument("input_folders", nargs="+", help="Input folders with results_<folder>/")
+    train.add_argument("--species", choices=["T", "D"], default="T")
+    train.add_argument("--scenario", default=None,
+                       help="Scenario name (.py file in every input folder) the results were run with. "
+                            "Default: the single scenario file of each folder")
+    train.add_argument("--alpha", type=float, default=1.0, help="Ridge regularisation (default: 1.0)")
+    train.add_argument("--members", type=int, default=32, help="Bootstrap ensemble size (default: 32)")
+    predict = subparsers.add_parser("predict", help="Predict the reactor inventory of a scenario")
+    predict.add_argument("model", help="Model file written by train")
+    predict.add_argument("input_folder", help="Input folder (input_table.csv, materials.csv)")
+    predict.add_argument("scenario_folder", help="Scenario folder path")
+    predict.add_argument("scenario_name", help="Scenario name")
+    predict.add_argument("--threshold", type=float, default=0.2,
+                         help="Standard deviation (decades) above which FESTIM is recommended (default: 0.2)")
+    predict.add_argument("--output", default=None, help="Per-bin predictions CSV")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        features, targets = [], []
+        for input_dir in args.input_folders:
+            folder_features, folder_targets = training_samples(input_dir, args.species, args.scenario)
+            print(f"  {input_dir}: {len(folder_targets)} samples", file=sys.stderr)
+            features += folder_features
+            targets += folder_targets
+        if len(targets) < 2:
+            print("Error: fewer than 2 training samples (no completed results found)", file=sys.stderr)
+            sys.exit(1)
+        model = Surrogate.fit(features, targets, alpha=args.alpha, n_members=args.members, species=args.species)
+        model.to_json(args.model)
+        print(f"✓ Surrogate trained on {model.n_samples} samples, "
+              f"out-of-bag error {model.residual_std:.3f} decades -> {args.model}")
+        return
+
+    model = Surrogate.from_json(args.model)
+    reactor, scenario, plasma_data_handling = load_inputs(args.input_folder, args.scenario_folder, args.scenario_name)
+    bins = reactor.bins
+    areas = np.array([bin.surface_area for bin in bins], dtype=float)
+    row_features = [bin_features(bin, plasma_data_handling) for bin in bins]
+    mass = TRITIUM_MASS if model.species == "T" else DEUTERIUM_MASS
+
+    recommended = set()
+    rows = []
+    print(f"Reactor {model.species} inventory (surrogate, 95% band):")
+    for row, t_end in phase_ends(scenario):
+        summary = scenario_features(scenario, row)
+        features = [{**f, **summary} for f in row_features]
+        members, outside = model.member_predictions(features)
+        mean, std, _ = model.predict(features)
+        median, low, high = reactor_totals(members, areas, model.residual_std)
+        to_grams = mass / AVOGADRO
+        print(f"  t = {t_end:12.0f} s ({scenario.pulses[row - 1].pulse_type:>5}): "
+              f"{median * to_grams:.4g} g  [{low * to_grams:.4g}, {high * to_grams:.4g}]")
+        for bin, mu, sigma, out in zip(bins, mean, std, outside):
+            unsure = bool(sigma > args.threshold or out)
+            if unsure:
+                recommended.add(bin.bin_id)
+            rows.append({
+                "bin_id": bin.bin_id,
+                "bin_number": bin.bin_number,
+                "t": t_end,
+                "inventory_m2": float(inventory_from_log(mu)),
+                "inventory_m2_low": float(inventory_from_log(mu - 2 * sigma)),
+                "inventory_m2_high": float(inventory_from_log(mu + 2 * sigma)),
+                "std_decades": sigma,
+                "outside_training_range": bool(out),
+                "run_festim": unsure,
+            })
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✓ Per-bin predictions written to {args.output}", file=sys.stderr)
+    print(f"{len(recommended)}/{len(bins)} bins recommended for FESTIM (std > {args.threshold} decades "
+          f"or outside the training range): {' '.join(str(bin_id) for bin_id in sorted(recommended))}")
+
+
+if __name__ == "__main__":
+    main()
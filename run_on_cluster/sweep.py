@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+"""
+Parameter sweeps over input_table.csv columns and materials.csv fields.
+
+A sweep specification (JSON) expands a base input folder into one variant
+folder per sample. Variant folders only contain the files the sample changes
+(``input_table.csv`` and/or ``materials.csv``); every other file of the base
+folder (mesh.py, scenario, ...) is a symbolic link to the original.
+
+    {
+        "base": "input_files_example",
+        "output": "sweeps/trap_study",          # default: <base>_sweep
+        "method": "grid",                       # grid, lhs (Latin hypercube) or sobol
+        "samples": 16,                          # lhs/sobol only
+        "seed": 0,
+        "parameters": [
+            {"name": "thickness", "column": "Thickness (m)", "values": [0.004, 0.006]},
+            {"name": "f_ion", "column": "f (ion flux scaling factor)", "bins": "1-5",
+             "min": 0.5, "max": 1.5, "mode": "scale"},
+            {"name": "T_coolant", "column": "Coolant Temp. (K)", "values": [343.0, 373.0]},
+            {"name": "E_D_W", "material": "W", "field": "E_D", "min": 0.2, "max": 0.4, "num": 3},
+            {"name": "trap1_W", "material": "W", "field": "Trap_density", "trap": 1,
+             "min": 1e-5, "max": 1e-3, "scale": "log"}
+        ]
+    }
+
+Parameters either set a column of the input table (optionally only for the
+rows of ``bins``; the coolant temperature is the ``Coolant Temp. (K)`` column,
+added when the base table has none) or a field of a material (``trap``: 1-based trap index of
+the trap fields). ``mode`` is ``set`` (default) or ``scale`` (multiplies the
+base value). Values are given as a ``values`` list or a ``min``/``max`` range
+(``scale``: ``lin`` or ``log``); grids use ``num`` points of a range (default 3),
+Latin hypercube and Sobol samples (scipy.stats.qmc) are mapped onto the range
+or pick from ``values``.
+
+Usage:
+    python run_on_cluster/sweep.py expand <spec.json>
+    python run_on_cluster/sweep.py run <spec.json> [--backend slurm|local] [--workers 4] [--bins "1-5"] [--force]
+    python run_on_cluster/sweep.py collect <spec.json> [--output sweep_results.csv]
+
+``expand`` writes the variant folders and ``<output>/sweep_manifest.csv``
+(one row per variant with its parameter values). ``run`` expands if needed and
+submits every variant with slurm_folder_jobs.sh (or runs the bins locally with
+run_bin_from_folder.py). ``collect`` writes one tidy CSV with a row per
+variant, bin and species: the swept parameters, the bin metadata and the final
+and maximum inventories (per m² and times the bin surface area).
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import glob
+import itertools
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.insert(0, parent_dir)
+
+from pipeline import parse_bin_spec
+
+MANIFEST_FILE = "sweep_manifest.csv"
+METHODS = ("grid", "lhs", "sobol")
+
+
+class SweepParameter:
+    """One swept input (see module docstring for the specification keys)."""
+
+    def __init__(self, spec: dict):
+        self.name = spec.get("name") or spec.get("column") or f"{spec.get('material')}_{spec.get('field')}"
+        self.column = spec.get("column")
+        self.material = spec.get("material")
+        self.field = spec.get("field")
+        self.trap = int(spec.get("trap", 1))
+        self.bins = spec.get("bins")
+        self.mode = spec.get("mode", "set")
+        self.values = spec.get("values")
+        self.min = spec.get("min")
+        self.max = spec.get("max")
+        self.scale = spec.get("scale", "lin")
+        self.num = int(spec.get("num", 3))
+        if (self.column is None) == (self.material is None):
+            raise ValueError(f"Sweep parameter '{self.name}' needs either a 'column' or a 'material' and 'field'")
+        if self.material is not None and self.field is None:
+            raise ValueError(f"Sweep parameter '{self.name}' needs the material 'field' to change")
+        if self.mode not in ("set", "scale"):
+            raise ValueError(f"Sweep parameter '{self.name}': mode must be 'set' or 'scale', got {self.mode}")
+        if self.values is None and (self.min is None or self.max is None):
+            raise ValueError(f"Sweep parameter '{self.name}' needs 'values' or 'min' and 'max'")
+        if self.scale == "log" and self.values is None and min(self.min, self.max) <= 0:
+            raise ValueError(f"Sweep parameter '{self.name}': a log range needs positive bounds")
+
+    def grid_values(self) -> list:
+        if self.values is not None:
+            return list(self.values)
+        if self.scale == "log":
+            return np.geomspace(self.min, self.max, self.num).tolist()
+        return np.linspace(self.min, self.max, self.num).tolist()
+
+    def from_unit(self, u: float):
+        """Maps a sample of [0, 1) onto the parameter values."""
+        if self.values is not None:
+            return self.values[min(int(u * len(self.values)), len(self.values) - 1)]
+        if self.scale == "log":
+            return float(np.exp(np.log(self.min) + u * (np.log(self.max) - np.log(self.min))))
+        return float(self.min + u * (self.max - self.min))
+
+
+def _unit_samples(method: str, n_dims: int, n_samples: int, seed: Optional[int]) -> np.ndarray:
+    from scipy.stats import qmc
+
+    if method == "lhs":
+        sampler = qmc.LatinHypercube(d=n_dims, seed=seed)
+    else:
+        sampler = qmc.Sobol(d=n_dims, scramble=True, seed=seed)
+    return sampler.random(n_samples)
+
+
+class SweepSpec:
+    """A sweep specification file and the variants it expands to."""
+
+    def __init__(self, spec: dict, spec_dir: str = "."):
+        self.base = os.path.normpath(os.path.join(spec_dir, spec["base"]))
+        self.output = os.path.normpath(os.path.join(spec_dir, spec.get("output", f"{self.base}_sweep")))
+        self.method = spec.get("method", "grid")
+        if self.method not in METHODS:
+            raise ValueError(f"Unknown sweep method '{self.method}', expected one of {METHODS}")
+        self.samples = int(spec.get("samples", 8))
+        self.seed = spec.get("seed")
+        self.parameters = [SweepParameter(p) for p in spec["parameters"]]
+        names = [p.name for p in self.parameters]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Sweep parameter names must be unique, got {names}")
+        self.name = os.path.basename(self.output)
+
+    @classmethod
+    def from_file(cls, path) -> "SweepSpec":
+        with open(path, "r") as f:
+            return cls(json.load(f), os.path.dirname(os.path.abspath(path)))
+
+    def points(self) -> List[Dict[str, float]]:
+        """Parameter values of every variant (name -> value)."""
+        if self.method == "grid":
+            combos = itertools.product(*(p.grid_values() for p in self.parameters))
+            return [dict(zip((p.name for p in self.parameters), combo)) for combo in combos]
+        unit = _unit_samples(self.method, len(self.parameters), self.samples, self.seed)
+        return [{p.name: p.from_unit(u) for p, u in zip(self.parameters, row)} for row in unit]
+
+    def variant_dir(self, index: int) -> str:
+        return os.path.join(self.output, f"{self.name}_{index:03d}")
+
+
+def _format(value) -> str:
+    return repr(float(value))
+
+
+def apply_table_parameter(table: pd.DataFrame, parameter: SweepParameter, value):
+    """Sets (or scales) a column of the input table, read with ``dtype=str``."""
+    if parameter.bins:
+        rows = [bin_id - 1 for bin_id in parse_bin_spec(parameter.bins) if 0 < bin_id <= len(table)]
+    else:
+        rows = list(range(len(table)))
+    if parameter.column not in table.columns:
+        if parameter.mode == "scale":
+            raise ValueError(f"Cannot scale column '{parameter.column}': not in the input table")
+        table[parameter.column] = ""
+    for row in rows:
+        cell = table.iat[row, table.columns.get_loc(parameter.column)]
+        new_value = float(cell) * value if parameter.mode == "scale" else value
+        table.iat[row, table.columns.get_loc(parameter.column)] = _format(new_value)
+
+
+def apply_material_parameter(cells: pd.DataFrame, parameter: SweepParameter, value):
+    """Sets (or scales) a field of a material in the raw cells of a (key, value) block materials.csv."""
+    header = [str(v).strip().lower() for v in cells.iloc[0]]
+    block = None
+    for col, key in enumerate(header):
+        if key in ("material_name", "material name") and col + 1 < cells.shape[1]:
+            if str(cells.iat[0, col + 1]).strip().lower() == parameter.material.lower():
+                block = col
+                break
+    if block is None:
+        raise ValueError(f"Material '{parameter.material}' not found in the (key, value) blocks of materials.csv")
+    matches = [
+        r for r in range(cells.shape[0]) if str(cells.iat[r, block]).strip().lower() == parameter.field.lower()
+    ]
+    if len(matches) < parameter.trap:
+        raise ValueError(
+            f"Field '{parameter.field}' (occurrence {parameter.trap}) not found for material '{parameter.material}'"
+        )
+    row = matches[parameter.trap - 1]
+    new_value = float(cells.iat[row, block + 1]) * value if parameter.mode == "scale" else value
+    cells.iat[row, block + 1] = _format(new_value)
+
+
+def expand(spec: SweepSpec, force: bool = False) -> List[dict]:
+    """Writes the variant folders and the manifest; returns the manifest rows.
+
+    Existing variant files are only rewritten when their content changes, so
+    the input hashes (and results) of unchanged variants stay valid.
+    """
+    table_parameters = [p for p in spec.parameters if p.column is not None]
+    material_parameters = [p for p in spec.parameters if p.material is not None]
+    base_table = pd.read_csv(os.path.join(spec.base, "input_table.csv"), dtype=str, keep_default_na=False)
+    base_materials = pd.read_csv(
+        os.path.join(spec.base, "materials.csv"), header=None, dtype=str, keep_default_na=False
+    )
+    generated = set()
+    if table_parameters:
+        generated.add("input_table.csv")
+    if material_parameters:
+        generated.add("materials.csv")
+    linked = [
+        name for name in sorted(os.listdir(spec.base))
+        if os.path.isfile(os.path.join(spec.base, name)) and not name.startswith(".") and name not in generated
+        and not name.endswith(".parsed.json")
+    ]
+
+    manifest = []
+    for index, point in enumerate(spec.points()):
+        variant_dir = spec.variant_dir(index)
+        os.makedirs(variant_dir, exist_ok=True)
+        for name in linked:
+            link = os.path.join(variant_dir, name)
+            target = os.path.relpath(os.path.join(spec.base, name), variant_dir)
+            if os.path.islink(link) and os.readlink(link) == target:
+                continue
+            if os.path.lexists(link):
+                os.remove(link)
+            os.symlink(target, link)
+
+        if table_parameters:
+            table = base_table.copy()
+            for parameter in table_parameters:
+                apply_table_parameter(table, parameter, point[parameter.name])
+            _write_if_changed(os.path.join(variant_dir, "input_table.csv"), table.to_csv(index=False), force)
+        if material_parameters:
+            cells = base_materials.copy()
+            for parameter in material_parameters:
+                apply_material_parameter(cells, parameter, point[parameter.name])
+            _write_if_changed(
+                os.path.join(variant_dir, "materials.csv"), cells.to_csv(header=False, index=False), force
+            )
+        manifest.append(dict(variant=os.path.basename(variant_dir), **point))
+
+    with open(os.path.join(spec.output, MANIFEST_FILE), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["variant"] + [p.name for p in spec.parameters])
+        writer.writeheader()
+        writer.writerows(manifest)
+    print(f"✓ {len(manifest)} variants of {spec.base} in {spec.output} ({spec.method})")
+    return manifest
+
+
+def _write_if_changed(path: str, content: str, force: bool = False):
+    if not force and os.path.exists(path) and not os.path.islink(path):
+        with open(path, "r") as f:
+            if f.read() == content:
+                return
+    if os.path.lexists(path):
+        os.remove(path)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def read_manifest(spec: SweepSpec) -> List[dict]:
+    with open(os.path.join(spec.output, MANIFEST_FILE), "r", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _run_command(command: List[str]) -> int:
+    return subprocess.run(command, cwd=parent_dir).returncode
+
+
+def run(spec: SweepSpec, backend: str = "slurm", workers: int = 1, bins: Optional[str] = None, force: bool = False) -> bool:
+    """Runs every variant with the folder runners; returns False if a submission or run failed.
+
+    ``force`` (slurm backend) also resubmits bins whose results are up to date.
+    """
+    manifest = expand(spec)
+    variant_dirs = [os.path.join(spec.output, row["variant"]) for row in manifest]
+    if backend == "slurm":
+        ok = True
+        for variant_dir in variant_dirs:
+            command = ["bash", "run_on_cluster/slurm_folder_jobs.sh"] + (["--force"] if force else []) + [variant_dir]
+            if bins:
+                command.append(bins)
+            ok = _run_command(command) == 0 and ok
+        return ok
+
+    commands = []
+    for variant_dir in variant_dirs:
+        n_rows = len(pd.read_csv(os.path.join(variant_dir, "input_table.csv")))
+        bin_ids = parse_bin_spec(bins) if bins else range(1, n_rows + 1)
+        for bin_id in bin_ids:
+            commands.append([sys.executable, "-s", "run_on_cluster/run_bin_from_folder.py", variant_dir, str(bin_id)])
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for command, code in zip(commands, pool.map(_run_command, commands)):
+            status = "DONE" if code == 0 else "FAIL"
+            failed += code != 0
+            print(f"[{status}] {' '.join(command[3:])}")
+    return failed == 0
+
+
+def collect(spec: SweepSpec) -> pd.DataFrame:
+    """Tidy table of the results of every variant (see module docstring)."""
+    from plotting.pyramids import result_series
+
+    rows = []
+    for entry in read_manifest(spec):
+        variant = entry["variant"]
+        parameters = {name: float(value) if _is_number(value) else value for name, value in entry.items() if name != "variant"}
+        variant_dir = os.path.join(spec.output, variant)
+        for path in sorted(glob.glob(os.path.join(variant_dir, f"results_{variant}", "*.json"))):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if not data.get("t"):
+                print(f"[WARN] Skipping {path}: missing 't' array.")
+                continue
+            series = result_series(data)
+            area = data.get("surface_area")
+            for species in ("T", "D"):
+                inventory = series[f"total_{species}"]
+                rows.append(dict(
+                    variant=variant,
+                    **parameters,
+                    bin_id=data.get("bin_id"),
+                    bin_number=data.get("bin_number"),
+                    material=data.get("material"),
+                    mode=data.get("mode"),
+                    location=data.get("location"),
+                    surface_area=area,
+                    species=species,
+                    t_end=data["t"][-1],
+                    final_inventory_m2=inventory[-1],
+                    max_inventory_m2=inventory.max(),
+                    final_inventory=inventory[-1] * area if area is not None else np.nan,
+                ))
+    table = pd.DataFrame(rows)
+    if len(table):
+        table = table.set_index(["variant"] + [p.name for p in spec.parameters] + ["bin_id", "species"])
+    return table
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweeps over input folders")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("expand", "run", "collect"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("spec", help="Sweep specification (JSON)")
+        if name == "expand":
+            sub.add_argument("--force", action="store_true", help="Rewrite variant files even if unchanged")
+        if name == "run":
+            sub.add_argument("--backend", choices=["slurm", "local"], default="slurm")
+            sub.add_argument("--workers", type=int, default=1, help="Local backend: number of parallel bins")
+            sub.add_argument("--bins", default=None, help='Bin specification, e.g. "1-5, 10" (default: all bins)')
+            sub.add_argument("--force", action="store_true", help="Slurm backend: rerun bins whose results are up to date")
+        if name == "collect":
+            sub.add_argument("--output", default=None,
+                             help="Output CSV (default: <sweep output>/sweep_results.csv)")
+    args = parser.parse_args()
+
+    spec = SweepSpec.from_file(args.spec)
+    if args.command == "expand":
+        expand(spec, force=args.force)
+    elif args.command == "run":
+        if not run(spec, backend=args.backend, workers=args.workers, bins=args.bins, force=args.force):
+            sys.exit(1)
+    else:
+        table = collect(spec)
+        output = args.output or os.path.join(spec.output, "sweep_results.csv")
+        table.to_csv(output)
+        print(f"✓ {len(table)} rows written to {output}")
+
+
+if __name__ == "__main__":
+    main()
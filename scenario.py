@@ -1,7 +1,13 @@
 import pandas as pd
-from typing import List
+from bisect import bisect_right
+from itertools import accumulate
+from math import ceil
+from typing import Iterator, List
 import warnings
 
+# Pulse fields that set the timing of a scenario (pulse_type: RISP defaults, see ``Pulse.total_duration``)
+TIMING_FIELDS = frozenset(("pulse_type", "nb_pulses", "ramp_up", "steady_state", "ramp_down", "waiting"))
+
 
 class Pulse:
     pulse_type: str
@@ -11,6 +17,9 @@ class Pulse:
     ramp_down: float
     waiting: float
 
+    # incremented whenever a timing field of any pulse is set (see ``Scenario._cumulative_times``)
+    timing_revision = 0
+
     def __init__(
         self,
         pulse_type: str,
@@ -33,6 +42,11 @@ class Pulse:
         self.heat_scaling = heat_scaling
         self.flux_scaling = flux_scaling
 
+    def __setattr__(self, name, value):
+        if name in TIMING_FIELDS:
+            Pulse.timing_revision += 1
+        super().__setattr__(name, value)
+
     @property
     def total_duration(self) -> float:
         all_zeros = (
@@ -57,6 +71,55 @@ class Pulse:
     def duration_no_waiting(self) -> float:
         return self.total_duration - self.waiting
 
+    @property
+    def milestones(self) -> List[float]:
+        """Returns the waveform breakpoints of a single pulse, relative to its start.
+
+        These are the ramp-up start, flat-top start, flat-top end (ramp-down start),
+        ramp-down end and waiting end. Zero-length segments give repeated values.
+        """
+        # total_duration first: it sets the durations of all-zero RISP pulses
+        total_duration = self.total_duration
+        flat_top_start = self.ramp_up
+        flat_top_end = flat_top_start + self.steady_state
+        ramp_down_end = flat_top_end + self.ramp_down
+        return [0.0, flat_top_start, flat_top_end, ramp_down_end, total_duration]
+
+    def is_identical(self, other: "Pulse", rtol: float = 0.0) -> bool:
+        """Checks whether two pulses only differ by their number of repetitions.
+
+        Args:
+            other: the pulse to compare with
+            rtol: relative tolerance on the numerical parameters (0 for exact equality)
+
+        Returns:
+            True if both pulses produce the same waveform for a single repetition
+        """
+        mine, theirs = self.to_dict(), other.to_dict()
+        for key, value in mine.items():
+            if key == "nb_pulses":
+                continue
+            if isinstance(value, str) or isinstance(theirs[key], str):
+                if value != theirs[key]:
+                    return False
+            elif abs(value - theirs[key]) > rtol * max(abs(value), abs(theirs[key])):
+                return False
+        return True
+
+    def to_dict(self) -> dict:
+        """Returns the pulse parameters as a plain dictionary (one row of a scenario file)."""
+        return {
+            "pulse_type": self.pulse_type,
+            "nb_pulses": self.nb_pulses,
+            "ramp_up": self.ramp_up,
+            "steady_state": self.steady_state,
+            "ramp_down": self.ramp_down,
+            "waiting": self.waiting,
+            "tritium_fraction": self.tritium_fraction,
+            "heat_scaling": self.heat_scaling,
+            "flux_scaling": self.flux_scaling,
+        }
+
 
 class Scenario:
     def __init__(self, pulses: List[Pulse] = None):
@@ -66,30 +129,193 @@ class Scenario:
             pulses: The list of pulses in the scenario. Each pulse is a Pulse object.
         """
         self._pulses = pulses if pulses is not None else []
+        self._row_times = None
+        self._row_times_revision = None
 
     @property
     def pulses(self) -> List[Pulse]:
         return self._pulses
 
+    def _cumulative_times(self) -> List[float]:
+        """Returns the start time of every row followed by the maximum time.
+
+        The list is cached; it is rebuilt when rows are added or removed and
+        when the number of repetitions or a duration of any pulse is set.
+        """
+        if (
+            self._row_times is None
+            or len(self._row_times) != len(self._pulses) + 1
+            or self._row_times_revision != Pulse.timing_revision
+        ):
+            durations = [pulse.nb_pulses * pulse.total_duration for pulse in self._pulses]
+            self._row_times = list(accumulate(durations, initial=0.0))
+            # read after the durations, which may set the defaults of RISP pulses
+            self._row_times_revision = Pulse.timing_revision
+        return self._row_times
+
     def to_txt_file(self, filename: str):
-        df = pd.DataFrame(
-            [
-                {
-                    "pulse_type": pulse.pulse_type,
-                    "nb_pulses": pulse.nb_pulses,
-                    "ramp_up": pulse.ramp_up,
-                    "steady_state": pulse.steady_state,
-                    "ramp_down": pulse.ramp_down,
-                    "waiting": pulse.waiting,
-                    "tritium_fraction": pulse.tritium_fraction,
-                    "heat_scaling": pulse.heat_scaling,
-                    "flux_scaling": pulse.flux_scaling,
-                }
-                for pulse in self.pulses
-            ]
-        )
+        df = pd.DataFrame([pulse.to_dict() for pulse in self.pulses])
         df.to_csv(filename, index=False)
 
+    def _copy_with_pulses(self, pulses: List[Pulse]) -> "Scenario":
+        """Returns a new Scenario with the given pulses, keeping any extra
+        attributes attached to this one (e.g. ``plasma_data_handling``)."""
+        new = Scenario(pulses)
+        for name, value in self.__dict__.items():
+            if name not in ("_pulses", "_row_times", "_row_times_revision"):
+                setattr(new, name, value)
+        return new
+
+    def compress(self, rtol: float = 0.0) -> "Scenario":
+        """Returns an equivalent scenario where adjacent identical pulses are merged.
+
+        Consecutive rows that only differ by ``nb_pulses`` (see ``Pulse.is_identical``)
+        are collapsed into a single periodic block with ``nb_pulses`` summed.
+        The pulses of this scenario are not modified.
+
+        Args:
+            rtol: relative tolerance used to consider two pulses identical.
+                The default (0) only merges exactly identical pulses, which leaves the
+                flux, heat and temperature waveforms unchanged.
+
+        Returns:
+            the compressed scenario
+        """
+        merged: List[Pulse] = []
+        for pulse in self.pulses:
+            if merged and merged[-1].is_identical(pulse, rtol=rtol):
+                merged[-1].nb_pulses += pulse.nb_pulses
+            else:
+                merged.append(Pulse(**pulse.to_dict()))
+        return self._copy_with_pulses(merged)
+
+    def iter_milestones(self, t_start: float = 0.0, t_end: float = None) -> Iterator[float]:
+        """Lazily yields the sorted waveform breakpoints between ``t_start`` and ``t_end``.
+
+        For every repetition of every pulse these are the ramp-up start,
+        flat-top start and end, ramp-down end and waiting end (see ``Pulse.milestones``).
+        Duplicated times (e.g. zero-length ramps, end of a pulse = start of the next) are
+        yielded once. Rows and repetitions before ``t_start`` are skipped without being
+        visited, so a window of a very long scenario is cheap to generate.
+
+        Args:
+            t_start: the first time of interest in seconds (included)
+            t_end: the last time of interest in seconds (included). Defaults to the
+                maximum time of the scenario.
+
+        Yields:
+            milestone times in seconds
+        """
+        row_times = self._cumulative_times()
+        if t_end is None:
+            t_end = row_times[-1]
+        last = None
+        first_row = max(bisect_right(row_times, t_start) - 1, 0)
+        for row in range(first_row, len(self.pulses)):
+            pulse = self.pulses[row]
+            row_start = row_times[row]
+            if row_start > t_end:
+                return
+            duration = pulse.total_duration
+            if duration == 0:
+                continue
+            offsets = pulse.milestones
+            first_repetition = max(int((t_start - row_start) // duration), 0)
+            for i in range(first_repetition, pulse.nb_pulses):
+                pulse_start = row_start + i * duration
+                if pulse_start > t_end:
+                    return
+                for offset in offsets:
+                    t = pulse_start + offset
+                    if t < t_start or (last is not None and t <= last):
+                        continue
+                    if t > t_end:
+                        return
+                    last = t
+                    yield t
+
+    def get_milestones(self) -> List[float]:
+        """Returns the sorted waveform breakpoints of the whole scenario in seconds.
+
+        See ``iter_milestones`` for the list of breakpoints of each pulse.
+
+        Returns:
+            the milestone times in seconds
+        """
+        return list(self.iter_milestones())
+
+    def next_milestone(self, t: float) -> float:
+        """Returns the first waveform breakpoint strictly after ``t``.
+
+        Args:
+            t: the time in seconds
+
+        Returns:
+            the next milestone time in seconds, or the maximum time of the
+            scenario if ``t`` is past the last breakpoint
+        """
+        for milestone in self.iter_milestones(t_start=t):
+            if milestone > t:
+                return milestone
+        return self.get_maximum_time()
+
+    def truncate(self, t_end: float) -> "Scenario":
+        """Returns the beginning of the scenario covering at least ``[0, t_end]``.
+
+        Rows starting after ``t_end`` are dropped and the number of repetitions of
+        the row containing ``t_end`` is reduced, so that only whole pulses are kept.
+
+        Args:
+            t_end: the time in seconds to cover
+
+        Returns:
+            the truncated scenario
+        """
+        row_times = self._cumulative_times()
+        pulses = []
+        for row, pulse in enumerate(self.pulses):
+            row_start = row_times[row]
+            if row_start >= t_end:
+                break
+            nb_pulses = pulse.nb_pulses
+            if pulse.total_duration > 0:
+                nb_pulses = min(nb_pulses, ceil((t_end - row_start) / pulse.total_duration))
+            pulses.append(Pulse(**{**pulse.to_dict(), "nb_pulses": nb_pulses}))
+        return self._copy_with_pulses(pulses)
+
+    def phase_boundaries(self) -> List[int]:
+        """Returns the row indices at which a new phase starts.
+
+        A phase is a maximal run of consecutive rows sharing the same pulse
+        type (e.g. an FPO campaign of FP rows followed by a BAKE row).
+        The returned list always ends with ``len(self.pulses)``.
+
+        Returns:
+            sorted row indices, excluding 0, ending with the number of rows
+        """
+        boundaries = []
+        for i in range(1, len(self.pulses)):
+            if self.pulses[i].pulse_type != self.pulses[i - 1].pulse_type:
+                boundaries.append(i)
+        if self.pulses:
+            boundaries.append(len(self.pulses))
+        return boundaries
+
+    def sub_scenario(self, start_row: int, end_row: int = None) -> "Scenario":
+        """Returns the scenario made of rows ``start_row`` to ``end_row`` (excluded).
+
+        Times in the returned scenario are relative to the start of ``start_row``,
+        i.e. ``self.get_time_till_row(start_row)`` in this scenario.
+
+        Args:
+            start_row: the first row index to keep
+            end_row: the row index to stop at (excluded). Defaults to the last row.
+
+        Returns:
+            the sub-scenario
+        """
+        return self._copy_with_pulses(self.pulses[start_row:end_row])
+
     @staticmethod
     def from_txt_file(filename: str, old_format=False) -> "Scenario":
         if old_format:
@@ -148,19 +374,16 @@ class Scenario:
         Returns:
             the index of the pulse at time t
         """
-        current_time = 0
-        for i, pulse in enumerate(self.pulses):
-            phase_duration = pulse.nb_pulses * pulse.total_duration
-            if t < current_time + phase_duration:
-                return i
-            else:
-                current_time += phase_duration
+        row_times = self._cumulative_times()
+        if t < row_times[-1]:
+            # rows of zero duration share their start time with the next row and are skipped
+            return max(bisect_right(row_times, t) - 1, 0)
 
         warnings.warn(
             f"Time t {t} is out of bounds of the scenario file. Valid times are t < {self.get_maximum_time()}",
             UserWarning,
         )
-        return i
+        return len(self.pulses) - 1
 
     def get_pulse(self, t: float) -> Pulse:
         """
@@ -194,7 +417,7 @@ class Scenario:
         Returns:
             the maximum time of the scenario in seconds
         """
-        return sum([pulse.nb_pulses * pulse.total_duration for pulse in self.pulses])
+        return self._cumulative_times()[-1]
 
     def get_time_start_current_pulse(self, t: float):
         """Returns the time (s) at which the current pulse started.
@@ -206,12 +429,7 @@ class Scenario:
             the time at which the current pulse started
         """
         pulse_index = self.get_row(t)
-        return sum(
-            [
-                pulse.nb_pulses * pulse.total_duration
-                for pulse in self.pulses[:pulse_index]
-            ]
-        )
+        return self._cumulative_times()[pulse_index]
 
     # TODO this is the same as get_time_start_current_pulse, remove
     def get_time_till_row(self, row: int) -> float:
@@ -223,9 +441,7 @@ class Scenario:
         Returns:
             the time until the row in the scenario file
         """
-        return sum(
-            [pulse.nb_pulses * pulse.total_duration for pulse in self.pulses[:row]]
-        )
+        return self._cumulative_times()[min(row, len(self.pulses))]
 
     # TODO remove
     def get_pulse_duration_no_waiting(self, row: int) -> float:
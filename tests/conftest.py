@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# the run_on_cluster and plotting scripts import their siblings as top-level modules
+for path in (ROOT, os.path.join(ROOT, "run_on_cluster"), os.path.join(ROOT, "plotting")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,27 @@
+import pytest
+
+from cost_estimator import fit_pre_runs, pre_run_windows
+
+
+def test_fit_pre_runs_separates_setup_from_steps():
+    # 30 s of setup and 0.5 s per step
+    setup_s, per_step_s = fit_pre_runs([100, 200], [80.0, 130.0])
+    assert setup_s == pytest.approx(30.0)
+    assert per_step_s == pytest.approx(0.5)
+
+
+def test_fit_pre_runs_short_windows_keep_a_time_per_step():
+    # a pre-run shorter than any assumed overhead still gives a non-zero cost per step
+    setup_s, per_step_s = fit_pre_runs([10, 20], [1.0, 2.0])
+    assert setup_s == pytest.approx(0.0, abs=1e-9)
+    assert per_step_s == pytest.approx(0.1)
+
+
+def test_fit_pre_runs_degenerate():
+    assert fit_pre_runs([50, 50], [10.0, 12.0]) == (0.0, pytest.approx(12.0 / 50))
+    # noise making the longer window faster falls back to the longest run
+    assert fit_pre_runs([50, 100], [20.0, 15.0]) == (0.0, pytest.approx(0.15))
+
+
+def test_pre_run_windows():
+    assert pre_run_windows(3600.0) == [1800.0, 3600.0]
@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+from bins_from_csv.csv_bin import Reactor
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "input_files_example")
+
+
+@pytest.fixture
+def reactor():
+    loader = CSVBinLoader(
+        os.path.join(EXAMPLE_DIR, "input_table.csv"),
+        os.path.join(EXAMPLE_DIR, "materials.csv"),
+    )
+    return Reactor(loader.load_all_bins().bins)
+
+
+def test_index_follows_bin_replaced_in_place(reactor):
+    first, second = reactor.bins
+    assert reactor.get_bin_by_id(first.bin_id) is first
+
+    # same list, same length: only the replaced bin changes
+    reactor.bins[0] = second
+    assert reactor.get_bin_by_id(second.bin_id) is second
+    with pytest.raises(ValueError):
+        reactor.get_bin_by_id(first.bin_id)
+    assert reactor.rows([second.bin_id]).tolist() == [0]
+
+
+def test_index_follows_bins_assignment_and_add(reactor):
+    first, second = reactor.bins
+    reactor.bins = [second]
+    assert len(reactor.first_wall_bins) == 1
+    reactor.add_bin(first)
+    assert reactor.get_bin_by_id(first.bin_id) is first
+    assert len(reactor.arrays) == 2
@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from cycle_acceleration import CycleAcceleration, jump_size, run_accelerated
+from scenario import Pulse, Scenario
+from scenario_checkpoints import ChainedSeries
+
+PERIOD = 100.0
+
+
+class FakeNewModel:
+    """NewModel whose bin inventory grows by one per simulated pulse period."""
+
+    built = 0
+
+    def __init__(self, scenario):
+        FakeNewModel.built += 1
+        self.scenario = scenario
+        self.runs = 0
+
+    def run_bin(self, bin, exports=False, initial_state=None):
+        self.runs += 1
+        start = 0.0 if initial_state is None else float(initial_state["T"][0])
+        duration = self.scenario.get_maximum_time()
+        end = start + duration / PERIOD
+        model = SimpleNamespace(species=[SimpleNamespace(name="T", solution=SimpleNamespace(x=SimpleNamespace(array=np.array([end]))))])
+        return model, {"T": ChainedSeries(np.array([0.0, duration]), np.array([start, end]))}
+
+
+def make_scenario(nb_pulses):
+    return Scenario([Pulse("FP", nb_pulses, 10.0, 60.0, 10.0, PERIOD - 80.0, tritium_fraction=0.5)])
+
+
+def test_jump_size():
+    states = [np.array([1.0]), np.array([2.0]), np.array([3.0])]
+    assert jump_size(states, tol=1e-3, max_jump=50, remaining=20) == 20
+    assert jump_size(states, tol=1e-3, max_jump=5, remaining=20) == 5
+    assert jump_size(states[:2], tol=1e-3, max_jump=50, remaining=20) == 0
+
+
+def test_run_accelerated_projects_and_reuses_the_cycle_model():
+    FakeNewModel.built = 0
+    settings = CycleAcceleration(max_jump=20)
+    model, quantities, extrapolated = run_accelerated(FakeNewModel, None, make_scenario(200), settings=settings)
+    # one model for the repeated cycle, not one per simulated cycle
+    assert FakeNewModel.built == 1
+    assert extrapolated and sum(interval["cycles"] for interval in extrapolated) > 100
+    t, data = quantities["T"].t, quantities["T"].data
+    assert t[-1] == pytest.approx(200 * PERIOD)
+    assert data[-1] == pytest.approx(200.0)
+    np.testing.assert_allclose(data, t / PERIOD)
+
+
+def test_short_rows_are_run_in_full():
+    FakeNewModel.built = 0
+    _, quantities, extrapolated = run_accelerated(FakeNewModel, None, make_scenario(5))
+    assert FakeNewModel.built == 1 and extrapolated == []
+    assert quantities["T"].data[-1] == pytest.approx(5.0)
+
+
+def test_requires_initial_state():
+    class NoRestartModel(FakeNewModel):
+        def run_bin(self, bin, exports=False):
+            raise AssertionError("not called")
+
+    with pytest.raises(TypeError):
+        run_accelerated(NoRestartModel, None, make_scenario(50))
+
+
+SATURATION, RATE = 1e20, 0.01
+
+
+class SaturatingNewModel(FakeNewModel):
+    """NewModel whose inventory relaxes towards SATURATION by a fixed fraction per cycle."""
+
+    def run_bin(self, bin, exports=False, initial_state=None):
+        start = 0.0 if initial_state is None else float(initial_state["T"][0])
+        cycles = self.scenario.get_maximum_time() / PERIOD
+        end = SATURATION - (SATURATION - start) * (1 - RATE) ** cycles
+        model = SimpleNamespace(species=[SimpleNamespace(name="T", solution=SimpleNamespace(x=SimpleNamespace(array=np.array([end]))))])
+        duration = self.scenario.get_maximum_time()
+        return model, {"T": ChainedSeries(np.array([0.0, duration]), np.array([start, end]))}
+
+
+def test_run_accelerated_follows_an_analytic_cycle():
+    settings = CycleAcceleration(tol=1e-4, max_jump=20)
+    _, quantities, extrapolated = run_accelerated(SaturatingNewModel, None, make_scenario(300), settings=settings)
+    assert sum(interval["cycles"] for interval in extrapolated) > 100
+    t, data = quantities["T"].t, quantities["T"].data
+    analytic = SATURATION * (1 - (1 - RATE) ** (t / PERIOD))
+    # every projection is within tol; their errors add up over the jumps
+    np.testing.assert_allclose(data, analytic, rtol=len(extrapolated) * settings.tol)
+    assert t[-1] == pytest.approx(300 * PERIOD)
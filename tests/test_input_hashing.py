@@ -0,0 +1,101 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bin_classes import class_key
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+from input_hashing import hash_record, result_input_hash
+from scenario import Pulse, Scenario
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "input_files_example")
+
+
+class PlasmaData:
+    """Plasma data handling with one FP table, no transient pulse types."""
+
+    strike_point = False
+
+    def __init__(self, table):
+        self.pulse_type_to_data = {"FP": table}
+
+    def is_transient(self, pulse_type):
+        return False
+
+
+@pytest.fixture
+def bins():
+    loader = CSVBinLoader(
+        os.path.join(EXAMPLE_DIR, "input_table.csv"), materials_csv_path=os.path.join(EXAMPLE_DIR, "materials.csv")
+    )
+    return loader.load_reactor().bins
+
+
+@pytest.fixture
+def scenario():
+    return Scenario([Pulse("FP", 2, 10.0, 100.0, 10.0, 80.0, tritium_fraction=0.5)])
+
+
+@pytest.fixture
+def plasma_data():
+    # same layout as data/Binned_Flux_Data.dat: a Bin_Index column, indexed by bin number
+    table = pd.DataFrame({"Bin_Index": [0, 1], "flux": [1e20, 2e20], "heat": [1e6, 1e6]}, index=[0, 1])
+    return PlasmaData(table)
+
+
+def test_hash_record_is_canonical():
+    record = {"b": [1, 2.5, (3, 4)], "a": {"x": np.float64(1.5), "y": np.arange(3)}}
+    same = {"a": {"y": [0, 1, 2], "x": 1.5}, "b": [1, 2.5, [3, 4]]}
+    assert hash_record(record) == hash_record(same)
+    assert hash_record(record) != hash_record({**same, "b": [1, 2.5, [3, 5]]})
+    assert hash_record({"v": float("nan")}) == hash_record({"v": float("nan")})
+    assert len(hash_record({})) == 64
+
+
+def test_result_input_hash_optional_records(bins, scenario, plasma_data):
+    base = result_input_hash(bins[0], None, scenario, plasma_data, 343.0)
+    assert base == result_input_hash(bins[0], None, scenario, plasma_data, 343.0, output_policy=None)
+    assert base != result_input_hash(bins[0], None, scenario, plasma_data, 343.0,
+                                     output_policy={"default": "interval:60", "quantities": {}})
+    assert base != result_input_hash(bins[0], None, scenario, plasma_data, 353.0)
+    assert base != result_input_hash(bins[1], None, scenario, plasma_data, 343.0)
+
+
+def test_class_key_ignores_identity_and_area_fields(bins, scenario, plasma_data):
+    original = bins[0]
+    moved = copy.copy(original)
+    moved.bin_number = 1
+    moved.z_start, moved.r_start = 1.0, 2.0
+    # other areas with the same ion scaling factor
+    moved.surface_area *= 2
+    moved.parent_bin_surf_area *= 2
+    table = plasma_data.pulse_type_to_data["FP"]
+    table.loc[1, ["flux", "heat"]] = table.loc[0, ["flux", "heat"]]
+    key = class_key(original, None, scenario, plasma_data, 343.0)
+    assert class_key(moved, None, scenario, plasma_data, 343.0) == key
+    # the result hash still tells them apart
+    assert result_input_hash(moved, None, scenario, plasma_data, 343.0) != result_input_hash(
+        original, None, scenario, plasma_data, 343.0
+    )
+
+
+def test_class_key_depends_on_physics(bins, scenario, plasma_data):
+    original = bins[0]
+    key = class_key(original, None, scenario, plasma_data, 343.0)
+
+    thicker = copy.copy(original)
+    thicker.thickness *= 2
+    assert class_key(thicker, None, scenario, plasma_data, 343.0) != key
+
+    scaled = copy.copy(original)
+    scaled.ion_scaling_factor *= 2
+    assert class_key(scaled, None, scenario, plasma_data, 343.0) != key
+
+    assert class_key(original, np.linspace(0, 1, 5), scenario, plasma_data, 343.0) != key
+    assert class_key(original, None, scenario, plasma_data, 353.0) != key
+    assert class_key(original, None, scenario, plasma_data, 343.0, output_policy={"default": "all"}) != key
+
+    plasma_data.pulse_type_to_data["FP"].loc[0, "flux"] = 5e20
+    assert class_key(original, None, scenario, plasma_data, 343.0) != key
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from output_policy import OutputPolicies, OutputPolicy
+
+
+def test_parse():
+    assert OutputPolicy.parse(None) == OutputPolicy()
+    assert OutputPolicy.parse(" interval:60 ") == OutputPolicy("interval", 60.0)
+    assert str(OutputPolicy.parse("adaptive:1e-4")) == "adaptive:0.0001"
+    for spec in ("bogus:1", "interval:x", "max_points:1", "adaptive:-1"):
+        with pytest.raises(ValueError):
+            OutputPolicy.parse(spec)
+
+
+def test_interval_keeps_first_sample_of_each_interval_and_last():
+    t = np.arange(0.0, 10.5, 0.5)
+    indices = OutputPolicy("interval", 2.0).indices(t, np.zeros_like(t))
+    np.testing.assert_array_equal(t[indices], [0.0, 2.0, 4.0, 6.0, 8.0, 10.0])
+
+
+def test_adaptive_error_bound():
+    t = np.linspace(0.0, 10.0, 2001)
+    values = np.sin(t) + 0.1 * t**2
+    rel = 1e-3
+    indices = OutputPolicy("adaptive", rel).indices(t, values)
+    assert len(indices) < len(t) / 10
+    # every dropped sample is within the tolerance of the interpolation between kept ones
+    tolerance = rel * (values.max() - values.min())
+    assert np.max(np.abs(np.interp(t, t[indices], values[indices]) - values)) <= tolerance
+    assert {0, len(t) - 1, np.argmin(values), np.argmax(values)} <= set(indices)
+
+
+def test_adaptive_keeps_straight_line_ends_only():
+    t = np.linspace(0.0, 1.0, 100)
+    indices = OutputPolicy("adaptive", 1e-6).indices(t, 3.0 * t + 1.0)
+    np.testing.assert_array_equal(indices, [0, 99])
+
+
+def test_union_across_quantities():
+    t = np.linspace(0.0, 100.0, 1001)
+    series = {"T_trap1": np.where(t < 50, 0.0, 1.0), "flux_T": np.zeros_like(t)}
+    policies = OutputPolicies(OutputPolicy("adaptive", 1e-3), {"*flux*": OutputPolicy("interval", 25.0)})
+    indices = policies.indices(t, series)
+    expected = np.union1d(
+        OutputPolicy("adaptive", 1e-3).indices(t, series["T_trap1"]),
+        OutputPolicy("interval", 25.0).indices(t, series["flux_T"]),
+    )
+    np.testing.assert_array_equal(indices, expected)
+    # the step of T_trap1 is kept
+    assert 499 in indices and 500 in indices
+
+
+def test_keep_all_when_one_quantity_keeps_every_sample():
+    t = np.linspace(0.0, 1.0, 50)
+    policies = OutputPolicies(OutputPolicy("interval", 0.5), {"T": OutputPolicy()})
+    np.testing.assert_array_equal(policies.indices(t, {"T": t, "D": t}), np.arange(50))
+
+
+def test_stage_boundaries_and_milestone_edges_are_kept():
+    t = np.array([0.0, 1.0, 2.0, 3.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+    policies = OutputPolicies(OutputPolicy("max_points", 2))
+    indices = policies.indices(t, {"T": np.zeros_like(t)}, keep_times=[5.5])
+    # first and last samples, both samples of the repeated time 3.0 and the samples around 5.5
+    np.testing.assert_array_equal(indices, [0, 3, 4, 6, 7, 9])
+
+
+def test_record():
+    assert OutputPolicies().record() is None
+    policies = OutputPolicies(OutputPolicy("max_points", 20000), {"*flux*": OutputPolicy("interval", 60)})
+    assert policies.record() == {"default": "max_points:20000", "quantities": {"*flux*": "interval:60"}}
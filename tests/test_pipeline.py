@@ -0,0 +1,26 @@
+import os
+
+import pipeline
+
+
+def test_plasma_data_inputs_include_wall_table_and_slices():
+    inputs = pipeline.plasma_data_inputs()
+    assert "data/RISP_Wall_data.dat" in inputs
+    for pulse_type in ("RISP", "ROSP"):
+        slices = [path for path in inputs if path.startswith(f"data/{pulse_type}_data/time")]
+        assert slices
+        assert all(os.path.exists(os.path.join(pipeline.parent_dir, path)) for path in slices)
+
+
+def test_slurm_env_setup_from_submitter(monkeypatch):
+    monkeypatch.delenv("PIPELINE_ENV_SETUP", raising=False)
+    setup = pipeline.slurm_env_setup()
+    assert "conda activate" in setup
+    assert pipeline.ENV_SETUP_END not in setup
+
+
+def test_slurm_env_setup_from_environment(tmp_path, monkeypatch):
+    snippet = tmp_path / "env.sh"
+    snippet.write_text("source /opt/venv/bin/activate\n")
+    monkeypatch.setenv("PIPELINE_ENV_SETUP", str(snippet))
+    assert pipeline.slurm_env_setup() == "source /opt/venv/bin/activate"
@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+import pytest
+
+from scenario import Pulse
+
+# loaded by path: importing the plasma_data_handling package imports HISP
+_spec = importlib.util.spec_from_file_location(
+    "pulse_helpers", os.path.join(os.path.dirname(__file__), "..", "plasma_data_handling", "helpers.py")
+)
+helpers = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(helpers)
+
+
+def make_pulse(nb_pulses=3, ramp_down=10.0):
+    # 200 s period: 10 s ramp-up, 100 s flat-top, ramp-down, waiting until 200 s
+    return Pulse("FP", nb_pulses, 10.0, 100.0, ramp_down, 90.0 - ramp_down, tritium_fraction=0.5)
+
+
+@pytest.mark.parametrize("t, expected", [(0.0, 0.0), (5.0, 0.5), (50.0, 1.0), (115.0, 0.5), (150.0, 0.0)])
+def test_first_repetition_matches_baseline(t, expected):
+    # values of the original waveform, which the first repetition keeps
+    assert helpers.periodic_pulse_function(t, make_pulse(), value=1.0, value_off=0.0) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("t", [5.0, 50.0, 115.0, 150.0])
+def test_repetitions_have_the_same_waveform(t):
+    # the original evaluated the ramps on the time since the start of the row:
+    # 20.5 instead of 0.5 at 205 s (ramp-up) and 0 instead of 0.5 at 315 s (ramp-down)
+    pulse = make_pulse()
+    first = helpers.periodic_pulse_function(t, pulse, value=1.0, value_off=0.0)
+    for repetition in (1, 2):
+        assert helpers.periodic_pulse_function(t + 200.0 * repetition, pulse, value=1.0, value_off=0.0) == (
+            pytest.approx(first)
+        )
+
+
+def test_no_ramp_down():
+    pulse = make_pulse(ramp_down=0.0)
+    assert helpers.periodic_pulse_function(50.0, pulse, value=1.0, value_off=0.0) == 1.0
+    assert helpers.periodic_pulse_function(150.0, pulse, value=1.0, value_off=0.0) == 0.0
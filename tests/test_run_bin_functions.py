@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from run_bin_functions import install_milestones, make_milestones, sample_temperatures
+from scenario import Pulse, Scenario
+
+
+def make_scenario():
+    return Scenario([
+        Pulse("FP", 2, 10.0, 100.0, 10.0, 80.0, tritium_fraction=0.5),
+        Pulse("BAKE", 1, 50.0, 200.0, 50.0, 100.0, tritium_fraction=0.0),
+    ])
+
+
+class FakeNewModel:
+    def make_milestones(self):
+        return []
+
+
+def test_make_milestones_can_be_iterated_twice():
+    scenario = make_scenario()
+    milestones = make_milestones(scenario, None)
+    # HISP appends the final time, then the stepsize cap scans the milestones at every step
+    milestones.append(scenario.get_maximum_time())
+    first_pass = [t for t in milestones]
+    second_pass = [t for t in milestones]
+    assert first_pass == second_pass
+    assert first_pass[:-1] == [t for t in scenario.get_milestones() if t > 0]
+
+
+def test_installed_milestones_are_new_lists():
+    scenario = make_scenario()
+    new_model = FakeNewModel()
+    assert install_milestones(new_model, scenario, None)
+    first = new_model.make_milestones()
+    first.append(1e9)
+    assert 1e9 not in new_model.make_milestones()
+    assert new_model.make_milestones() == make_milestones(scenario, None)
+
+
+def test_sample_temperatures_calls_once_per_unique_time():
+    calls = []
+
+    def temperature_function(x, t):
+        calls.append(t)
+        # HISP temperature functions only take a scalar time
+        return 300.0 + float(t) + 1000.0 * x[0]
+
+    values = sample_temperatures(temperature_function, [0.0, 0.01], [0.0, 5.0, 5.0, 10.0])
+    assert sorted(calls) == [0.0, 5.0, 10.0]
+    np.testing.assert_allclose(values, [[300.0, 305.0, 305.0, 310.0], [310.0, 315.0, 315.0, 320.0]])
+
+
+def test_sample_temperatures_does_not_hide_errors():
+    def temperature_function(x, t):
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        sample_temperatures(temperature_function, [0.0], [1.0])
@@ -0,0 +1,80 @@
+import pytest
+
+from scenario import Pulse, Scenario
+
+
+def make_pulse(pulse_type="FP", nb_pulses=1, ramp_up=10.0, steady_state=100.0, ramp_down=10.0, waiting=80.0):
+    return Pulse(
+        pulse_type=pulse_type,
+        nb_pulses=nb_pulses,
+        ramp_up=ramp_up,
+        steady_state=steady_state,
+        ramp_down=ramp_down,
+        waiting=waiting,
+        tritium_fraction=0.5,
+    )
+
+
+def test_iter_milestones_matches_pulse_breakpoints():
+    scenario = Scenario([make_pulse(nb_pulses=2), make_pulse("BAKE", ramp_up=0.0, steady_state=50.0,
+                                                             ramp_down=0.0, waiting=0.0)])
+    # zero-length ramps and the end of a pulse (start of the next) are yielded once
+    assert scenario.get_milestones() == [0.0, 10.0, 110.0, 120.0, 200.0, 210.0, 310.0, 320.0, 400.0, 450.0]
+
+
+def test_iter_milestones_window():
+    scenario = Scenario([make_pulse(nb_pulses=1000)])
+    window = list(scenario.iter_milestones(t_start=100_000.0, t_end=100_400.0))
+    assert window == [100_000.0, 100_010.0, 100_110.0, 100_120.0, 100_200.0, 100_210.0, 100_310.0, 100_320.0,
+                      100_400.0]
+    assert all(
+        t in window for t in scenario.get_milestones() if 100_000.0 <= t <= 100_400.0
+    )
+
+
+def test_iter_milestones_is_lazy():
+    scenario = Scenario([make_pulse(nb_pulses=10**12)])
+    milestones = scenario.iter_milestones()
+    assert [next(milestones) for _ in range(3)] == [0.0, 10.0, 110.0]
+
+
+def test_next_milestone():
+    scenario = Scenario([make_pulse(nb_pulses=3)])
+    assert scenario.next_milestone(0.0) == 10.0
+    assert scenario.next_milestone(10.0) == 110.0
+    assert scenario.next_milestone(600.0) == scenario.get_maximum_time()
+
+
+def test_compress_merges_adjacent_identical_rows():
+    pulses = [make_pulse(nb_pulses=2), make_pulse(nb_pulses=3), make_pulse("ICWC"), make_pulse(nb_pulses=1)]
+    scenario = Scenario(pulses)
+    scenario.plasma_data_handling = "pdh"
+    compressed = scenario.compress()
+    assert [(p.pulse_type, p.nb_pulses) for p in compressed.pulses] == [("FP", 5), ("ICWC", 1), ("FP", 1)]
+    # same waveform, original pulses untouched, extra attributes kept
+    assert compressed.get_milestones() == scenario.get_milestones()
+    assert [p.nb_pulses for p in scenario.pulses] == [2, 3, 1, 1]
+    assert compressed.plasma_data_handling == "pdh"
+
+
+def test_compress_tolerance():
+    scenario = Scenario([make_pulse(steady_state=100.0), make_pulse(steady_state=100.001)])
+    assert len(scenario.compress().pulses) == 2
+    assert len(scenario.compress(rtol=1e-4).pulses) == 1
+
+
+def test_row_times_follow_in_place_edits():
+    scenario = Scenario([make_pulse(nb_pulses=2), make_pulse(pulse_type="GDC")])
+    assert scenario.get_maximum_time() == 600.0
+    scenario.pulses[0].nb_pulses = 3
+    assert scenario.get_maximum_time() == 800.0
+    assert scenario.get_time_till_row(1) == 600.0
+    scenario.pulses[1].waiting = 180.0
+    assert scenario.get_maximum_time() == 900.0
+    assert scenario.get_row(650.0) == 1
+
+
+def test_risp_milestones_use_the_default_durations():
+    pulse = make_pulse(pulse_type="RISP", ramp_up=0.0, steady_state=0.0, ramp_down=0.0, waiting=0.0)
+    with pytest.warns(UserWarning):
+        assert pulse.milestones == [0.0, 10, 260, 270, 1800]
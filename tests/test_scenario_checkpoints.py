@@ -0,0 +1,68 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from bins_from_csv.csv_bin_loader import CSVBinLoader
+from scenario import Pulse, Scenario
+from scenario_checkpoints import extract_state, prefix_key, supports_initial_state
+
+EXAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "input_files_example")
+
+
+class PlasmaData:
+    strike_point = False
+
+    def __init__(self):
+        self.pulse_type_to_data = {"FP": pd.DataFrame({"Bin_Index": [0], "flux": [1e20]}, index=[0])}
+
+    def is_transient(self, pulse_type):
+        return False
+
+
+def field(values):
+    return SimpleNamespace(x=SimpleNamespace(array=np.array(values, dtype=float)))
+
+
+def test_prefix_key_ignores_the_output_policy():
+    loader = CSVBinLoader(
+        os.path.join(EXAMPLE_DIR, "input_table.csv"), materials_csv_path=os.path.join(EXAMPLE_DIR, "materials.csv")
+    )
+    target_bin = loader.load_reactor().bins[0]
+    scenario = Scenario([
+        Pulse("FP", 2, 10.0, 100.0, 10.0, 80.0, tritium_fraction=0.5),
+        Pulse("BAKE", 1, 0.0, 1000.0, 0.0, 0.0, tritium_fraction=0.0),
+    ])
+    inputs = {"plasma_data_handling": PlasmaData(), "coolant_temp": 343.0}
+    key = prefix_key(target_bin, None, scenario, 1, **inputs)
+    assert prefix_key(target_bin, None, scenario, 1, output_policy={"default": "all"}, **inputs) == key
+    assert prefix_key(target_bin, None, scenario, 1, phase_policy={"waiting": 5000.0}, **inputs) != key
+    assert prefix_key(target_bin, None, scenario, 2, **inputs) != key
+
+
+def test_extract_state_includes_traps_and_temperature():
+    model = SimpleNamespace(
+        species=[SimpleNamespace(name="T", solution=field([1.0])), SimpleNamespace(name="trap1_T", solution=field([2.0]))],
+        traps=[SimpleNamespace(name="trap2", solution=field([3.0]))],
+        temperature_fenics=field([400.0]),
+    )
+    state = extract_state(model)
+    assert sorted(state) == ["T", "temperature", "trap1_T", "trap:trap2"]
+    assert state["temperature"][0] == 400.0
+    # a prescribed temperature (constant or expression) has no degrees of freedom
+    model.temperature_fenics = 343.0
+    assert "temperature" not in extract_state(model)
+
+
+def test_supports_initial_state():
+    class Old:
+        def run_bin(self, bin, exports=False):
+            pass
+
+    class New:
+        def run_bin(self, bin, exports=False, initial_state=None):
+            pass
+
+    assert not supports_initial_state(Old) and not supports_initial_state(Old())
+    assert supports_initial_state(New) and supports_initial_state(New())
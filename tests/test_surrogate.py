@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from surrogate import Surrogate, find_scenario, inventory_from_log, log_inventory, reactor_totals
+
+
+def test_inventory_transform_round_trip():
+    for inventory in (1.0, 3.7e5, 2.5e21):
+        assert inventory_from_log(log_inventory(inventory)) == pytest.approx(inventory)
+    # below the floor of 1 particle/m²
+    assert inventory_from_log(log_inventory(0.0)) == 1.0
+
+
+def test_reactor_totals_use_the_training_transform():
+    members = np.full((4, 2), log_inventory(1e20))
+    areas = np.array([2.0, 3.0])
+    median, low, high = reactor_totals(members, areas, residual_std=0.0)
+    assert median == pytest.approx(5e20) and low == pytest.approx(5e20) and high == pytest.approx(5e20)
+
+
+def test_fit_recovers_exact_targets():
+    features = [{"x": float(x)} for x in np.linspace(0.0, 1.0, 20)]
+    targets = [log_inventory(1e18 * 10 ** f["x"]) for f in features]
+    model = Surrogate.fit(features, targets, alpha=1e-9, n_members=4)
+    mean, _, outside = model.predict([{"x": 0.5}])
+    assert inventory_from_log(mean[0]) == pytest.approx(1e18 * 10 ** 0.5, rel=1e-3)
+    assert not outside[0]
+
+
+def test_find_scenario(tmp_path):
+    (tmp_path / "mesh.py").write_text("")
+    (tmp_path / "10FPdays.py").write_text("")
+    assert find_scenario(str(tmp_path)) == (str(tmp_path), "10FPdays")
+    (tmp_path / "10FPdays_baking.py").write_text("")
+    with pytest.raises(ValueError):
+        find_scenario(str(tmp_path))
+    assert find_scenario(str(tmp_path), "10FPdays_baking") == (str(tmp_path), "10FPdays_baking")
+    with pytest.raises(FileNotFoundError):
+        find_scenario(str(tmp_path), "missing")